@@ -0,0 +1,48 @@
+"""Micro-benchmark de AccessManager.is_authorized.
+
+Compare l'ancienne vérification (lecture du fichier JSON + recherche dans une
+liste à chaque appel) à l'index en mémoire, pour un nombre croissant
+d'utilisateurs autorisés.
+
+Lancer depuis la racine du projet : python -m benchmarks.bench_access_manager
+"""
+import json
+import os
+import tempfile
+import timeit
+
+from modules.access_manager import AccessManager
+from modules.storage import JsonStorage
+
+USER_COUNTS = (1_000, 10_000, 100_000)
+LOOKUPS = 200
+
+
+def legacy_is_authorized(access_file: str, user_id: int) -> bool:
+    with open(access_file, 'r') as f:
+        data = json.load(f)
+    return user_id in data["authorized_users"]
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'utilisateurs':>12} | {'ancien (µs/appel)':>18} | {'index (µs/appel)':>17}")
+        for count in USER_COUNTS:
+            access_file = os.path.join(tmp, f"access_{count}.json")
+            with open(access_file, 'w') as f:
+                json.dump({"codes": [], "authorized_users": list(range(count))}, f)
+
+            storage = JsonStorage(os.path.join(tmp, "catalog.json"), access_file=access_file)
+            manager = AccessManager(storage)
+            manager.is_authorized(0)  # chargement initial de l'index
+
+            # Pire cas pour la recherche linéaire : dernier utilisateur de la liste
+            user_id = count - 1
+            legacy = timeit.timeit(lambda: legacy_is_authorized(access_file, user_id), number=LOOKUPS)
+            indexed = timeit.timeit(lambda: manager.is_authorized(user_id), number=LOOKUPS)
+
+            print(f"{count:>12} | {legacy / LOOKUPS * 1e6:>18.1f} | {indexed / LOOKUPS * 1e6:>17.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Débit d'une diffusion : boucle séquentielle contre BroadcastEngine.
+
+Le Bot est simulé : chaque envoi attend RTT secondes, et le Bot lève
+RetryAfter dès que plus de LIMIT messages ont été envoyés dans la dernière
+seconde, comme l'API Telegram. L'ancienne boucle est mesurée sur quelques
+destinataires puis extrapolée à 50 000 utilisateurs.
+
+Lancer depuis la racine du projet : python -m benchmarks.bench_broadcast
+"""
+import asyncio
+import collections
+import time
+
+from telegram.error import RetryAfter
+
+from modules.broadcast import BroadcastEngine
+
+RTT = 0.1          # aller-retour simulé vers l'API Bot (secondes)
+LIMIT = 30         # messages par seconde tolérés par le faux Bot
+RATE = 25          # débit configuré pour le moteur
+RECIPIENTS = 500
+AUDIENCE = 50_000  # taille utilisée pour l'extrapolation
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = 0
+        self.flood_errors = 0
+        self._window = collections.deque()
+
+    async def send_message(self, chat_id, text, **kwargs):
+        now = time.monotonic()
+        while self._window and now - self._window[0] > 1:
+            self._window.popleft()
+        if len(self._window) >= LIMIT:
+            self.flood_errors += 1
+            raise RetryAfter(1)
+        self._window.append(now)
+        await asyncio.sleep(RTT)
+        self.sent += 1
+
+
+async def sequential(bot, chat_ids):
+    """Ancienne boucle de send_broadcast_message : un destinataire à la fois"""
+    for chat_id in chat_ids:
+        try:
+            await bot.send_message(chat_id=chat_id, text="annonce")
+        except Exception:
+            pass
+
+
+async def main():
+    bot = FakeBot()
+    sample = list(range(30))
+    start = time.perf_counter()
+    await sequential(bot, sample)
+    per_message = (time.perf_counter() - start) / len(sample)
+    print(f"Boucle séquentielle : {1 / per_message:6.1f} msg/s"
+          f"  -> {AUDIENCE:,} utilisateurs en {AUDIENCE * per_message / 3600:.1f} h")
+
+    bot = FakeBot()
+    engine = BroadcastEngine(rate=RATE, concurrency=20)
+
+    async def send(chat_id):
+        await bot.send_message(chat_id=chat_id, text="annonce")
+
+    result = await engine.run(range(RECIPIENTS), send)
+    print(f"BroadcastEngine     : {result.rate:6.1f} msg/s (configuré : {RATE})"
+          f"  -> {AUDIENCE:,} utilisateurs en {AUDIENCE / result.rate / 60:.0f} min")
+    print(f"  {result.success} envoyés, {result.failed} échecs, "
+          f"{bot.flood_errors} RetryAfter, {result.retries} nouveaux essais")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,105 @@
+"""Micro-benchmark de l'aiguillage des boutons.
+
+Compare l'ancienne chaîne if/elif de handle_normal_buttons (conditions
+évaluées dans l'ordre, jusqu'à la bonne) à CallbackRouter (dictionnaire
+de clés exactes + trie de préfixes), pour différents types de callback.
+Les callback_data sont au format actuel : identifiants courts de
+catégorie et de produit (CatalogIndex).
+
+Lancer depuis la racine du projet : python -m benchmarks.bench_callback_router
+"""
+import timeit
+
+from modules.callback_router import CallbackRouter
+
+# Conditions de l'ancienne chaîne, dans leur ordre d'évaluation
+LEGACY_CHAIN = [
+    ('exact', ("admin",)),
+    ('exact', ("edit_banner_image",)),
+    ('exact', ("manage_users",)),
+    ('exact', ("start_broadcast",)),
+    ('exact', ("add_category",)),
+    ('exact', ("add_product",)),
+    ('prefix', ("select_category_",)),
+    ('prefix', ("delete_product_category_",)),
+    ('exact', ("delete_category",)),
+    ('prefix', ("confirm_delete_category_",)),
+    ('prefix', ("really_delete_category_",)),
+    ('exact', ("delete_product",)),
+    ('prefix', ("confirm_delete_product_",)),
+    ('prefix', ("really_delete_product_",)),
+    ('exact', ("edit_order_button",)),
+    ('exact', ("show_order_text",)),
+    ('exact', ("edit_welcome",)),
+    ('exact', ("show_stats",)),
+    ('exact', ("edit_contact",)),
+    ('in', ("cancel_add_category", "cancel_add_product", "cancel_delete_category",
+            "cancel_delete_product", "cancel_edit_contact", "cancel_edit_order", "cancel_edit_welcome")),
+    ('exact', ("back_to_categories",)),
+    ('exact', ("skip_media",)),
+    ('prefix', ("product_",)),
+    ('prefix', ("view_",)),
+    ('prefix', (("next_media_", "prev_media_"),)),
+    ('exact', ("edit_product",)),
+    ('prefix', ("editcat_",)),
+    ('prefix', ("editp_",)),
+    ('in', ("edit_name", "edit_price", "edit_desc")),
+    ('exact', ("cancel_edit",)),
+    ('exact', ("confirm_reset_stats",)),
+    ('exact', ("show_categories",)),
+    ('exact', ("back_to_home",)),
+]
+
+SAMPLES = {
+    'admin (1re branche)': "admin",
+    'view_': "view_cf8ffa2c5",
+    'product_': "product_1m",
+    'next_media_': "next_media_1m",
+    'back_to_home (dernière)': "back_to_home",
+    'inconnu': "unknown_button",
+}
+CALLS = 200_000
+
+
+def build_legacy_dispatch():
+    """Génère une vraie chaîne if/elif équivalente à l'ancienne"""
+    lines = ["def legacy_dispatch(data):"]
+    for index, (kind, keys) in enumerate(LEGACY_CHAIN):
+        keyword = "if" if index == 0 else "elif"
+        if kind == 'exact':
+            condition = f"data == {keys[0]!r}"
+        elif kind == 'in':
+            condition = f"data in {list(keys)!r}"
+        else:
+            condition = f"data.startswith({keys[0]!r})"
+        lines.append(f"    {keyword} {condition}:")
+        lines.append(f"        return {index}")
+    namespace = {}
+    exec("\n".join(lines), namespace)
+    return namespace["legacy_dispatch"]
+
+
+def build_router() -> CallbackRouter:
+    router = CallbackRouter()
+    for index, (kind, keys) in enumerate(LEGACY_CHAIN):
+        if kind == 'prefix':
+            prefixes = keys[0] if isinstance(keys[0], tuple) else keys
+            router.prefix(*prefixes)(index)
+        else:
+            router.exact(*keys)(index)
+    return router
+
+
+def main():
+    legacy_dispatch = build_legacy_dispatch()
+    router = build_router()
+    print(f"{'callback':>24} | {'chaîne (ns/appel)':>17} | {'routeur (ns/appel)':>18}")
+    for label, data in SAMPLES.items():
+        assert legacy_dispatch(data) == router.resolve(data)
+        legacy = timeit.timeit(lambda: legacy_dispatch(data), number=CALLS)
+        routed = timeit.timeit(lambda: router.resolve(data), number=CALLS)
+        print(f"{label:>24} | {legacy / CALLS * 1e9:>17.0f} | {routed / CALLS * 1e9:>18.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Coût d'un « swipe » dans le carrousel de médias.
+
+Compare l'ancienne méthode (suppression du message puis send_photo) à
+l'édition en place (edit_media), et au repli quand l'édition est refusée.
+Le Bot est simulé : chaque appel à l'API attend RTT secondes et est compté.
+
+Lancer depuis la racine du projet : python -m benchmarks.bench_media_carousel
+"""
+import asyncio
+import time
+
+from telegram.error import BadRequest
+
+from modules.media_carousel import replace_media, send_media
+
+RTT = 0.06  # aller-retour simulé vers l'API Bot (secondes)
+SWIPES = 20
+MEDIA = [{'media_type': 'photo', 'media_id': f"photo_{i}"} for i in range(5)]
+
+
+class FakeBot:
+    def __init__(self, reject_edits: bool = False):
+        self.calls = 0
+        self.reject_edits = reject_edits
+
+    async def call(self):
+        self.calls += 1
+        await asyncio.sleep(RTT)
+
+    async def send_photo(self, **kwargs):
+        await self.call()
+        return FakeMessage(self)
+
+    async def send_video(self, **kwargs):
+        await self.call()
+        return FakeMessage(self)
+
+
+class FakeMessage:
+    chat_id = 1
+
+    def __init__(self, bot: FakeBot):
+        self.bot = bot
+
+    async def delete(self):
+        await self.bot.call()
+
+    async def edit_media(self, media, reply_markup=None):
+        await self.bot.call()
+        if self.bot.reject_edits:
+            raise BadRequest("Message can't be edited")
+        return self
+
+
+async def legacy_swipe(message, bot, media):
+    await message.delete()
+    return await send_media(bot, message.chat_id, media, "légende", None)
+
+
+async def edit_swipe(message, bot, media):
+    return await replace_media(message, bot, media, "légende", None)
+
+
+async def run(swipe, bot: FakeBot) -> tuple:
+    message = FakeMessage(bot)
+    start = time.perf_counter()
+    for i in range(SWIPES):
+        message = await swipe(message, bot, MEDIA[i % len(MEDIA)])
+    elapsed = time.perf_counter() - start
+    return bot.calls / SWIPES, elapsed / SWIPES * 1000
+
+
+def main():
+    scenarios = {
+        'supprimer + renvoyer': (legacy_swipe, FakeBot()),
+        'edit_media': (edit_swipe, FakeBot()),
+        'edit_media refusé (repli)': (edit_swipe, FakeBot(reject_edits=True)),
+    }
+    print(f"RTT simulé : {RTT * 1000:.0f} ms, {SWIPES} swipes")
+    print(f"{'méthode':>26} | {'appels/swipe':>12} | {'latence/swipe (ms)':>18}")
+    for label, (swipe, bot) in scenarios.items():
+        calls, latency = asyncio.run(run(swipe, bot))
+        print(f"{label:>26} | {calls:>12.1f} | {latency:>18.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Empreinte mémoire du registre des utilisateurs.
+
+Compare l'ancien format (dictionnaire de dictionnaires indexé par des
+identifiants en chaîne, last_seen formaté en texte) à UserRegistry
+(identifiants entiers, enregistrements à __slots__, last_seen en epoch).
+
+Lancer depuis la racine du projet : python -m benchmarks.bench_user_registry
+"""
+import gc
+import time
+import tracemalloc
+
+from modules.user_registry import UserRegistry, format_last_seen
+
+USER_COUNTS = (10_000, 100_000)
+
+
+def legacy_users(count: int, now: int) -> dict:
+    return {
+        str(1_000_000_000 + i): {
+            'username': f"user{i}",
+            'first_name': f"Prénom{i}",
+            'last_name': None,
+            'last_seen': format_last_seen(now - i)
+        }
+        for i in range(count)
+    }
+
+
+def registry_users(count: int, now: int) -> UserRegistry:
+    registry = UserRegistry()
+    for i in range(count):
+        registry.upsert(1_000_000_000 + i, f"user{i}", f"Prénom{i}", None, now - i)
+    return registry
+
+
+def measure(build, count: int, now: int) -> int:
+    gc.collect()
+    tracemalloc.start()
+    users = build(count, now)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del users
+    return current
+
+
+def main():
+    now = int(time.time())
+    print(f"{'utilisateurs':>12} | {'ancien (Mo)':>11} | {'registre (Mo)':>13} | {'gain':>5}")
+    for count in USER_COUNTS:
+        legacy = measure(legacy_users, count, now)
+        compact = measure(registry_users, count, now)
+        print(f"{count:>12} | {legacy / 2**20:>11.1f} | {compact / 2**20:>13.1f} | {legacy / compact:>4.1f}x")
+
+
+if __name__ == '__main__':
+    main()
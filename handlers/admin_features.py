@@ -1,43 +1,79 @@
-﻿import json
-import pytz  
-from datetime import datetime
+﻿import asyncio
+import html
+import time
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
+from modules.broadcast import (
+    BroadcastControl, BroadcastEngine, FAILURE_CHAT_NOT_FOUND, FAILURE_FORBIDDEN, FAILURE_OTHER, FAILURE_TRANSIENT
+)
+from modules.broadcast_history import BroadcastHistory
+from modules.user_registry import UserRegistry, format_last_seen
+
 class AdminFeatures:
-    def __init__(self, users_file: str = 'data/users.json'):
-        self.users_file = users_file
+    def __init__(self, storage, last_seen_resolution: int = 60, cleanup_queue=None, broadcast_engine=None,
+                 broadcast_history=None, broadcast_checkpoint_every: int = 50,
+                 broadcast_recheck_after: int = 30 * 86400, album_delay: float = 1.0,
+                 broadcast_progress_interval: float = 3.0):
+        self.storage = storage
+        # File de suppression des anciens messages (partagée avec main.py)
+        self.cleanup_queue = cleanup_queue
+        # Envois des annonces, limités au débit autorisé par Telegram
+        self.broadcast_engine = broadcast_engine or BroadcastEngine()
+        # Diffusions persistées, reprises au démarrage si elles ont été interrompues
+        self.broadcast_history = broadcast_history or BroadcastHistory()
+        self.broadcast_checkpoint_every = broadcast_checkpoint_every
+        # Les utilisateurs injoignables sont réessayés après ce délai (secondes)
+        self.broadcast_recheck_after = broadcast_recheck_after
+        # Attente des autres médias d'un album avant de lancer la diffusion
+        self.album_delay = album_delay
+        # Intervalle (secondes) entre deux mises à jour du message de progression
+        self.broadcast_progress_interval = broadcast_progress_interval
+        # Diffusions en cours d'envoi, par identifiant de job
+        self._broadcasts = {}
         self._users = self._load_users()
+        # last_seen n'est mis à jour qu'une fois par période de résolution
+        self.last_seen_resolution = last_seen_resolution
+        # Utilisateurs modifiés en mémoire, pas encore écrits
+        self._dirty_users = set()
+        self._flush_lock = asyncio.Lock()
 
-    def _load_users(self):
-        """Charge les utilisateurs depuis le fichier"""
-        try:
-            with open(self.users_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return {}
+    def _load_users(self) -> UserRegistry:
+        """Charge les utilisateurs depuis le stockage"""
+        return self.storage.load_users()
 
-    def _save_users(self):
-        """Sauvegarde les utilisateurs"""
-        try:
-            with open(self.users_file, 'w', encoding='utf-8') as f:
-                json.dump(self._users, f, indent=4, ensure_ascii=False)
-        except Exception as e:
-            print(f"Erreur lors de la sauvegarde des utilisateurs : {e}")
+    async def flush_users(self):
+        """Écrit en un seul lot les utilisateurs modifiés (hors de la boucle)"""
+        async with self._flush_lock:
+            if not self._dirty_users:
+                return
+            dirty, self._dirty_users = self._dirty_users, set()
+            try:
+                await asyncio.to_thread(self.storage.save_users, self._users, dirty)
+            except Exception as e:
+                self._dirty_users |= dirty
+                print(f"Erreur lors de la sauvegarde des utilisateurs : {e}")
 
     async def register_user(self, user):
         """Enregistre ou met à jour un utilisateur"""
-        user_id = str(user.id)
-        paris_tz = pytz.timezone('Europe/Paris')
-        paris_time = datetime.utcnow().replace(tzinfo=pytz.UTC).astimezone(paris_tz)
-        
-        self._users[user_id] = {
-            'username': user.username,
-            'first_name': user.first_name,
-            'last_name': user.last_name,
-            'last_seen': paris_time.strftime("%Y-%m-%d %H:%M:%S")
-        }
-        self._save_users()
+        now = int(time.time())
+        record = self._users.get(user.id)
+        profile = (user.username, user.first_name, user.last_name)
+
+        if record is not None and record.profile == profile:
+            # Un utilisateur qui écrit au bot est de nouveau joignable
+            if self._users.mark_reachable(user.id):
+                self._dirty_users.add(user.id)
+            # Seul last_seen change : au plus une fois par période, écriture groupée
+            if now - record.last_seen >= self.last_seen_resolution:
+                record.last_seen = now
+                self._dirty_users.add(user.id)
+            return
+
+        # Nouvel utilisateur ou changement de profil : écriture immédiate
+        self._users.upsert(user.id, *profile, now)
+        self._dirty_users.add(user.id)
+        await self.flush_users()
 
     async def handle_broadcast(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Démarre le processus de diffusion"""
@@ -67,28 +103,401 @@ class AdminFeatures:
             print(f"Erreur dans handle_broadcast : {e}")
             return "CHOOSING"
 
+    @staticmethod
+    def _broadcast_content(chat_id: int, message_ids) -> dict:
+        """Messages de l'admin à recopier chez chaque destinataire (plusieurs pour un album)"""
+        return {"type": "copy", "from_chat_id": chat_id, "message_ids": sorted(message_ids)}
+
+    @staticmethod
+    def _broadcast_sender(bot, content: dict):
+        """Coroutine d'envoi : copie côté serveur, un seul appel par destinataire.
+
+        copyMessage / copyMessages recopient n'importe quel type de message
+        (texte, photo, vidéo, document, album...) sans retransférer le média.
+        """
+        from_chat_id = content["from_chat_id"]
+        message_ids = content["message_ids"]
+
+        if len(message_ids) == 1:
+            async def send(user_id):
+                await bot.copy_message(chat_id=user_id, from_chat_id=from_chat_id, message_id=message_ids[0])
+        else:
+            async def send(user_id):
+                await bot.copy_messages(chat_id=user_id, from_chat_id=from_chat_id, message_ids=message_ids)
+        return send
+
+    @staticmethod
+    def _broadcast_summary(message) -> str:
+        """Résumé du message diffusé, pour le rapport (texte brut, à échapper à l'affichage)"""
+        if message.text:
+            return message.text
+        if message.photo:
+            return "Photo avec légende" if message.caption else "Photo"
+        if message.video:
+            return "Vidéo avec légende" if message.caption else "Vidéo"
+        if message.document:
+            return "Document"
+        return "Message"
+
+    @staticmethod
+    def _broadcast_error_text(summary: str, success: int, failed: int) -> str:
+        return (
+            "❌ <b>Une erreur est survenue lors de la diffusion.</b>\n\n"
+            f"Messages envoyés avant l'erreur :\n"
+            f"• Message : <i>{html.escape(summary)}</i>\n"
+            f"• Réussis : {success}\n"
+            f"• Échecs : {failed}"
+        )
+
+    def _update_reachability(self, result) -> None:
+        """Reporte dans le registre les destinataires devenus injoignables et
+        ceux, revérifiés, qui ont de nouveau reçu le message"""
+        unreachable, result.unreachable = result.unreachable, []
+        delivered, result.delivered = result.delivered, []
+        now = int(time.time())
+        for user_id in unreachable:
+            if self._users.mark_unreachable(user_id, now):
+                self._dirty_users.add(user_id)
+        for user_id in delivered:
+            if self._users.mark_reachable(user_id):
+                self._dirty_users.add(user_id)
+
+    @staticmethod
+    def _failure_breakdown(failure_kinds: dict) -> str:
+        labels = (
+            (FAILURE_FORBIDDEN, "Bot bloqué / compte supprimé"),
+            (FAILURE_CHAT_NOT_FOUND, "Chat introuvable"),
+            (FAILURE_TRANSIENT, "Erreurs réseau"),
+            (FAILURE_OTHER, "Autres erreurs"),
+        )
+        return "".join(
+            f"   ◦ {label} : {failure_kinds[kind]}\n"
+            for kind, label in labels if failure_kinds.get(kind)
+        )
+
+    @staticmethod
+    def _broadcast_controls(job_id: str, paused: bool) -> InlineKeyboardMarkup:
+        """Boutons pause / reprise / annulation d'une diffusion en cours"""
+        toggle = (
+            InlineKeyboardButton("▶️ Reprendre", callback_data=f"broadcast_resume_{job_id}")
+            if paused else
+            InlineKeyboardButton("⏸ Pause", callback_data=f"broadcast_pause_{job_id}")
+        )
+        return InlineKeyboardMarkup([
+            [toggle, InlineKeyboardButton("❌ Annuler", callback_data=f"broadcast_cancel_{job_id}")],
+            [InlineKeyboardButton("🔙 Retour au menu admin", callback_data="admin")]
+        ])
+
+    async def _run_broadcast(self, bot, broadcast: dict):
+        """Envoie (ou reprend au curseur) une diffusion enregistrée, puis affiche le rapport"""
+        history = self.broadcast_history
+        job = broadcast["job"]
+        control = broadcast["control"]
+        result = broadcast["result"]
+        back_markup = InlineKeyboardMarkup([[
+            InlineKeyboardButton("🔙 Retour au menu admin", callback_data="admin")
+        ]])
+        last_progress = None
+
+        async def show_progress(progress):
+            nonlocal last_progress
+            text = (
+                f"{'⏸ <b>Diffusion en pause</b>' if control.paused else '📤 <b>Envoi en cours...</b>'}\n\n"
+                f"Diffusion : <code>{job['id']}</code>\n"
+                f"Progression : {progress.done}/{progress.total}"
+            )
+            if not control.paused:
+                text += f"\nDébit : {progress.rate:.1f} msg/s"
+            # Rien à modifier (en pause notamment) : pas d'appel inutile
+            if text == last_progress:
+                return
+            last_progress = text
+            await bot.edit_message_text(
+                chat_id=job["admin_chat_id"],
+                message_id=job["progress_message_id"],
+                text=text,
+                parse_mode='HTML',
+                reply_markup=self._broadcast_controls(job["id"], control.paused)
+            )
+
+        # Mise à jour immédiate après une pause ou une reprise depuis ce message
+        broadcast["refresh"] = lambda: show_progress(result)
+
+        async def checkpoint(progress):
+            self._update_reachability(progress)
+            await history.checkpoint(job, progress)
+
+        try:
+            result = await self.broadcast_engine.run(
+                job["recipients"],
+                self._broadcast_sender(bot, job["content"]),
+                on_progress=show_progress,
+                progress_interval=self.broadcast_progress_interval,
+                result=result,
+                on_checkpoint=checkpoint,
+                checkpoint_every=self.broadcast_checkpoint_every,
+                control=control
+            )
+        except asyncio.CancelledError:
+            self._update_reachability(result)
+            if not broadcast["cancelled"]:
+                # Arrêt du bot : le job reste « running » et reprendra au démarrage
+                await history.checkpoint(job, result)
+                raise
+            # Annulation demandée par l'admin : le job est clos
+            await history.finish(job, result, status="cancelled")
+            report_text = (
+                "🛑 <b>Diffusion annulée</b>\n\n"
+                f"• Message : <i>{html.escape(job['summary'])}</i>\n"
+                f"• Envois réussis : {result.success}\n"
+                f"• Échecs : {result.failed}\n"
+                f"• Non envoyés : {result.total - result.done}"
+            )
+        except Exception as e:
+            print(f"Erreur pendant la diffusion {job['id']}: {e}")
+            self._update_reachability(result)
+            await history.finish(job, result, status="failed")
+            report_text = self._broadcast_error_text(job["summary"], result.success, result.failed)
+        else:
+            for user_id, error in result.failures.items():
+                print(f"Erreur envoi à {user_id}: {error}")
+            self._update_reachability(result)
+            await history.finish(job, result)
+            report_text = (
+                "✅ <b>Message diffusé avec succès !</b>\n\n"
+                f"📊 <b>Rapport d'envoi :</b>\n"
+                f"• Message : <i>{html.escape(job['summary'])}</i>\n"
+                f"• Envois réussis : {result.success}\n"
+                f"• Échecs : {result.failed}\n"
+                f"{self._failure_breakdown(result.failure_kinds)}"
+                f"• Total : {result.done}\n"
+                f"• Exclus (injoignables) : {job.get('excluded', 0)}\n"
+                f"• Durée : {result.elapsed:.0f} s"
+            )
+
+        # Le message d'origine n'est plus utile : les copies en sont indépendantes
+        content = job["content"]
+        if content.get("type") == "copy":
+            self.cleanup_queue.enqueue(content["from_chat_id"], *content["message_ids"])
+
+        try:
+            await bot.edit_message_text(
+                chat_id=job["admin_chat_id"],
+                message_id=job["progress_message_id"],
+                text=report_text,
+                parse_mode='HTML',
+                reply_markup=back_markup
+            )
+        except Exception as e:
+            print(f"Erreur lors de l'affichage du rapport de diffusion: {e}")
+        return result
+
+    def _start_broadcast(self, bot, job: dict) -> asyncio.Task:
+        """Lance la diffusion en tâche de fond (pause, reprise et annulation par l'admin)"""
+        broadcast = {
+            "job": job,
+            "control": BroadcastControl(paused=job.get("paused", False)),
+            "result": self.broadcast_history.result_for(job),
+            "cancelled": False,
+        }
+        task = broadcast["task"] = asyncio.create_task(self._run_broadcast(bot, broadcast))
+        self._broadcasts[job["id"]] = broadcast
+        task.add_done_callback(lambda _: self._broadcasts.pop(job["id"], None))
+        return task
+
+    async def resume_broadcasts(self, bot):
+        """Reprend les diffusions interrompues par un arrêt ou un plantage"""
+        for job in self.broadcast_history.unfinished():
+            print(f"Reprise de la diffusion {job['id']} ({job['cursor']}/{job['total']})")
+            self._start_broadcast(bot, job)
+
+    async def stop_broadcasts(self):
+        """Interrompt les diffusions en cours en enregistrant leur curseur"""
+        tasks = [broadcast["task"] for broadcast in self._broadcasts.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def handle_broadcast_status(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Affiche les diffusions en cours (avec leurs contrôles) et les dernières terminées"""
+        text = "📡 <b>Suivi des diffusions</b>\n\n"
+        keyboard = []
+
+        if self._broadcasts:
+            for job_id, broadcast in self._broadcasts.items():
+                result = broadcast["result"]
+                paused = broadcast["control"].paused
+                percent = 100 * result.done // result.total if result.total else 100
+                state = "⏸ en pause" if paused else f"▶️ {result.rate:.1f} msg/s"
+                text += (
+                    f"• <code>{job_id}</code> : {result.done}/{result.total} ({percent} %) - {state}\n"
+                    f"   <i>{html.escape(broadcast['job']['summary'][:40])}</i>\n"
+                )
+                short_id = job_id[-4:]
+                keyboard.append([
+                    InlineKeyboardButton(
+                        f"▶️ Reprendre {short_id}" if paused else f"⏸ Pause {short_id}",
+                        callback_data=f"broadcast_{'resume' if paused else 'pause'}_{job_id}"
+                    ),
+                    InlineKeyboardButton(f"❌ Annuler {short_id}", callback_data=f"broadcast_cancel_{job_id}")
+                ])
+        else:
+            text += "Aucune diffusion en cours.\n"
+
+        finished = [job for job in self.broadcast_history.jobs if job["status"] != "running"][-3:]
+        if finished:
+            labels = {"done": "✅", "failed": "❌", "cancelled": "🛑"}
+            text += "\nDernières diffusions :\n"
+            for job in reversed(finished):
+                text += (
+                    f"{labels.get(job['status'], '•')} <code>{job['id']}</code> : "
+                    f"{job['success']} envoyés, {job['failed']} échecs, {job['duration']:.0f} s\n"
+                )
+
+        keyboard.append([InlineKeyboardButton("🔄 Actualiser", callback_data="broadcast_status")])
+        keyboard.append([InlineKeyboardButton("🔙 Retour", callback_data="admin")])
+
+        try:
+            await update.callback_query.edit_message_text(
+                text=text,
+                reply_markup=InlineKeyboardMarkup(keyboard),
+                parse_mode='HTML'
+            )
+        except Exception as e:
+            # « message is not modified » quand rien n'a changé depuis l'affichage
+            print(f"Erreur dans handle_broadcast_status : {e}")
+        return "CHOOSING"
+
+    async def handle_broadcast_control(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Pause, reprise ou annulation d'une diffusion (broadcast_<action>_<id>)"""
+        query = update.callback_query
+        _, action, job_id = query.data.split("_", 2)
+        broadcast = self._broadcasts.get(job_id)
+        # La diffusion peut s'être terminée entre-temps : son job reste dans l'historique
+        job = next((j for j in self.broadcast_history.jobs if j["id"] == job_id), None)
+        on_progress_message = (
+            job is not None
+            and query.message.chat_id == job["admin_chat_id"]
+            and query.message.message_id == job["progress_message_id"]
+        )
+        if broadcast is not None:
+            if action == "pause":
+                broadcast["control"].pause()
+                job["paused"] = True
+                await self.broadcast_history.save()
+            elif action == "resume":
+                broadcast["control"].resume()
+                job["paused"] = False
+                await self.broadcast_history.save()
+            elif action == "cancel":
+                broadcast["cancelled"] = True
+                broadcast["task"].cancel()
+                # Laisser la tâche enregistrer l'annulation et afficher son rapport
+                await asyncio.gather(broadcast["task"], return_exceptions=True)
+
+        if on_progress_message:
+            # Ce message porte la progression (ou le rapport d'annulation) :
+            # y afficher le suivi le ferait écraser au prochain rafraîchissement
+            refresh = broadcast.get("refresh") if broadcast is not None else None
+            if action != "cancel" and refresh is not None:
+                try:
+                    await refresh()
+                except Exception as e:
+                    print(f"Erreur lors de la mise à jour de la progression: {e}")
+            return "CHOOSING"
+        return await self.handle_broadcast_status(update, context)
+
+    async def _launch_broadcast(self, bot, chat_id: int, admin_id: int, progress_message_id: int,
+                                summary: str, content: dict):
+        """Enregistre la diffusion (reprise possible après un redémarrage) puis l'envoie"""
+        # Audience : utilisateurs joignables (et injoignables à revérifier)
+        recipients = [
+            user_id
+            for user_id in self._users.deliverable(int(time.time()), self.broadcast_recheck_after)
+            if user_id != admin_id
+        ]
+        job = await self.broadcast_history.create(
+            chat_id,
+            progress_message_id,
+            summary,
+            content,
+            recipients,
+            excluded=len(self._users) - len(recipients) - (admin_id in self._users)
+        )
+        return self._start_broadcast(bot, job)
+
+    def _schedule_album_broadcast(self, context: ContextTypes.DEFAULT_TYPE, album: dict) -> None:
+        """(Re)planifie la diffusion de l'album après le dernier média reçu"""
+        name = f"broadcast_album_{album['chat_id']}"
+        for job in context.job_queue.get_jobs_by_name(name):
+            job.schedule_removal()
+        context.job_queue.run_once(
+            self._send_album_broadcast,
+            self.album_delay,
+            data=album,
+            chat_id=album['chat_id'],
+            user_id=album['admin_id'],
+            name=name
+        )
+
+    async def _send_album_broadcast(self, context: ContextTypes.DEFAULT_TYPE):
+        """Tâche planifiée : diffuse l'album une fois tous ses médias reçus"""
+        album = context.job.data
+        if context.user_data.get('broadcast_album') is album:
+            del context.user_data['broadcast_album']
+        summary = f"Album ({len(album['message_ids'])} médias)"
+        try:
+            await self._launch_broadcast(
+                context.bot,
+                album['chat_id'],
+                album['admin_id'],
+                album['progress_message_id'],
+                summary,
+                self._broadcast_content(album['chat_id'], album['message_ids'])
+            )
+        except Exception as e:
+            print(f"Erreur lors de la diffusion de l'album: {e}")
+            try:
+                await context.bot.edit_message_text(
+                    chat_id=album['chat_id'],
+                    message_id=album['progress_message_id'],
+                    text=self._broadcast_error_text(summary, 0, 0),
+                    parse_mode='HTML',
+                    reply_markup=InlineKeyboardMarkup([[
+                        InlineKeyboardButton("🔙 Retour au menu admin", callback_data="admin")
+                    ]])
+                )
+            except Exception as edit_error:
+                print(f"Erreur lors de l'édition du message d'erreur: {edit_error}")
+
+    async def collect_album_part(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Médias suivants d'un album à diffuser (ils arrivent dans des mises à jour séparées)"""
+        album = context.user_data.get('broadcast_album')
+        message = update.effective_message
+        if album is None or message.media_group_id != album['media_group_id']:
+            return None
+        album['message_ids'].append(message.message_id)
+        self._schedule_album_broadcast(context, album)
+        return None
+
     async def send_broadcast_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Envoie le message à tous les utilisateurs"""
-        success = 0
-        failed = 0
         chat_id = update.effective_chat.id
+        message = update.message
         original_message = None
 
         try:
-            # Supprimer le message de l'utilisateur
-            try:
-                await update.message.delete()
-                # Supprimer le message d'instruction
-                if 'instruction_message_id' in context.user_data:
-                    await context.bot.delete_message(
-                        chat_id=chat_id,
-                        message_id=context.user_data['instruction_message_id']
-                    )
-            except Exception as e:
-                print(f"Erreur lors de la suppression du message: {e}")
+            album = context.user_data.get('broadcast_album')
+            if album is not None and message.media_group_id == album['media_group_id']:
+                await self.collect_album_part(update, context)
+                return "CHOOSING"
+
+            # Supprimer le message d'instruction ; le message à diffuser reste
+            # en place jusqu'à la fin de l'envoi, puisqu'il est recopié
+            self.cleanup_queue.enqueue(chat_id, context.user_data.get('instruction_message_id'))
 
             # Sauvegarder le contenu du message
-            message_content = update.message.text if update.message.text else "Photo avec légende" if update.message.photo and update.message.caption else "Photo" if update.message.photo else "Message"
+            message_content = self._broadcast_summary(message)
 
             # 3. Créer un nouveau message de progression
             original_message = await context.bot.send_message(
@@ -97,72 +506,35 @@ class AdminFeatures:
                 parse_mode='HTML'
             )
 
-            # 4. Envoi du broadcast aux utilisateurs
-            admin_id = str(update.effective_user.id)
-            total_users = len(self._users)
-            current = 0
+            if message.media_group_id:
+                # Album : la diffusion part quand tous les médias sont arrivés
+                album = {
+                    'media_group_id': message.media_group_id,
+                    'chat_id': chat_id,
+                    'admin_id': update.effective_user.id,
+                    'progress_message_id': original_message.message_id,
+                    'message_ids': [message.message_id],
+                }
+                context.user_data['broadcast_album'] = album
+                self._schedule_album_broadcast(context, album)
+                return "CHOOSING"
 
-            for user_id in self._users.keys():
-                if user_id == admin_id:
-                    continue
-                try:
-                    if update.message.photo:
-                        await context.bot.send_photo(
-                            chat_id=user_id,
-                            photo=update.message.photo[-1].file_id,
-                            caption=update.message.caption,
-                            caption_entities=update.message.caption_entities
-                        )
-                    elif update.message.text:
-                        await context.bot.send_message(
-                            chat_id=user_id,
-                            text=update.message.text,
-                            entities=update.message.entities
-                        )
-                    success += 1
-                except Exception as e:
-                    print(f"Erreur envoi à {user_id}: {e}")
-                    failed += 1
-    
-                current += 1
-                if current % 5 == 0:
-                    try:
-                        await original_message.edit_text(
-                            f"📤 <b>Envoi en cours...</b>\n\n"
-                            f"Progression : {current}/{total_users}",
-                            parse_mode='HTML'
-                        )
-                    except Exception as e:
-                        print(f"Erreur mise à jour progression: {e}")
-
-            # 6. Mettre à jour avec le rapport final
-            report_text = (
-                "✅ <b>Message diffusé avec succès !</b>\n\n"
-                f"📊 <b>Rapport d'envoi :</b>\n"
-                f"• Message : <i>{message_content}</i>\n"
-                f"• Envois réussis : {success}\n"
-                f"• Échecs : {failed}\n"
-                f"• Total : {success + failed}"
-            )
-
-            await original_message.edit_text(
-                text=report_text,
-                parse_mode='HTML',
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("🔙 Retour au menu admin", callback_data="admin")
-                ]])
+            # 4. Enregistrer la diffusion puis l'envoyer (copie du message d'origine)
+            await self._launch_broadcast(
+                context.bot,
+                chat_id,
+                update.effective_user.id,
+                original_message.message_id,
+                message_content,
+                self._broadcast_content(chat_id, [message.message_id])
             )
 
             return "CHOOSING"
 
         except Exception as e:
             print(f"Erreur dans send_broadcast_message: {e}")
-            error_text = (
-                "❌ <b>Une erreur est survenue lors de la diffusion.</b>\n\n"
-                f"Messages envoyés avant l'erreur :\n"
-                f"• Message : <i>{message_content if 'message_content' in locals() else 'Non disponible'}</i>\n"
-                f"• Réussis : {success}\n"
-                f"• Échecs : {failed}"
+            error_text = self._broadcast_error_text(
+                message_content if 'message_content' in locals() else 'Non disponible', 0, 0
             )
 
             if original_message:
@@ -193,14 +565,15 @@ class AdminFeatures:
         """Gère l'affichage des statistiques utilisateurs"""
         try:
             text = "👥 *Gestion des utilisateurs*\n\n"
-            text += f"Utilisateurs enregistrés : {len(self._users)}\n\n"
+            text += f"Utilisateurs enregistrés : {len(self._users)}\n"
+            text += f"Injoignables (exclus des annonces) : {self._users.unreachable_count}\n\n"
         
             if self._users:
                 text += "Derniers utilisateurs actifs :\n"
-                for user_id, user_data in list(self._users.items())[:10]:
-                    username = user_data.get('username', 'Sans nom')
+                for user_id, record in self._users.recent(10):
+                    username = record.username or 'Sans nom'
                     username = username.replace('_', '\\_').replace('*', '\\*').replace('`', '\\`')
-                    last_seen = user_data.get('last_seen', 'Jamais')
+                    last_seen = format_last_seen(record.last_seen)
                     text += f"• {username} \\- Dernière activité : {last_seen}\n"
             else:
                 text += "Aucun utilisateur enregistré."
@@ -223,9 +596,9 @@ class AdminFeatures:
             
                 if self._users:
                     text += "Derniers utilisateurs actifs :\n"
-                    for user_id, user_data in list(self._users.items())[:10]:
-                        username = user_data.get('username', 'Sans nom')
-                        last_seen = user_data.get('last_seen', 'Jamais')
+                    for user_id, record in self._users.recent(10):
+                        username = record.username or 'Sans nom'
+                        last_seen = format_last_seen(record.last_seen)
                         text += f"• {username} - Dernière activité : {last_seen}\n"
                 else:
                     text += "Aucun utilisateur enregistré."
@@ -251,6 +624,7 @@ class AdminFeatures:
         try:
             keyboard.insert(-1, [InlineKeyboardButton("👥 Gérer utilisateurs", callback_data="manage_users")])
             keyboard.insert(-1, [InlineKeyboardButton("📢 Envoyer une annonce", callback_data="start_broadcast")])
+            keyboard.insert(-1, [InlineKeyboardButton("📡 Suivi des diffusions", callback_data="broadcast_status")])
         except Exception as e:
             print(f"Erreur lors de l'ajout des boutons admin : {e}")
         return keyboard
\ No newline at end of file
@@ -1,10 +1,23 @@
 ﻿from handlers.admin_features import AdminFeatures
 from modules.access_manager import AccessManager
+from modules.backup import BackupManager
+from modules.broadcast import BroadcastEngine
+from modules.broadcast_history import BroadcastHistory
+from modules.catalog_store import apply_catalog_op
+from modules.callback_router import CallbackRouter
+from modules.catalog_index import CatalogIndex, category_id
+from modules.catalog_writer import CatalogWriter
+from modules.cleanup_queue import CleanupQueue
+from modules.deferred_transitions import DeferredTransitions
+from modules.keyboard_cache import KeyboardCache
+from modules.media_carousel import replace_media, send_media
+from modules.pagination import NOOP_CALLBACK, navigation_row, paginate
+from modules.stats_store import StatsStore
+from modules.storage import create_storage
 import json
 import logging
 import asyncio
-import shutil
-import os
+import tempfile
 import re
 from datetime import datetime, time
 import pytz
@@ -20,8 +33,6 @@ from telegram.ext import (
 )
 paris_tz = pytz.timezone('Europe/Paris')
 
-STATS_CACHE = None
-LAST_CACHE_UPDATE = None
 admin_features = None
 
 # Désactiver les logs de httpx
@@ -51,97 +62,268 @@ except KeyError as e:
     print(f"Erreur: La clé {e} est manquante dans le fichier config.json!")
     exit(1)
 
+# Version de la configuration, incrémentée à chaque écriture de CONFIG
+config_version = 0
+
+def save_config():
+    """Écrit CONFIG dans config.json et invalide les rendus qui en dépendent"""
+    global config_version
+    with open('config/config.json', 'w', encoding='utf-8') as f:
+        json.dump(CONFIG, f, indent=4)
+    config_version += 1
+
+# Stockage (JSON ou SQLite selon CONFIG['storage_backend'])
+storage = create_storage(CONFIG)
+
+# Compteurs de vues, séparés du catalogue
+stats_store = StatsStore(storage)
+
 # Fonctions de gestion du catalogue
 def load_catalog():
-    try:
-        with open(CONFIG['catalog_file'], 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {}
+    """Charge le catalogue depuis le stockage"""
+    return storage.load_catalog()
 
 def save_catalog(catalog):
-    with open(CONFIG['catalog_file'], 'w', encoding='utf-8') as f:
-        json.dump(catalog, f, indent=4, ensure_ascii=False)
+    """Écrit le catalogue complet (compaction du journal en mode JSON)"""
+    storage.save_catalog(catalog)
+
+# Écriture différée : les handlers ne bloquent jamais sur le disque
+catalog_writer = CatalogWriter(
+    storage,
+    flush_interval=CONFIG.get('catalog_flush_interval_ms', 500) / 1000,
+    max_pending=CONFIG.get('catalog_flush_max_pending', 100)
+)
 
-def clean_stats():
-    """Nettoie les statistiques des produits et catégories qui n'existent plus"""
-    if 'stats' not in CATALOG:
+# Suppression des anciens messages en tâche de fond, regroupée par chat
+cleanup_queue = CleanupQueue(
+    concurrency=CONFIG.get('cleanup_concurrency', 5),
+    coalesce_delay=CONFIG.get('cleanup_coalesce_ms', 200) / 1000
+)
+
+# Retours au menu après un message de confirmation, sans bloquer le handler
+deferred_transitions = DeferredTransitions(delay=CONFIG.get('confirmation_delay', 3))
+
+# Index identifiant -> catégorie / produit (callback_data courts et sans ambiguïté)
+catalog_index = CatalogIndex()
+
+def update_catalog(op):
+    """Applique une mutation au catalogue en mémoire et la met en file d'écriture"""
+    invalidate_product_cards(op)
+    apply_catalog_op(CATALOG, op)
+    catalog_index.rebuild(CATALOG)
+    catalog_writer.record(op)
+
+# Claviers des menus, partagés entre utilisateurs jusqu'à la prochaine mutation
+keyboard_cache = KeyboardCache()
+
+# Nombre de boutons par page dans les menus de catégories et de produits
+MENU_PAGE_SIZE = CONFIG.get('menu_page_size', 20)
+
+# Menus de choix de catégorie : nom -> (préfixe des boutons, texte et callback du bouton retour)
+CATEGORY_MENUS = {
+    'view': ("view_", "🔙 Retour à l'accueil", "back_to_home"),
+    'add': ("select_category_", "🔙 Annuler", "cancel_add_product"),
+    'edit': ("editcat_", "🔙 Annuler", "cancel_edit"),
+    'delete': ("confirm_delete_category_", "🔙 Annuler", "cancel_delete_category"),
+    'delete_product': ("delete_product_category_", "🔙 Annuler", "cancel_delete_product"),
+}
+
+# Menus de choix de produit : nom -> (préfixe des boutons, texte et callback du bouton retour)
+PRODUCT_MENUS = {
+    'view': ("product_", "🔙 Retour au menu", "show_categories"),
+    'edit': ("editp_", "🔙 Annuler", "cancel_edit"),
+    'delete': ("confirm_delete_product_", "🔙 Annuler", "cancel_delete_product"),
+}
+
+def categories_keyboard(menu, page=0):
+    """Page du clavier d'une ligne par catégorie, suivie d'un bouton retour/annuler"""
+    def build():
+        callback_prefix, back_text, back_callback = CATEGORY_MENUS[menu]
+        categories = [category for category in CATALOG.keys() if category != 'stats']
+        categories, current, page_count = paginate(categories, page, MENU_PAGE_SIZE)
+        keyboard = [
+            [InlineKeyboardButton(category, callback_data=f"{callback_prefix}{category_id(category)}")]
+            for category in categories
+        ]
+        navigation = navigation_row(current, page_count, f"cpage_{menu}_")
+        if navigation:
+            keyboard.append(navigation)
+        keyboard.append([InlineKeyboardButton(back_text, callback_data=back_callback)])
+        return InlineKeyboardMarkup(keyboard)
+    return keyboard_cache.get(('categories', menu, page), catalog_index.version, build)
+
+def products_keyboard(category, page=0, menu='view'):
+    """Page du clavier des produits d'une catégorie, suivie d'un bouton retour/annuler"""
+    def build():
+        callback_prefix, back_text, back_callback = PRODUCT_MENUS[menu]
+        products, current, page_count = paginate(CATALOG[category], page, MENU_PAGE_SIZE)
+        keyboard = [
+            [InlineKeyboardButton(product['name'], callback_data=f"{callback_prefix}{product['id']}")]
+            for product in products
+        ]
+        navigation = navigation_row(current, page_count, f"ppage_{menu}_{category_id(category)}_")
+        if navigation:
+            keyboard.append(navigation)
+        keyboard.append([InlineKeyboardButton(back_text, callback_data=back_callback)])
+        return InlineKeyboardMarkup(keyboard)
+    return keyboard_cache.get(('products', menu, category, page), catalog_index.version, build)
+
+# Écran d'accueil : une variante admin et une non-admin par version de CONFIG
+home_screen_cache = KeyboardCache()
+
+def render_home_screen(is_admin):
+    """Texte et clavier de l'écran d'accueil (mémoïsés jusqu'au prochain save_config)"""
+    def build():
+        welcome_text = CONFIG.get('welcome_message',
+            "🌿 <b>Bienvenue sur votre bot !</b> 🌿\n\n"
+            "<b>Pour changer ce message d accueil, rendez vous dans l onglet admin.</b>\n"
+            "📋 Cliquez sur MENU pour voir les catégories"
+        )
+
+        keyboard = [
+            [InlineKeyboardButton("📋 MENU", callback_data="show_categories")]
+        ]
+
+        # Ajouter le bouton admin si l'utilisateur est administrateur
+        if is_admin:
+            keyboard.append([InlineKeyboardButton("🔧 Menu Admin", callback_data="admin")])
+
+        # Configurer le bouton de contact en fonction du type (URL ou username)
+        contact_button = None
+        if CONFIG.get('contact_url'):
+            contact_button = InlineKeyboardButton("📞 Contact", url=CONFIG['contact_url'])
+        elif CONFIG.get('contact_username'):
+            contact_button = InlineKeyboardButton("📞 Contact Telegram", url=f"https://t.me/{CONFIG['contact_username']}")
+
+        # Ajouter les boutons de contact et canaux
+        if contact_button:
+            keyboard.extend([
+                [
+                    contact_button,
+                    InlineKeyboardButton("💭 Tchat telegram", url="https://t.me/+YsJIgYjY8_cyYzBk"),
+                ],
+                [InlineKeyboardButton("🥔 Canal potato", url="https://doudlj.org/joinchat/QwqUM5gH7Q8VqO3SnS4YwA")]
+            ])
+        else:
+            keyboard.extend([
+                [InlineKeyboardButton("💭 Tchat telegram", url="https://t.me/+YsJIgYjY8_cyYzBk")],
+                [InlineKeyboardButton("🥔 Canal potato", url="https://doudlj.org/joinchat/QwqUM5gH7Q8VqO3SnS4YwA")]
+            ])
+
+        return welcome_text, InlineKeyboardMarkup(keyboard)
+    return home_screen_cache.get(is_admin, config_version, build)
+
+# Fiches produit (légende, médias triés, clavier), invalidées produit par produit
+product_cards = KeyboardCache()
+
+def product_card(category, product):
+    """(légende HTML, médias triés par order_index, clavier) d'un produit"""
+    def build():
+        caption = f"📱 <b>{product['name']}</b>\n\n"
+        caption += f"💰 <b>Prix:</b>\n{product['price']}\n\n"
+        caption += f"📝 <b>Description:</b>\n{product['description']}"
+
+        media_list = sorted(product.get('media') or [], key=lambda x: x.get('order_index', 0))
+
+        keyboard = [[
+            InlineKeyboardButton("🔙 Retour à la catégorie", callback_data=f"view_{category_id(category)}"),
+            InlineKeyboardButton(
+                "🛒 Commander",
+                **({"url": CONFIG['order_url']} if CONFIG.get('order_url')
+                   else {"callback_data": "show_order_text"})
+            )
+        ]]
+        if len(media_list) > 1:
+            keyboard.insert(0, [
+                InlineKeyboardButton("⬅️ Précédent", callback_data=f"prev_media_{product['id']}"),
+                InlineKeyboardButton("➡️ Suivant", callback_data=f"next_media_{product['id']}")
+            ])
+
+        return caption, media_list, InlineKeyboardMarkup(keyboard)
+    return product_cards.get(product['id'], config_version, build)
+
+def invalidate_product_cards(op):
+    """Oublie les fiches des produits modifiés ou supprimés par op"""
+    kind = op["op"]
+    if kind in ("edit_product", "delete_product"):
+        products = [p for p in CATALOG.get(op["category"], []) if p['name'] == op["name"]]
+    elif kind == "delete_category":
+        products = CATALOG.get(op["category"], [])
+    else:
         return
-    
-    stats = CATALOG['stats']
-    
-    # Nettoyer les vues par catégorie
-    if 'category_views' in stats:
-        categories_to_remove = []
-        for category in stats['category_views']:
-            if category not in CATALOG or category == 'stats':
-                categories_to_remove.append(category)
-        
-        for category in categories_to_remove:
-            del stats['category_views'][category]
-            print(f"🧹 Suppression des stats de la catégorie: {category}")
-
-    # Nettoyer les vues par produit
-    if 'product_views' in stats:
-        categories_to_remove = []
-        for category in stats['product_views']:
-            if category not in CATALOG or category == 'stats':
-                categories_to_remove.append(category)
-                continue
-            
-            products_to_remove = []
-            existing_products = [p['name'] for p in CATALOG[category]]
-            
-            for product_name in stats['product_views'][category]:
-                if product_name not in existing_products:
-                    products_to_remove.append(product_name)
-            
-            # Supprimer les produits qui n'existent plus
-            for product in products_to_remove:
-                del stats['product_views'][category][product]
-                print(f"🧹 Suppression des stats du produit: {product} dans {category}")
-            
-            # Si la catégorie est vide après nettoyage, la marquer pour suppression
-            if not stats['product_views'][category]:
-                categories_to_remove.append(category)
-        
-        # Supprimer les catégories vides
-        for category in categories_to_remove:
-            if category in stats['product_views']:
-                del stats['product_views'][category]
+    for product in products:
+        product_cards.invalidate(product.get('id'))
 
-    # Mettre à jour la date de dernière modification
-    stats['last_updated'] = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-    save_catalog(CATALOG)
+async def compact_catalog(context: ContextTypes.DEFAULT_TYPE):
+    """Tâche périodique : replie le journal du catalogue dans un nouvel instantané"""
+    if storage.needs_compaction():
+        try:
+            await catalog_writer.compact(CATALOG)
+        except Exception as e:
+            print(f"Erreur lors de la compaction du catalogue: {e}")
+
+async def post_init(application: Application):
+    """Démarre les tâches de fond une fois la boucle de l'application lancée"""
+    await catalog_writer.start()
+    await cleanup_queue.start(application.bot)
+    await admin_features.resume_broadcasts(application.bot)
+
+async def post_stop(application: Application):
+    """Interrompt les diffusions et vide la file de suppressions tant que le Bot est encore utilisable"""
+    await admin_features.stop_broadcasts()
+    await cleanup_queue.stop()
+
+async def post_shutdown(application: Application):
+    """Écrit les dernières mutations avant l'arrêt du bot"""
+    await catalog_writer.stop()
+    await stats_store.save()
+    if admin_features is not None:
+        await admin_features.flush_users()
+
+def clean_stats():
+    """Nettoie les statistiques des produits et catégories qui n'existent plus"""
+    stats_store.clean(CATALOG)
 
 def get_stats():
-    global STATS_CACHE, LAST_CACHE_UPDATE
-    current_time = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-    
-    # Si le cache existe et a moins de 30 secondes
-    if STATS_CACHE and LAST_CACHE_UPDATE and (current_time - LAST_CACHE_UPDATE).seconds < 30:
-        return STATS_CACHE
-        
-    # Sinon, lire le fichier et mettre à jour le cache
-    STATS_CACHE = load_catalog()['stats']
-    LAST_CACHE_UPDATE = current_time
-    return STATS_CACHE
+    """Statistiques de vues (tenues en mémoire par stats_store)"""
+    return stats_store.stats
+
+async def flush_users(context: ContextTypes.DEFAULT_TYPE):
+    """Tâche périodique : écrit les utilisateurs dont last_seen a changé"""
+    await admin_features.flush_users()
+
+async def save_stats(context: ContextTypes.DEFAULT_TYPE):
+    """Tâche périodique : écrit un instantané des compteurs de vues"""
+    await stats_store.save()
+
+# Sauvegardes incrémentales (restauration : python -m modules.backup restore <id>)
+backup_manager = BackupManager(
+    CONFIG.get('backup_dir', 'backups'),
+    keep_hourly=CONFIG.get('backup_keep_hourly', 24),
+    keep_daily=CONFIG.get('backup_keep_daily', 7)
+)
 
 def backup_data():
-    """Crée une sauvegarde des fichiers de données"""
-    backup_dir = "backups"
-    if not os.path.exists(backup_dir):
-        os.makedirs(backup_dir)
-    
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    
-    # Backup config.json
-    if os.path.exists("config/config.json"):
-        shutil.copy2("config/config.json", f"{backup_dir}/config_{timestamp}.json")
-    
-    # Backup catalog.json
-    if os.path.exists("config/catalog.json"):
-        shutil.copy2("config/catalog.json", f"{backup_dir}/catalog_{timestamp}.json")
+    """Crée une sauvegarde de la configuration et de toutes les données"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        sources = {"config/config.json": "config/config.json"}
+        sources.update(storage.backup_sources(tmp_dir))
+        # Diffusions en cours (curseurs) et historique des rapports
+        history_file = admin_features.broadcast_history.history_file
+        sources[history_file] = history_file
+        snapshot_id = backup_manager.create(sources)
+    backup_manager.prune()
+    return snapshot_id
+
+async def run_backup(context: ContextTypes.DEFAULT_TYPE):
+    """Tâche périodique : écrit les données en attente puis crée une sauvegarde"""
+    try:
+        await catalog_writer.flush()
+        await stats_store.save()
+        await admin_features.flush_users()
+        await asyncio.to_thread(backup_data)
+    except Exception as e:
+        print(f"Erreur lors de la sauvegarde: {e}")
 
 def print_catalog_debug():
     """Fonction de debug pour afficher le contenu du catalogue"""
@@ -176,6 +358,11 @@ WAITING_WELCOME_MESSAGE = "WAITING_WELCOME_MESSAGE"  # Ajout de cette ligne
 
 # Charger le catalogue au démarrage
 CATALOG = load_catalog()
+# Les anciennes statistiques stockées dans le catalogue passent dans stats_store
+stats_store.import_legacy(CATALOG.pop('stats', None))
+# Attribuer un identifiant aux produits qui n'en ont pas encore
+if catalog_index.rebuild(CATALOG):
+    save_catalog(CATALOG)
 
 # Fonctions de base
 
@@ -184,46 +371,27 @@ async def handle_access_code(update: Update, context: ContextTypes.DEFAULT_TYPE)
     user_id = update.effective_user.id
     code = update.message.text.strip()
     chat_id = update.effective_chat.id
-    
-    try:
-        # Supprimer le message de l'utilisateur contenant le code
-        await update.message.delete()
-    except Exception as e:
-        pass
 
     is_valid, reason = access_manager.verify_code(code, user_id)
     
     if is_valid:
-        try:
-            # Supprimer tous les messages précédents dans le chat (y compris le message de bienvenue)
-            current_message_id = update.message.message_id
-            
-            # Supprimer les 15 derniers messages pour s'assurer que tout est nettoyé
-            for i in range(current_message_id - 15, current_message_id + 1):
-                try:
-                    await context.bot.delete_message(chat_id=chat_id, message_id=i)
-                except Exception as e:
-                    pass  # Ignorer silencieusement les erreurs de suppression
-                    
-            # S'assurer que le message de bienvenue initial est supprimé
-            if 'initial_welcome_message_id' in context.user_data:
-                try:
-                    await context.bot.delete_message(
-                        chat_id=chat_id,
-                        message_id=context.user_data['initial_welcome_message_id']
-                    )
-                except Exception as e:
-                    pass
-                
-            # Nettoyer les données stockées
-            context.user_data.clear()  # Nettoyer toutes les données stockées
-            
-        except Exception as e:
-            pass  # Ignorer silencieusement les erreurs
-        
-        # Redirection vers le menu principal sans messages supplémentaires
-        return await start(update, context)
+        # Messages à nettoyer : les 15 derniers (dont le code saisi) et le message de bienvenue initial
+        current_message_id = update.message.message_id
+        message_ids = list(range(current_message_id - 15, current_message_id + 1))
+        if 'initial_welcome_message_id' in context.user_data:
+            message_ids.append(context.user_data['initial_welcome_message_id'])
+
+        # Nettoyer les données stockées
+        context.user_data.clear()
+
+        # Afficher le menu principal d'abord, le nettoyage se fait en tâche de fond
+        state = await start(update, context, delete_command=False)
+        cleanup_queue.enqueue(chat_id, *message_ids)
+        return state
     else:
+        # Supprimer le message de l'utilisateur contenant le code
+        cleanup_queue.enqueue(chat_id, update.message.message_id)
+
         # Gérer le code invalide avec une popup au lieu d'un message
         error_messages = {
             "expired": "❌ Ce code a expiré",
@@ -273,23 +441,31 @@ async def admin_list_codes(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     message = "📝 Codes actifs :\n\n"
     for code in active_codes:
-        exp_date = datetime.fromisoformat(code["expiration"])
-        exp_str = exp_date.strftime("%d/%m/%Y %H:%M")
+        exp_str = code["expires_at"].strftime("%d/%m/%Y %H:%M")
         message += f"Code: `{code['code']}`\n"
         message += f"Expire le: {exp_str}\n\n"
 
     await update.message.reply_text(message, parse_mode='Markdown')
 
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def purge_access_codes(context: ContextTypes.DEFAULT_TYPE):
+    """Tâche périodique : supprime les codes d'accès expirés"""
+    try:
+        purged = access_manager.purge_expired_codes()
+        if purged:
+            print(f"🧹 {purged} code(s) d'accès expiré(s) supprimé(s)")
+    except Exception as e:
+        print(f"Erreur lors de la purge des codes d'accès: {e}")
+
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE, delete_command: bool = True):
     chat_id = update.effective_chat.id
     user = update.effective_user
     
     # Supprimer silencieusement la commande /start si possible
-    if hasattr(update, 'message') and update.message:
-        try:
-            await update.message.delete()
-        except Exception:
-            pass
+    if delete_command and hasattr(update, 'message') and update.message:
+        cleanup_queue.enqueue(update.effective_chat.id, update.message.message_id)
+
+    # Annuler un retour au menu d'administration encore en attente
+    cancel_deferred_transition(chat_id)
     
     # Enregistrer utilisateur
     await admin_features.register_user(user)
@@ -298,13 +474,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not access_manager.is_authorized(user.id):
         # Supprimer l'ancien message de bienvenue s'il existe
         if 'initial_welcome_message_id' in context.user_data:
-            try:
-                await context.bot.delete_message(
-                    chat_id=chat_id,
-                    message_id=context.user_data['initial_welcome_message_id']
-                )
-            except Exception:
-                pass
+            cleanup_queue.enqueue(chat_id, context.user_data['initial_welcome_message_id'])
         
         # Envoyer le nouveau message de bienvenue
         welcome_msg = await context.bot.send_message(
@@ -317,62 +487,14 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     # Supprimer les anciens messages si nécessaire
     if 'menu_message_id' in context.user_data:
-        try:
-            await context.bot.delete_message(
-                chat_id=chat_id,
-                message_id=context.user_data['menu_message_id']
-            )
-        except:
-            pass
+        cleanup_queue.enqueue(chat_id, context.user_data['menu_message_id'])
     
     # Supprimer l'ancienne bannière si elle existe
     if 'banner_message_id' in context.user_data:
-        try:
-            await context.bot.delete_message(
-                chat_id=chat_id,
-                message_id=context.user_data['banner_message_id']
-            )
-            del context.user_data['banner_message_id']
-        except:
-            pass
+        cleanup_queue.enqueue(chat_id, context.user_data.pop('banner_message_id'))
     
-    # Nouveau clavier simplifié pour l'accueil
-    keyboard = [
-        [InlineKeyboardButton("📋 MENU", callback_data="show_categories")]
-    ]
-
-    # Définir le texte de bienvenue ici, avant les boutons
-    welcome_text = CONFIG.get('welcome_message', 
-        "🌿 <b>Bienvenue sur votre bot !</b> 🌿\n\n"
-        "<b>Pour changer ce message d accueil, rendez vous dans l onglet admin.</b>\n"
-        "📋 Cliquez sur MENU pour voir les catégories"
-    )
-
-    # Ajouter le bouton admin si l'utilisateur est administrateur
-    if str(update.effective_user.id) in ADMIN_IDS:
-        keyboard.append([InlineKeyboardButton("🔧 Menu Admin", callback_data="admin")])
-
-    # Configurer le bouton de contact en fonction du type (URL ou username)
-    contact_button = None
-    if CONFIG.get('contact_url'):
-        contact_button = InlineKeyboardButton("📞 Contact", url=CONFIG['contact_url'])
-    elif CONFIG.get('contact_username'):
-        contact_button = InlineKeyboardButton("📞 Contact Telegram", url=f"https://t.me/{CONFIG['contact_username']}")
-
-    # Ajouter les boutons de contact et canaux
-    if contact_button:
-        keyboard.extend([
-            [
-                contact_button,
-                InlineKeyboardButton("💭 Tchat telegram", url="https://t.me/+YsJIgYjY8_cyYzBk"),
-            ],
-            [InlineKeyboardButton("🥔 Canal potato", url="https://doudlj.org/joinchat/QwqUM5gH7Q8VqO3SnS4YwA")]
-        ])
-    else:
-        keyboard.extend([
-            [InlineKeyboardButton("💭 Tchat telegram", url="https://t.me/+YsJIgYjY8_cyYzBk")],
-            [InlineKeyboardButton("🥔 Canal potato", url="https://doudlj.org/joinchat/QwqUM5gH7Q8VqO3SnS4YwA")]
-        ])
+    # Texte et clavier d'accueil (mis en cache)
+    welcome_text, reply_markup = render_home_screen(str(update.effective_user.id) in ADMIN_IDS)
 
     try:
         # Vérifier si une image banner est configurée
@@ -387,7 +509,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         menu_message = await context.bot.send_message(
             chat_id=chat_id,
             text=welcome_text,
-            reply_markup=InlineKeyboardMarkup(keyboard),
+            reply_markup=reply_markup,
             parse_mode='HTML'  
         )
         context.user_data['menu_message_id'] = menu_message.message_id
@@ -398,7 +520,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         menu_message = await context.bot.send_message(
             chat_id=chat_id,
             text=welcome_text,
-            reply_markup=InlineKeyboardMarkup(keyboard),
+            reply_markup=reply_markup,
             parse_mode='HTML'
         )
         context.user_data['menu_message_id'] = menu_message.message_id
@@ -409,7 +531,8 @@ async def admin(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Commande pour accéder au menu d'administration"""
     if str(update.effective_user.id) in ADMIN_IDS:
         # Supprimer le message /admin
-        await update.message.delete()
+        cleanup_queue.enqueue(update.effective_chat.id, update.message.message_id)
+        cancel_deferred_transition(update.effective_chat.id)
         
         # Supprimer les anciens messages si leurs IDs sont stockés
         messages_to_delete = ['menu_message_id', 'banner_message_id', 'category_message_id', 
@@ -417,14 +540,7 @@ async def admin(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         for message_key in messages_to_delete:
             if message_key in context.user_data:
-                try:
-                    await context.bot.delete_message(
-                        chat_id=update.effective_chat.id,
-                        message_id=context.user_data[message_key]
-                    )
-                    del context.user_data[message_key]
-                except Exception as e:
-                    print(f"Erreur lors de la suppression du message {message_key}: {e}")
+                cleanup_queue.enqueue(update.effective_chat.id, context.user_data.pop(message_key))
         
         # Envoyer la bannière d'abord si elle existe
         if CONFIG.get('banner_image'):
@@ -442,8 +558,8 @@ async def admin(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ Vous n'êtes pas autorisé à accéder au menu d'administration.")
         return ConversationHandler.END
 
-async def show_admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Affiche le menu d'administration"""
+async def admin_menu():
+    """Texte et clavier du menu d'administration"""
     keyboard = [
         [InlineKeyboardButton("➕ Ajouter une catégorie", callback_data="add_category")],
         [InlineKeyboardButton("➕ Ajouter un produit", callback_data="add_product")],
@@ -464,19 +580,24 @@ async def show_admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "🔧 *Menu d'administration*\n\n"
         "Sélectionnez une action à effectuer :"
     )
+    return admin_text, InlineKeyboardMarkup(keyboard)
+
+async def show_admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Affiche le menu d'administration"""
+    admin_text, reply_markup = await admin_menu()
 
     try:
         if update.callback_query:
             message = await update.callback_query.edit_message_text(
                 admin_text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
+                reply_markup=reply_markup,
                 parse_mode='Markdown'
             )
             context.user_data['menu_message_id'] = message.message_id
         else:
             message = await update.message.reply_text(
                 admin_text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
+                reply_markup=reply_markup,
                 parse_mode='Markdown'
             )
             context.user_data['menu_message_id'] = message.message_id
@@ -485,12 +606,51 @@ async def show_admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await context.bot.send_message(
             chat_id=update.effective_chat.id,
             text=admin_text,
-            reply_markup=InlineKeyboardMarkup(keyboard),
+            reply_markup=reply_markup,
+            parse_mode='Markdown'
+        )
+
+    return CHOOSING
+
+async def return_to_admin_menu(context: ContextTypes.DEFAULT_TYPE):
+    """Tâche différée : remplace le message de confirmation par le menu d'administration"""
+    job = context.job
+    admin_text, reply_markup = await admin_menu()
+
+    try:
+        message = await context.bot.edit_message_text(
+            chat_id=job.chat_id,
+            message_id=job.data,
+            text=admin_text,
+            reply_markup=reply_markup,
+            parse_mode='Markdown'
+        )
+    except Exception as e:
+        print(f"Erreur lors du retour au menu d'administration: {e}")
+        cleanup_queue.enqueue(job.chat_id, job.data)
+        message = await context.bot.send_message(
+            chat_id=job.chat_id,
+            text=admin_text,
+            reply_markup=reply_markup,
             parse_mode='Markdown'
         )
+    context.user_data['menu_message_id'] = message.message_id
 
+def schedule_admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE, confirmation_message):
+    """Affiche le menu d'administration à la place de la confirmation après quelques secondes"""
+    deferred_transitions.schedule(
+        context.job_queue,
+        update.effective_chat.id,
+        return_to_admin_menu,
+        confirmation_message.message_id,
+        user_id=update.effective_user.id
+    )
     return CHOOSING
 
+def cancel_deferred_transition(chat_id: int):
+    """Annule le retour au menu en attente et supprime le message de confirmation"""
+    cleanup_queue.enqueue(chat_id, deferred_transitions.cancel(chat_id))
+
 async def handle_order_button_config(update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Gère la configuration du bouton Commander"""
         # Utiliser text_html pour capturer le formatage, sinon utiliser le texte normal
@@ -498,7 +658,7 @@ async def handle_order_button_config(update: Update, context: ContextTypes.DEFAU
     
         try:
             # Supprimer le message de l'utilisateur
-            await update.message.delete()
+            cleanup_queue.enqueue(update.effective_chat.id, update.message.message_id)
         
             # Mettre à jour la config selon le format
             if new_config.startswith(('http://', 'https://')):
@@ -521,18 +681,11 @@ async def handle_order_button_config(update: Update, context: ContextTypes.DEFAU
                 button_type = "texte"
             
             # Sauvegarder dans config.json
-            with open('config/config.json', 'w', encoding='utf-8') as f:
-                json.dump(CONFIG, f, indent=4)
+            save_config()
         
             # Supprimer l'ancien message si possible
             if 'edit_order_button_message_id' in context.user_data:
-                try:
-                    await context.bot.delete_message(
-                        chat_id=update.effective_chat.id,
-                        message_id=context.user_data['edit_order_button_message_id']
-                    )
-                except:
-                    pass
+                cleanup_queue.enqueue(update.effective_chat.id, context.user_data['edit_order_button_message_id'])
         
             # Message de confirmation avec le @ ajouté si c'est un pseudo Telegram sans @
             display_value = new_config
@@ -547,14 +700,8 @@ async def handle_order_button_config(update: Update, context: ContextTypes.DEFAU
                 parse_mode='HTML'
             )
         
-            # Attendre 3 secondes puis supprimer le message de confirmation
-            await asyncio.sleep(3)
-            try:
-                await success_message.delete()
-            except:
-                pass
-        
-            return await show_admin_menu(update, context)
+            # Retour au menu dans quelques secondes, sans bloquer le handler
+            return schedule_admin_menu(update, context, success_message)
         
         except Exception as e:
             print(f"Erreur dans handle_order_button_config: {e}")
@@ -568,10 +715,7 @@ async def handle_banner_image(update: Update, context: ContextTypes.DEFAULT_TYPE
 
     # Supprimer le message précédent
     if 'banner_msg' in context.user_data:
-        await context.bot.delete_message(
-            chat_id=context.user_data['banner_msg'].chat_id,
-            message_id=context.user_data['banner_msg'].message_id
-        )
+        cleanup_queue.enqueue(context.user_data['banner_msg'].chat_id, context.user_data['banner_msg'].message_id)
         del context.user_data['banner_msg']
 
     # Obtenir l'ID du fichier de la photo
@@ -579,11 +723,10 @@ async def handle_banner_image(update: Update, context: ContextTypes.DEFAULT_TYPE
     CONFIG['banner_image'] = file_id
 
     # Sauvegarder la configuration
-    with open('config/config.json', 'w', encoding='utf-8') as f:
-        json.dump(CONFIG, f, indent=4)
+    save_config()
 
     # Supprimer le message contenant l'image
-    await update.message.delete()
+    cleanup_queue.enqueue(update.effective_chat.id, update.message.message_id)
 
     thread_id = update.message.message_thread_id if update.message.is_topic_message else None
 
@@ -593,11 +736,8 @@ async def handle_banner_image(update: Update, context: ContextTypes.DEFAULT_TYPE
         message_thread_id=thread_id
     )
 
-    # Attendre 3 secondes et supprimer le message
-    await asyncio.sleep(3)
-    await success_msg.delete()
-
-    return await show_admin_menu(update, context)
+    # Retour au menu dans quelques secondes, sans bloquer le handler
+    return schedule_admin_menu(update, context, success_msg)
 
 async def handle_category_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Gère l'ajout d'une nouvelle catégorie"""
@@ -643,17 +783,13 @@ async def handle_category_name(update: Update, context: ContextTypes.DEFAULT_TYP
         )
         return WAITING_CATEGORY_NAME
     
-    CATALOG[category_name] = []
-    save_catalog(CATALOG)
+    update_catalog({"op": "add_category", "category": category_name})
     
     # Supprimer le message précédent
-    await context.bot.delete_message(
-        chat_id=update.effective_chat.id,
-        message_id=update.message.message_id - 1
-    )
+    cleanup_queue.enqueue(update.effective_chat.id, update.message.message_id - 1)
     
     # Supprimer le message de l'utilisateur
-    await update.message.delete()
+    cleanup_queue.enqueue(update.effective_chat.id, update.message.message_id)
     
     return await show_admin_menu(update, context)
 
@@ -674,10 +810,7 @@ async def handle_product_name(update: Update, context: ContextTypes.DEFAULT_TYPE
     context.user_data['temp_product_name'] = product_name
     
     # Supprimer le message précédent
-    await context.bot.delete_message(
-        chat_id=update.effective_chat.id,
-        message_id=update.message.message_id - 1
-    )
+    cleanup_queue.enqueue(update.effective_chat.id, update.message.message_id - 1)
     
     await update.message.reply_text(
         "💰 Veuillez entrer le prix du produit:",
@@ -687,7 +820,7 @@ async def handle_product_name(update: Update, context: ContextTypes.DEFAULT_TYPE
     )
     
     # Supprimer le message de l'utilisateur
-    await update.message.delete()
+    cleanup_queue.enqueue(update.effective_chat.id, update.message.message_id)
     
     return WAITING_PRODUCT_PRICE
 
@@ -698,10 +831,7 @@ async def handle_product_price(update: Update, context: ContextTypes.DEFAULT_TYP
     context.user_data['temp_product_price'] = price
     
     # Supprimer le message précédent
-    await context.bot.delete_message(
-        chat_id=update.effective_chat.id,
-        message_id=update.message.message_id - 1
-    )
+    cleanup_queue.enqueue(update.effective_chat.id, update.message.message_id - 1)
     
     await update.message.reply_text(
         "📝 Veuillez entrer la description du produit:",
@@ -711,7 +841,7 @@ async def handle_product_price(update: Update, context: ContextTypes.DEFAULT_TYP
     )
     
     # Supprimer le message de l'utilisateur
-    await update.message.delete()
+    cleanup_queue.enqueue(update.effective_chat.id, update.message.message_id)
     
     return WAITING_PRODUCT_DESCRIPTION
 
@@ -725,10 +855,7 @@ async def handle_product_description(update: Update, context: ContextTypes.DEFAU
     context.user_data['temp_product_media'] = []
     
     # Supprimer le message précédent
-    await context.bot.delete_message(
-        chat_id=update.effective_chat.id,
-        message_id=update.message.message_id - 1
-    )
+    cleanup_queue.enqueue(update.effective_chat.id, update.message.message_id - 1)
     
     # Envoyer et sauvegarder l'ID du message d'invitation
     invitation_message = await update.message.reply_text(
@@ -742,7 +869,7 @@ async def handle_product_description(update: Update, context: ContextTypes.DEFAU
     context.user_data['media_invitation_message_id'] = invitation_message.message_id
     
     # Supprimer le message de l'utilisateur
-    await update.message.delete()
+    cleanup_queue.enqueue(update.effective_chat.id, update.message.message_id)
     
     return WAITING_PRODUCT_MEDIA
 
@@ -759,23 +886,10 @@ async def handle_product_media(update: Update, context: ContextTypes.DEFAULT_TYP
         context.user_data['media_count'] = 0
 
     if context.user_data.get('media_invitation_message_id'):
-        try:
-            await context.bot.delete_message(
-                chat_id=update.effective_chat.id,
-                message_id=context.user_data['media_invitation_message_id']
-            )
-            del context.user_data['media_invitation_message_id']
-        except Exception as e:
-            print(f"Erreur lors de la suppression du message d'invitation: {e}")
+        cleanup_queue.enqueue(update.effective_chat.id, context.user_data.pop('media_invitation_message_id'))
 
     if context.user_data.get('last_confirmation_message_id'):
-        try:
-            await context.bot.delete_message(
-                chat_id=update.effective_chat.id,
-                message_id=context.user_data['last_confirmation_message_id']
-            )
-        except Exception as e:
-            print(f"Erreur lors de la suppression du message de confirmation: {e}")
+        cleanup_queue.enqueue(update.effective_chat.id, context.user_data['last_confirmation_message_id'])
 
     context.user_data['media_count'] += 1
 
@@ -794,7 +908,7 @@ async def handle_product_media(update: Update, context: ContextTypes.DEFAULT_TYP
 
     context.user_data['temp_product_media'].append(new_media)
 
-    await update.message.delete()
+    cleanup_queue.enqueue(update.effective_chat.id, update.message.message_id)
 
     message = await update.message.reply_text(
         f"Photo/Vidéo {context.user_data['media_count']} ajoutée ! Cliquez sur Terminé pour valider :",
@@ -816,16 +930,14 @@ async def finish_product_media(update: Update, context: ContextTypes.DEFAULT_TYP
         return await show_admin_menu(update, context)
 
     new_product = {
+        'id': catalog_index.new_product_id(),
         'name': context.user_data.get('temp_product_name'),
         'price': context.user_data.get('temp_product_price'),
         'description': context.user_data.get('temp_product_description'),
         'media': context.user_data.get('temp_product_media', [])
     }
 
-    if category not in CATALOG:
-        CATALOG[category] = []
-    CATALOG[category].append(new_product)
-    save_catalog(CATALOG)
+    update_catalog({"op": "add_product", "category": category, "product": new_product})
 
     # Au lieu d'essayer de modifier ou supprimer des messages, créons simplement un nouveau menu admin
     context.user_data.clear()
@@ -844,10 +956,7 @@ async def finish_product_media(update: Update, context: ContextTypes.DEFAULT_TYP
 
     keyboard = await admin_features.add_user_buttons(keyboard)
 
-    try:
-        await query.message.delete()
-    except:
-        pass
+    cleanup_queue.enqueue(query.message.chat_id, query.message.message_id)
 
     message = await context.bot.send_message(
         chat_id=query.message.chat_id,
@@ -874,17 +983,30 @@ async def handle_new_value(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ Une erreur est survenue. Veuillez réessayer.")
         return await show_admin_menu(update, context)
 
+    # Deux produits d'une même catégorie ne peuvent pas porter le même nom
+    if field == 'name' and new_value != product_name and any(
+            p['name'] == new_value for p in CATALOG.get(category, [])):
+        await update.message.reply_text(
+            "❌ Ce produit existe déjà dans cette catégorie. Veuillez choisir un autre nom:",
+            reply_markup=InlineKeyboardMarkup([[
+                InlineKeyboardButton("🔙 Annuler", callback_data="cancel_edit")
+            ]])
+        )
+        return WAITING_NEW_VALUE
+
     for product in CATALOG.get(category, []):
         if product['name'] == product_name:
             old_value = product.get(field, "Non défini")
-            product[field] = new_value
-            save_catalog(CATALOG)
+            update_catalog({
+                "op": "edit_product",
+                "category": category,
+                "name": product_name,
+                "field": field,
+                "value": new_value
+            })
 
-            await context.bot.delete_message(
-                chat_id=update.effective_chat.id,
-                message_id=update.message.message_id - 1
-            )
-            await update.message.delete()
+            cleanup_queue.enqueue(update.effective_chat.id, update.message.message_id - 1)
+            cleanup_queue.enqueue(update.effective_chat.id, update.message.message_id)
 
             keyboard = [[InlineKeyboardButton("🔙 Retour au menu", callback_data="admin")]]
             await context.bot.send_message(
@@ -905,7 +1027,7 @@ async def handle_contact_username(update: Update, context: ContextTypes.DEFAULT_
     
     try:
         # Supprimer le message de l'utilisateur
-        await update.message.delete()
+        cleanup_queue.enqueue(update.effective_chat.id, update.message.message_id)
         
         if new_value.startswith(('http://', 'https://')):
             # C'est une URL
@@ -936,18 +1058,11 @@ async def handle_contact_username(update: Update, context: ContextTypes.DEFAULT_
             config_type = "Pseudo Telegram"
         
         # Sauvegarder dans config.json
-        with open('config/config.json', 'w', encoding='utf-8') as f:
-            json.dump(CONFIG, f, indent=4)
+        save_config()
         
         # Supprimer l'ancien message de configuration
         if 'edit_contact_message_id' in context.user_data:
-            try:
-                await context.bot.delete_message(
-                    chat_id=update.effective_chat.id,
-                    message_id=context.user_data['edit_contact_message_id']
-                )
-            except:
-                pass
+            cleanup_queue.enqueue(update.effective_chat.id, context.user_data['edit_contact_message_id'])
         
         # Message de confirmation avec le @ ajouté si c'est un pseudo Telegram sans @
         display_value = new_value
@@ -962,14 +1077,8 @@ async def handle_contact_username(update: Update, context: ContextTypes.DEFAULT_
             parse_mode='HTML'
         )
         
-        # Attendre 3 secondes puis supprimer le message de confirmation
-        await asyncio.sleep(3)
-        try:
-            await success_message.delete()
-        except:
-            pass
-        
-        return await show_admin_menu(update, context)
+        # Retour au menu dans quelques secondes, sans bloquer le handler
+        return schedule_admin_menu(update, context, success_message)
         
     except Exception as e:
         print(f"Erreur dans handle_contact_username: {e}")
@@ -982,24 +1091,17 @@ async def handle_welcome_message(update: Update, context: ContextTypes.DEFAULT_T
     
     try:
         # Supprimer le message de l'utilisateur
-        await update.message.delete()
+        cleanup_queue.enqueue(update.effective_chat.id, update.message.message_id)
         
         # Mettre à jour la config
         CONFIG['welcome_message'] = new_message
         
         # Sauvegarder dans config.json
-        with open('config/config.json', 'w', encoding='utf-8') as f:
-            json.dump(CONFIG, f, indent=4)
+        save_config()
         
         # Supprimer l'ancien message si possible
         if 'edit_welcome_message_id' in context.user_data:
-            try:
-                await context.bot.delete_message(
-                    chat_id=update.effective_chat.id,
-                    message_id=context.user_data['edit_welcome_message_id']
-                )
-            except:
-                pass
+            cleanup_queue.enqueue(update.effective_chat.id, context.user_data['edit_welcome_message_id'])
         
         # Message de confirmation
         success_message = await context.bot.send_message(
@@ -1009,934 +1111,808 @@ async def handle_welcome_message(update: Update, context: ContextTypes.DEFAULT_T
             parse_mode='HTML'
         )
         
-        # Attendre 3 secondes puis supprimer le message de confirmation
-        await asyncio.sleep(3)
-        try:
-            await success_message.delete()
-        except:
-            pass
-        
-        return await show_admin_menu(update, context)
+        # Retour au menu dans quelques secondes, sans bloquer le handler
+        return schedule_admin_menu(update, context, success_message)
         
     except Exception as e:
         print(f"Erreur dans handle_welcome_message: {e}")
         return WAITING_WELCOME_MESSAGE
 
-async def handle_normal_buttons(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Gestion des boutons normaux"""
-    global paris_tz 
-    query = update.callback_query
-    await query.answer()
-    await admin_features.register_user(update.effective_user)
+# Aiguillage des boutons : un handler par callback_data exact ou par préfixe
+callback_router = CallbackRouter()
 
 
-    if query.data == "admin":
-        if str(update.effective_user.id) in ADMIN_IDS:
-            return await show_admin_menu(update, context)
-        else:
-            await query.edit_message_text("❌ Vous n'êtes pas autorisé à accéder au menu d'administration.")
-            return CHOOSING
+@callback_router.exact("admin")
+async def button_admin(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    if str(update.effective_user.id) in ADMIN_IDS:
+        return await show_admin_menu(update, context)
+    else:
+        await query.edit_message_text("❌ Vous n'êtes pas autorisé à accéder au menu d'administration.")
+        return CHOOSING
 
-    elif query.data == "edit_banner_image":
-            msg = await query.message.edit_text(
-                "📸 Veuillez envoyer la nouvelle image bannière :",
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("🔙 Annuler", callback_data="cancel_edit")
-                ]])
-            )
-            context.user_data['banner_msg'] = msg
-            return WAITING_BANNER_IMAGE
 
-    elif query.data == "manage_users":
-        return await admin_features.handle_user_management(update, context)
+@callback_router.exact("edit_banner_image")
+async def button_edit_banner_image(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    msg = await query.message.edit_text(
+        "📸 Veuillez envoyer la nouvelle image bannière :",
+        reply_markup=InlineKeyboardMarkup([[
+            InlineKeyboardButton("🔙 Annuler", callback_data="cancel_edit")
+        ]])
+    )
+    context.user_data['banner_msg'] = msg
+    return WAITING_BANNER_IMAGE
 
-    elif query.data == "start_broadcast":
-        return await admin_features.handle_broadcast(update, context)
 
-    elif query.data == "add_category":
-        await query.message.edit_text(
-            "📝 Veuillez entrer le nom de la nouvelle catégorie:",
-            reply_markup=InlineKeyboardMarkup([[
-                InlineKeyboardButton("🔙 Annuler", callback_data="cancel_add_category")
-            ]])
-        )
-        return WAITING_CATEGORY_NAME
+@callback_router.exact("manage_users")
+async def button_manage_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    return await admin_features.handle_user_management(update, context)
 
-    elif query.data == "add_product":
-        keyboard = []
-        for category in CATALOG.keys():
-            if category != 'stats':
-                keyboard.append([InlineKeyboardButton(category, callback_data=f"select_category_{category}")])
-        keyboard.append([InlineKeyboardButton("🔙 Annuler", callback_data="cancel_add_product")])
-        
-        await query.message.edit_text(
-            "📝 Sélectionnez la catégorie pour le nouveau produit:",
-            reply_markup=InlineKeyboardMarkup(keyboard)
-        )
-        return SELECTING_CATEGORY
 
-    elif query.data.startswith("select_category_"):
-        # Ne traiter que si ce n'est PAS une action de suppression
-        if not query.data.startswith("select_category_to_delete_"):
-            category = query.data.replace("select_category_", "")
-            context.user_data['temp_product_category'] = category
-            
-            await query.message.edit_text(
-                "📝 Veuillez entrer le nom du nouveau produit:",
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("🔙 Annuler", callback_data="cancel_add_product")
-                ]])
-            )
-            return WAITING_PRODUCT_NAME
+@callback_router.exact("start_broadcast")
+async def button_start_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    return await admin_features.handle_broadcast(update, context)
 
-    elif query.data.startswith("delete_product_category_"):
-        category = query.data.replace("delete_product_category_", "")
-        products = CATALOG.get(category, [])
-    
-        keyboard = []
-        for product in products:
-            if isinstance(product, dict):
-                keyboard.append([
-                    InlineKeyboardButton(
-                        product['name'],
-                        callback_data=f"confirm_delete_product_{category[:10]}_{product['name'][:20]}"
-                    )
-                ])
-        keyboard.append([InlineKeyboardButton("🔙 Annuler", callback_data="cancel_delete_product")])
-    
-        await query.message.edit_text(
-            f"⚠️ Sélectionnez le produit à supprimer de *{category}* :",
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode='Markdown'
-        )
-        return SELECTING_PRODUCT_TO_DELETE
-
-    elif query.data == "delete_category":
-        keyboard = []
-        for category in CATALOG.keys():
-            if category != 'stats':
-                keyboard.append([InlineKeyboardButton(category, callback_data=f"confirm_delete_category_{category}")])
-        keyboard.append([InlineKeyboardButton("🔙 Annuler", callback_data="cancel_delete_category")])
-        
-        await query.message.edit_text(
-            "⚠️ Sélectionnez la catégorie à supprimer:",
-            reply_markup=InlineKeyboardMarkup(keyboard)
-        )
-        return SELECTING_CATEGORY_TO_DELETE
 
-    elif query.data.startswith("confirm_delete_category_"):
-        # Ajoutez une étape de confirmation
-        category = query.data.replace("confirm_delete_category_", "")
-        keyboard = [
-            [
-                InlineKeyboardButton("✅ Oui, supprimer", callback_data=f"really_delete_category_{category}"),
-                InlineKeyboardButton("❌ Non, annuler", callback_data="cancel_delete_category")
-            ]
-        ]
-        await query.message.edit_text(
-            f"⚠️ *Êtes-vous sûr de vouloir supprimer la catégorie* `{category}` *?*\n\n"
-            f"Cette action supprimera également tous les produits de cette catégorie.\n"
-            f"Cette action est irréversible !",
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode='Markdown'
-        )
-        return SELECTING_CATEGORY_TO_DELETE
+@callback_router.exact("broadcast_status")
+async def button_broadcast_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if str(update.effective_user.id) in ADMIN_IDS:
+        return await admin_features.handle_broadcast_status(update, context)
 
 
-    elif query.data.startswith("really_delete_category_"):
-        category = query.data.replace("really_delete_category_", "")
-        if category in CATALOG:
-            del CATALOG[category]
-            save_catalog(CATALOG)
-            await query.message.edit_text(
-                f"✅ La catégorie *{category}* a été supprimée avec succès !",
-                parse_mode='Markdown',
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("🔙 Retour au menu", callback_data="admin")
-                ]])
-            )
-        return CHOOSING
+@callback_router.prefix("broadcast_pause_", "broadcast_resume_", "broadcast_cancel_")
+async def button_broadcast_control(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if str(update.effective_user.id) in ADMIN_IDS:
+        return await admin_features.handle_broadcast_control(update, context)
 
-    elif query.data == "delete_product":
-        keyboard = []
-        for category in CATALOG.keys():
-            if category != 'stats':
-                keyboard.append([
-                    InlineKeyboardButton(
-                        category, 
-                        callback_data=f"delete_product_category_{category}"
-                    )
-                ])
-        keyboard.append([InlineKeyboardButton("🔙 Annuler", callback_data="cancel_delete_product")])
-        
-        await query.message.edit_text(
-            "⚠️ Sélectionnez la catégorie du produit à supprimer:",
-            reply_markup=InlineKeyboardMarkup(keyboard)
-        )
-        return SELECTING_CATEGORY_TO_DELETE
 
-    elif query.data.startswith("confirm_delete_product_"):
-            try:
-                # Extraire la catégorie et le nom du produit
-                parts = query.data.replace("confirm_delete_product_", "").split("_")
-                short_category = parts[0]
-                short_product = "_".join(parts[1:])  # Pour gérer les noms avec des underscores
-                
-                # Trouver la vraie catégorie et le vrai produit
-                category = next((cat for cat in CATALOG.keys() if cat.startswith(short_category) or short_category.startswith(cat)), None)
-                if category:
-                    product_name = next((p['name'] for p in CATALOG[category] if p['name'].startswith(short_product) or short_product.startswith(p['name'])), None)
-                    if product_name:
-                        # Créer le clavier de confirmation avec les noms courts
-                        keyboard = [
-                            [
-                                InlineKeyboardButton("✅ Oui, supprimer", 
-                                    callback_data=f"really_delete_product_{category[:10]}_{product_name[:20]}"),
-                                InlineKeyboardButton("❌ Non, annuler", 
-                                    callback_data="cancel_delete_product")
-                            ]
-                        ]
-                    
-                        await query.message.edit_text(
-                            f"⚠️ *Êtes-vous sûr de vouloir supprimer le produit* `{product_name}` *?*\n\n"
-                            f"Cette action est irréversible !",
-                            reply_markup=InlineKeyboardMarkup(keyboard),
-                            parse_mode='Markdown'
-                        )
-                        return SELECTING_PRODUCT_TO_DELETE
+@callback_router.exact("add_category")
+async def button_add_category(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.message.edit_text(
+        "📝 Veuillez entrer le nom de la nouvelle catégorie:",
+        reply_markup=InlineKeyboardMarkup([[
+            InlineKeyboardButton("🔙 Annuler", callback_data="cancel_add_category")
+        ]])
+    )
+    return WAITING_CATEGORY_NAME
 
-            except Exception as e:
-                print(f"Erreur lors de la confirmation de suppression: {e}")
-                return await show_admin_menu(update, context)
 
-    elif query.data.startswith("really_delete_product_"):
-        try:
-            parts = query.data.replace("really_delete_product_", "").split("_")
-            short_category = parts[0]
-            short_product = "_".join(parts[1:])
+@callback_router.exact("add_product")
+async def button_add_product(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.message.edit_text(
+        "📝 Sélectionnez la catégorie pour le nouveau produit:",
+        reply_markup=categories_keyboard("add")
+    )
+    return SELECTING_CATEGORY
 
-            # Trouver la vraie catégorie et le vrai produit
-            category = next((cat for cat in CATALOG.keys() if cat.startswith(short_category) or short_category.startswith(cat)), None)
-            if category:
-                product_name = next((p['name'] for p in CATALOG[category] if p['name'].startswith(short_product) or short_product.startswith(p['name'])), None)
-                if product_name:
-                    CATALOG[category] = [p for p in CATALOG[category] if p['name'] != product_name]
-                    save_catalog(CATALOG)
-                    await query.message.edit_text(
-                        f"✅ Le produit *{product_name}* a été supprimé avec succès !",
-                        parse_mode='Markdown',
-                        reply_markup=InlineKeyboardMarkup([[
-                            InlineKeyboardButton("🔙 Retour au menu", callback_data="admin")
-                        ]])
-                    )
-            return CHOOSING
 
-        except Exception as e:
-            print(f"Erreur lors de la suppression du produit: {e}")
+@callback_router.prefix("select_category_")
+async def button_select_category(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    # Ne traiter que si ce n'est PAS une action de suppression
+    if not query.data.startswith("select_category_to_delete_"):
+        category = catalog_index.category(query.data.replace("select_category_", ""))
+        if category is None:
             return await show_admin_menu(update, context)
+        context.user_data['temp_product_category'] = category
 
-    elif query.data == "edit_order_button":
-            # Gérer l'affichage des configurations actuelles
-            if CONFIG.get('order_url'):
-                current_config = CONFIG['order_url']
-                config_type = "URL"
-            elif CONFIG.get('order_text'):
-                current_config = CONFIG['order_text']
-                config_type = "Texte"
-            else:
-                current_config = 'Non configuré'
-                config_type = "Aucune"
-
-            message = await query.message.edit_text(
-                "🛒 Configuration du bouton Commander 🛒\n\n"
-                f"<b>Configuration actuelle</b> ({config_type}):\n"
-                f"{current_config}\n\n"
-                "Vous pouvez :\n"
-                "• Envoyer un pseudo Telegram (avec ou sans @)\n\n"
-                "• Envoyer un message avec formatage HTML (<b>gras</b>, <i>italique</i>, etc)\n\n"
-                "• Envoyer une URL (commençant par http:// ou https://) pour rediriger vers un site",
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("🔙 Annuler", callback_data="cancel_edit_order")
-                ]]),
-                parse_mode='HTML'  # Ajout du support HTML
-            )
-            context.user_data['edit_order_button_message_id'] = message.message_id
-            return WAITING_ORDER_BUTTON_CONFIG
+        await query.message.edit_text(
+            "📝 Veuillez entrer le nom du nouveau produit:",
+            reply_markup=InlineKeyboardMarkup([[
+                InlineKeyboardButton("🔙 Annuler", callback_data="cancel_add_product")
+            ]])
+        )
+        return WAITING_PRODUCT_NAME
 
-    elif query.data == "show_order_text":
-        try:
-            # Récupérer le message de commande configuré
-            order_text = CONFIG.get('order_text', "Aucun message configuré")
-        
-            # Extraire la catégorie du message précédent
-            category = None
-            for markup_row in query.message.reply_markup.inline_keyboard:
-                for button in markup_row:
-                    if button.callback_data and button.callback_data.startswith("view_"):
-                        category = button.callback_data.replace("view_", "")
-                        break
-                if category:
-                    break
-        
-            keyboard = [[
-                InlineKeyboardButton("🔙 Retour aux produits", callback_data=f"view_{category}")
-            ]]
-        
-            # Modifier le message existant au lieu d'en créer un nouveau
-            # Utiliser parse_mode='HTML' au lieu de 'Markdown'
-            await query.message.edit_text(
-                text=order_text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode='HTML'
-            )
-            return CHOOSING
-        
-        except Exception as e:
-            print(f"Erreur lors de l'affichage du message: {e}")
-            await query.answer("Une erreur est survenue lors de l'affichage du message", show_alert=True)
-            return CHOOSING
 
+@callback_router.prefix("delete_product_category_")
+async def button_delete_product_category(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    category = catalog_index.category(query.data.replace("delete_product_category_", ""))
+    if category not in CATALOG:
+        return await show_admin_menu(update, context)
 
-    elif query.data == "edit_welcome":
-            current_message = CONFIG.get('welcome_message', "Message non configuré")
-        
-            message = await query.message.edit_text(
-                "✏️ Configuration du message d'accueil\n\n"
-                f"Message actuel :\n{current_message}\n\n"
-                "Envoyez le nouveau message d'accueil.\n"
-                "Vous pouvez utiliser le formatage HTML :\n"
-                "• <b>texte</b> pour le gras\n"
-                "• <i>texte</i> pour l'italique\n"
-                "• <u>texte</u> pour le souligné",
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("🔙 Annuler", callback_data="cancel_edit_welcome")
-                ]]),
-                parse_mode='HTML'
-            )
-            context.user_data['edit_welcome_message_id'] = message.message_id
-            return WAITING_WELCOME_MESSAGE
-
-    elif query.data == "show_stats":
-        # Configuration du fuseau horaire Paris
-        paris_tz = pytz.timezone('Europe/Paris')
-        utc_now = datetime.utcnow()
-        paris_now = utc_now.replace(tzinfo=pytz.UTC).astimezone(paris_tz)
-
-        # Initialisation des stats si nécessaire
-        if 'stats' not in CATALOG:
-            CATALOG['stats'] = {
-                "total_views": 0,
-                "category_views": {},
-                "product_views": {},
-                "last_updated": paris_now.strftime("%H:%M:%S"),
-                "last_reset": paris_now.strftime("%Y-%m-%d")
-            }
-    
-        # Nettoyer les stats avant l'affichage
-        clean_stats()
-    
-        stats = CATALOG['stats']
-        text = "📊 *Statistiques du catalogue*\n\n"
-        text += f"👥 Vues totales: {stats.get('total_views', 0)}\n"
-    
-        # Conversion de l'heure en fuseau horaire Paris
-        last_updated = stats.get('last_updated', 'Jamais')
-        if last_updated != 'Jamais':
-            try:
-                if len(last_updated) > 8:  # Si format complet
-                    dt = datetime.strptime(last_updated, "%Y-%m-%d %H:%M:%S")
-                else:  # Si format HH:MM:SS
-                    today = paris_now.strftime("%Y-%m-%d")
-                    dt = datetime.strptime(f"{today} {last_updated}", "%Y-%m-%d %H:%M:%S")
-            
-                # Convertir en timezone Paris
-                dt = dt.replace(tzinfo=pytz.UTC).astimezone(paris_tz)
-                last_updated = dt.strftime("%H:%M:%S")
-            except Exception as e:
-                print(f"Erreur conversion heure: {e}")
-            
-        text += f"🕒 Dernière mise à jour: {last_updated}\n"
-    
-        if 'last_reset' in stats:
-            text += f"🔄 Dernière réinitialisation: {stats.get('last_reset', 'Jamais')}\n"
-        text += "\n"
-    
-        # Le reste du code reste identique
-        text += "📈 *Vues par catégorie:*\n"
-        category_views = stats.get('category_views', {})
-        if category_views:
-            sorted_categories = sorted(category_views.items(), key=lambda x: x[1], reverse=True)
-            for category, views in sorted_categories:
-                if category in CATALOG:
-                    text += f"- {category}: {views} vues\n"
-        else:
-            text += "Aucune vue enregistrée.\n"
+    await query.message.edit_text(
+        f"⚠️ Sélectionnez le produit à supprimer de *{category}* :",
+        reply_markup=products_keyboard(category, menu="delete"),
+        parse_mode='Markdown'
+    )
+    return SELECTING_PRODUCT_TO_DELETE
 
-        text += "\n━━━━━━━━━━━━━━━\n\n"
-    
-        text += "🔥 *Produits les plus populaires:*\n"
-        product_views = stats.get('product_views', {})
-        if product_views:
-            all_products = []
-            for category, products in product_views.items():
-                if category in CATALOG:
-                    existing_products = [p['name'] for p in CATALOG[category]]
-                    for product_name, views in products.items():
-                        if product_name in existing_products:
-                            all_products.append((category, product_name, views))
-        
-            sorted_products = sorted(all_products, key=lambda x: x[2], reverse=True)[:5]
-            for category, product_name, views in sorted_products:
-                text += f"- {product_name} ({category}): {views} vues\n"
-        else:
-            text += "Aucune vue enregistrée sur les produits.\n"
-    
-        keyboard = [
-            [InlineKeyboardButton("🔄 Réinitialiser les statistiques", callback_data="confirm_reset_stats")],
-            [InlineKeyboardButton("🔙 Retour", callback_data="admin")]
+
+@callback_router.exact("delete_category")
+async def button_delete_category(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.message.edit_text(
+        "⚠️ Sélectionnez la catégorie à supprimer:",
+        reply_markup=categories_keyboard("delete")
+    )
+    return SELECTING_CATEGORY_TO_DELETE
+
+
+@callback_router.prefix("confirm_delete_category_")
+async def button_confirm_delete_category(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    # Ajoutez une étape de confirmation
+    cat_id = query.data.replace("confirm_delete_category_", "")
+    category = catalog_index.category(cat_id)
+    if category is None:
+        return await show_admin_menu(update, context)
+    keyboard = [
+        [
+            InlineKeyboardButton("✅ Oui, supprimer", callback_data=f"really_delete_category_{cat_id}"),
+            InlineKeyboardButton("❌ Non, annuler", callback_data="cancel_delete_category")
         ]
-    
+    ]
+    await query.message.edit_text(
+        f"⚠️ *Êtes-vous sûr de vouloir supprimer la catégorie* `{category}` *?*\n\n"
+        f"Cette action supprimera également tous les produits de cette catégorie.\n"
+        f"Cette action est irréversible !",
+        reply_markup=InlineKeyboardMarkup(keyboard),
+        parse_mode='Markdown'
+    )
+    return SELECTING_CATEGORY_TO_DELETE
+
+
+@callback_router.prefix("really_delete_category_")
+async def button_really_delete_category(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    category = catalog_index.category(query.data.replace("really_delete_category_", ""))
+    if category in CATALOG:
+        update_catalog({"op": "delete_category", "category": category})
         await query.message.edit_text(
-            text,
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode='Markdown'
+            f"✅ La catégorie *{category}* a été supprimée avec succès !",
+            parse_mode='Markdown',
+            reply_markup=InlineKeyboardMarkup([[
+                InlineKeyboardButton("🔙 Retour au menu", callback_data="admin")
+            ]])
         )
+    return CHOOSING
 
-    elif query.data == "edit_contact":
-            # Gérer l'affichage de la configuration actuelle
-            if CONFIG.get('contact_username'):
-                current_config = f"@{CONFIG['contact_username']}"
-                config_type = "Pseudo Telegram"
-            elif CONFIG.get('contact_url'):  # Ajout d'une nouvelle option pour l'URL
-                current_config = CONFIG['contact_url']
-                config_type = "URL"
-            else:
-                current_config = 'Non configuré'
-                config_type = "Aucune"
-
-            message = await query.message.edit_text(
-                "📱 Configuration du contact\n\n"
-                f"Configuration actuelle ({config_type}):\n"
-                f"{current_config}\n\n"
-                "Vous pouvez :\n"
-                "• Envoyer un pseudo Telegram (avec ou sans @)\n"
-                "• Envoyer une URL (commençant par http:// ou https://) pour rediriger vers un site",
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("🔙 Annuler", callback_data="cancel_edit_contact")
-                ]]),
-                parse_mode='HTML'
-            )
-            context.user_data['edit_contact_message_id'] = query.message.message_id
-            return WAITING_CONTACT_USERNAME
 
-    elif query.data in ["cancel_add_category", "cancel_add_product", "cancel_delete_category", 
-                        "cancel_delete_product", "cancel_edit_contact", "cancel_edit_order", "cancel_edit_welcome"]:
-        return await show_admin_menu(update, context)
+@callback_router.exact("delete_product")
+async def button_delete_product(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.message.edit_text(
+        "⚠️ Sélectionnez la catégorie du produit à supprimer:",
+        reply_markup=categories_keyboard("delete_product")
+    )
+    return SELECTING_CATEGORY_TO_DELETE
 
-    elif query.data == "back_to_categories":
-        if 'category_message_id' in context.user_data:
-            try:
-                await context.bot.edit_message_text(
-                    chat_id=query.message.chat_id,
-                    message_id=context.user_data['category_message_id'],
-                    text=context.user_data['category_message_text'],
-                    reply_markup=InlineKeyboardMarkup(context.user_data['category_message_reply_markup']),
+
+@callback_router.prefix("confirm_delete_product_")
+async def button_confirm_delete_product(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    try:
+        product_id = query.data.replace("confirm_delete_product_", "")
+        category, product = catalog_index.product(product_id)
+        if category:
+            product_name = product['name']
+            if product_name:
+                keyboard = [
+                    [
+                        InlineKeyboardButton("✅ Oui, supprimer",
+                            callback_data=f"really_delete_product_{product_id}"),
+                        InlineKeyboardButton("❌ Non, annuler", 
+                            callback_data="cancel_delete_product")
+                    ]
+                ]
+
+                await query.message.edit_text(
+                    f"⚠️ *Êtes-vous sûr de vouloir supprimer le produit* `{product_name}` *?*\n\n"
+                    f"Cette action est irréversible !",
+                    reply_markup=InlineKeyboardMarkup(keyboard),
                     parse_mode='Markdown'
                 )
-            except Exception as e:
-                print(f"Erreur lors de la mise à jour du message des catégories: {e}")
-        else:
-            # Si le message n'existe pas, recréez-le
-            keyboard = []
-            for category in CATALOG.keys():
-                if category != 'stats':
-                    keyboard.append([InlineKeyboardButton(category, callback_data=f"view_{category}")])
+                return SELECTING_PRODUCT_TO_DELETE
 
-            keyboard.append([InlineKeyboardButton("🔙 Retour à l'accueil", callback_data="back_to_home")])
+    except Exception as e:
+        print(f"Erreur lors de la confirmation de suppression: {e}")
+        return await show_admin_menu(update, context)
 
-            await query.edit_message_text(
-                "📋 *Menu*\n\n"
-                "Choisissez une catégorie pour voir les produits :",
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode='Markdown'
-            )
 
-    elif query.data == "skip_media":
-        category = context.user_data.get('temp_product_category')
+@callback_router.prefix("really_delete_product_")
+async def button_really_delete_product(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    try:
+        category, product = catalog_index.product(query.data.replace("really_delete_product_", ""))
         if category:
-            new_product = {
-                'name': context.user_data.get('temp_product_name'),
-                'price': context.user_data.get('temp_product_price'),
-                'description': context.user_data.get('temp_product_description')
-            }
-            
-            if category not in CATALOG:
-                CATALOG[category] = []
-            CATALOG[category].append(new_product)
-            save_catalog(CATALOG)
-            
-            context.user_data.clear()
-            return await show_admin_menu(update, context)
+            product_name = product['name']
+            if product_name:
+                update_catalog({"op": "delete_product", "category": category, "name": product_name})
+                await query.message.edit_text(
+                    f"✅ Le produit *{product_name}* a été supprimé avec succès !",
+                    parse_mode='Markdown',
+                    reply_markup=InlineKeyboardMarkup([[
+                        InlineKeyboardButton("🔙 Retour au menu", callback_data="admin")
+                    ]])
+                )
+        return CHOOSING
 
-    elif query.data.startswith("product_"):
-                _, category, product_name = query.data.split("_", 2)
-                
-                # Trouver la vraie catégorie et le vrai produit
-                real_category = next((cat for cat in CATALOG.keys() if cat.startswith(category) or category.startswith(cat)), None)
-                if real_category:
-                    product = next((p for p in CATALOG[real_category] if p['name'].startswith(product_name) or product_name.startswith(p['name'])), None)
-                    if product:
-                        category = real_category  # Utiliser la vraie catégorie pour la suite
-                        caption = f"📱 <b>{product['name']}</b>\n\n"
-                        caption += f"💰 <b>Prix:</b>\n{product['price']}\n\n"
-                        caption += f"📝 <b>Description:</b>\n{product['description']}"
-
-                        keyboard = [[
-                            InlineKeyboardButton("🔙 Retour à la catégorie", callback_data=f"view_{category}"),
-                            InlineKeyboardButton(
-                                "🛒 Commander",
-                                **({"url": CONFIG['order_url']} if CONFIG.get('order_url') 
-                                   else {"callback_data": "show_order_text"})
-                            )
-                        ]]
-                        if 'media' in product and product['media']:
-                            media_list = product['media']
-                            media_list = sorted(media_list, key=lambda x: x.get('order_index', 0))
-                            total_media = len(media_list)
-                            context.user_data['current_media_index'] = 0
-                            current_media = media_list[0]
-
-                            if total_media > 1:
-                                keyboard.insert(0, [
-                                    InlineKeyboardButton("⬅️ Précédent", callback_data=f"prev_media_{category[:10]}_{product['name'][:20]}"),
-                                    InlineKeyboardButton("➡️ Suivant", callback_data=f"next_media_{category[:10]}_{product['name'][:20]}")
-                                ])
-
-                            await query.message.delete()
-
-                            if current_media['media_type'] == 'photo':
-                                message = await context.bot.send_photo(
-                                    chat_id=query.message.chat_id,
-                                    photo=current_media['media_id'],
-                                    caption=caption,
-                                    reply_markup=InlineKeyboardMarkup(keyboard),
-                                    parse_mode='HTML'  # Changé en HTML au lieu de Markdown
-                                )
-                            else:
-                                message = await context.bot.send_video(
-                                    chat_id=query.message.chat_id,
-                                    video=current_media['media_id'],
-                                    caption=caption,
-                                    reply_markup=InlineKeyboardMarkup(keyboard),
-                                    parse_mode='HTML'  # Changé en HTML au lieu de Markdown
-                                )
-                            context.user_data['last_product_message_id'] = message.message_id
-                        else:
-                            await query.message.edit_text(
-                                text=caption,
-                                reply_markup=InlineKeyboardMarkup(keyboard),
-                                parse_mode='HTML'  # Changé en HTML au lieu de Markdown
-                            )
-                        if product:
-                            # Incrémenter les stats du produit
-                            if 'stats' not in CATALOG:
-                                CATALOG['stats'] = {...}  # même initialisation que ci-dessus
-            
-                            if 'product_views' not in CATALOG['stats']:
-                                CATALOG['stats']['product_views'] = {}
-                            if category not in CATALOG['stats']['product_views']:
-                                CATALOG['stats']['product_views'][category] = {}
-                            if product['name'] not in CATALOG['stats']['product_views'][category]:
-                                CATALOG['stats']['product_views'][category][product['name']] = 0
-            
-                            CATALOG['stats']['product_views'][category][product['name']] += 1
-                            CATALOG['stats']['total_views'] += 1
-                            CATALOG['stats']['last_updated'] = datetime.now(paris_tz).strftime("%H:%M:%S")
-                            save_catalog(CATALOG)
+    except Exception as e:
+        print(f"Erreur lors de la suppression du produit: {e}")
+        return await show_admin_menu(update, context)
 
-    elif query.data.startswith("view_"):
-            category = query.data.replace("view_", "")
-            if category in CATALOG:
-                # Initialisation des stats si nécessaire
-                if 'stats' not in CATALOG:
-                    CATALOG['stats'] = {
-                        "total_views": 0,
-                        "category_views": {},
-                        "product_views": {},
-                        "last_updated": datetime.now(paris_tz).strftime("%H:%M:%S")
-                    }
-
-                if 'category_views' not in CATALOG['stats']:
-                    CATALOG['stats']['category_views'] = {}
-    
-                if category not in CATALOG['stats']['category_views']:
-                    CATALOG['stats']['category_views'][category] = 0
-    
-                # Mettre à jour les statistiques
-                CATALOG['stats']['category_views'][category] += 1
-                CATALOG['stats']['total_views'] += 1
-                CATALOG['stats']['last_updated'] = datetime.now(paris_tz).strftime("%H:%M:%S")
-                save_catalog(CATALOG)
-
-                products = CATALOG[category]
-                # Afficher la liste des produits
-                text = f"*{category}*\n\n"
-                keyboard = []
-                for product in products:
-                    keyboard.append([InlineKeyboardButton(
-                        product['name'],
-                        callback_data=f"product_{category[:10]}_{product['name'][:20]}"
-                    )])
-
-                keyboard.append([InlineKeyboardButton("🔙 Retour au menu", callback_data="show_categories")])
-
-                try:
-                    # Suppression du dernier message de produit (photo ou vidéo) si existe
-                    if 'last_product_message_id' in context.user_data:
-                        try:
-                            await context.bot.delete_message(
-                                chat_id=query.message.chat_id,
-                                message_id=context.user_data['last_product_message_id']
-                            )
-                            del context.user_data['last_product_message_id']
-                        except:
-                            pass
-
-                    print(f"Texte du message : {text}")
-                    print(f"Clavier : {keyboard}")
-
-                    # Éditer le message existant au lieu de le supprimer et recréer
-                    await query.message.edit_text(
-                        text=text,
-                        reply_markup=InlineKeyboardMarkup(keyboard),
-                        parse_mode='Markdown'
-                    )
-                
-                    context.user_data['category_message_id'] = query.message.message_id
-                    context.user_data['category_message_text'] = text
-                    context.user_data['category_message_reply_markup'] = keyboard
-
-                except Exception as e:
-                    print(f"Erreur lors de la mise à jour du message des produits: {e}")
-                    # Si l'édition échoue, on crée un nouveau message
-                    message = await context.bot.send_message(
-                        chat_id=query.message.chat_id,
-                        text=text,
-                        reply_markup=InlineKeyboardMarkup(keyboard),
-                        parse_mode='Markdown'
-                    )
-                    context.user_data['category_message_id'] = message.message_id
-
-                # Mettre à jour les stats des produits seulement s'il y en a
-                if products:
-                    if 'stats' not in CATALOG:
-                        CATALOG['stats'] = {
-                            "total_views": 0,
-                            "category_views": {},
-                            "product_views": {},
-                            "last_updated": datetime.now(paris_tz).strftime("%H:%M:%S"),
-                            "last_reset": datetime.now(paris_tz).strftime("%Y-%m-%d")
-                        }
-
-                    if 'product_views' not in CATALOG['stats']:
-                        CATALOG['stats']['product_views'] = {}
-                    if category not in CATALOG['stats']['product_views']:
-                        CATALOG['stats']['product_views'][category] = {}
-
-                    # Mettre à jour les stats pour chaque produit dans la catégorie
-                    for product in products:
-                        if product['name'] not in CATALOG['stats']['product_views'][category]:
-                            CATALOG['stats']['product_views'][category][product['name']] = 0
-                        CATALOG['stats']['product_views'][category][product['name']] += 1
-
-                    save_catalog(CATALOG)
-
-    elif query.data.startswith(("next_media_", "prev_media_")):
-            try:
-                _, direction, short_category, short_product = query.data.split("_", 3)
-            
-                # Trouver la vraie catégorie
-                category = next((cat for cat in CATALOG.keys() if cat.startswith(short_category) or short_category.startswith(cat)), None)
-                if category:
-                    # Trouver le vrai produit en utilisant le début du nom
-                    product = next((p for p in CATALOG[category] if p['name'].startswith(short_product) or short_product.startswith(p['name'])), None)
-
-                    if product and 'media' in product:
-                        media_list = sorted(product['media'], key=lambda x: x.get('order_index', 0))
-                        total_media = len(media_list)
-                        current_index = context.user_data.get('current_media_index', 0)
-
-                        # Le reste de votre code reste identique
-                        if direction == "next":
-                            current_index = current_index + 1
-                            if current_index >= total_media:
-                                current_index = 0
-                        else:  # prev
-                            current_index = current_index - 1
-                            if current_index < 0:
-                                current_index = total_media - 1
-
-                        context.user_data['current_media_index'] = current_index
-                        current_media = media_list[current_index]
-
-                        caption = f"📱 *{product['name']}*\n\n"
-                        caption += f"💰 *Prix:*\n{product['price']}\n\n"
-                        caption += f"📝 *Description:*\n{product['description']}"
-
-                        keyboard = []
-                        if total_media > 1:
-                            keyboard.append([
-                                InlineKeyboardButton("⬅️ Précédent", callback_data=f"prev_media_{short_category}_{short_product}"),
-                                InlineKeyboardButton("➡️ Suivant", callback_data=f"next_media_{short_category}_{short_product}")
-                            ])
-                        keyboard.append([
-                            InlineKeyboardButton("🔙 Retour à la catégorie", callback_data=f"view_{category}"),
-                            InlineKeyboardButton(
-                                "🛒 Commander",
-                                **({"url": CONFIG.get('order_url')} if CONFIG.get('order_url') else {"callback_data": "show_order_text"})
-                            )
-                        ])
-
-                        try:
-                            await query.message.delete()
-                        except Exception as e:
-                            print(f"Erreur lors de la suppression du message: {e}")
-
-                        if current_media['media_type'] == 'photo':
-                            message = await context.bot.send_photo(
-                                chat_id=query.message.chat_id,
-                                photo=current_media['media_id'],
-                                caption=caption,
-                                reply_markup=InlineKeyboardMarkup(keyboard),
-                                parse_mode='Markdown'
-                            )
-                        else:  # video
-                            message = await context.bot.send_video(
-                                chat_id=query.message.chat_id,
-                                video=current_media['media_id'],
-                                caption=caption,
-                                reply_markup=InlineKeyboardMarkup(keyboard),
-                                parse_mode='Markdown'
-                            )
-                        context.user_data['last_product_message_id'] = message.message_id
 
-            except Exception as e:
-                print(f"Erreur lors de la navigation des médias: {e}")
-                await query.answer("Une erreur est survenue")
-
-    elif query.data == "edit_product":
-        keyboard = []
-        for category in CATALOG.keys():
-            if category != 'stats':
-                keyboard.append([
-                    InlineKeyboardButton(
-                        category, 
-                        callback_data=f"editcat_{category}"  # Raccourci ici
-                    )
-                ])
-        keyboard.append([InlineKeyboardButton("🔙 Annuler", callback_data="cancel_edit")])
-        
-        await query.message.edit_text(
-            "✏️ Sélectionnez la catégorie du produit à modifier:",
-            reply_markup=InlineKeyboardMarkup(keyboard)
-        )
-        return SELECTING_CATEGORY
+@callback_router.exact("edit_order_button")
+async def button_edit_order_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    # Gérer l'affichage des configurations actuelles
+    if CONFIG.get('order_url'):
+        current_config = CONFIG['order_url']
+        config_type = "URL"
+    elif CONFIG.get('order_text'):
+        current_config = CONFIG['order_text']
+        config_type = "Texte"
+    else:
+        current_config = 'Non configuré'
+        config_type = "Aucune"
+
+    message = await query.message.edit_text(
+        "🛒 Configuration du bouton Commander 🛒\n\n"
+        f"<b>Configuration actuelle</b> ({config_type}):\n"
+        f"{current_config}\n\n"
+        "Vous pouvez :\n"
+        "• Envoyer un pseudo Telegram (avec ou sans @)\n\n"
+        "• Envoyer un message avec formatage HTML (<b>gras</b>, <i>italique</i>, etc)\n\n"
+        "• Envoyer une URL (commençant par http:// ou https://) pour rediriger vers un site",
+        reply_markup=InlineKeyboardMarkup([[
+            InlineKeyboardButton("🔙 Annuler", callback_data="cancel_edit_order")
+        ]]),
+        parse_mode='HTML'  # Ajout du support HTML
+    )
+    context.user_data['edit_order_button_message_id'] = message.message_id
+    return WAITING_ORDER_BUTTON_CONFIG
 
-    elif query.data.startswith("editcat_"):  # Nouveau gestionnaire avec nom plus court
-        category = query.data.replace("editcat_", "")
-        products = CATALOG.get(category, [])
-        
-        keyboard = []
-        for product in products:
-            if isinstance(product, dict):
-                # Créer un callback_data plus court
-                callback_data = f"editp_{category[:10]}_{product['name'][:20]}"
-                keyboard.append([
-                    InlineKeyboardButton(product['name'], callback_data=callback_data)
-                ])
-        keyboard.append([InlineKeyboardButton("🔙 Annuler", callback_data="cancel_edit")])
-        
+
+@callback_router.exact("show_order_text")
+async def button_show_order_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    try:
+        # Récupérer le message de commande configuré
+        order_text = CONFIG.get('order_text', "Aucun message configuré")
+
+        # Extraire la catégorie du message précédent
+        category = None
+        for markup_row in query.message.reply_markup.inline_keyboard:
+            for button in markup_row:
+                if button.callback_data and button.callback_data.startswith("view_"):
+                    category = button.callback_data.replace("view_", "")
+                    break
+            if category:
+                break
+
+        keyboard = [[
+            InlineKeyboardButton("🔙 Retour aux produits", callback_data=f"view_{category}")
+        ]]
+
+        # Modifier le message existant au lieu d'en créer un nouveau
+        # Utiliser parse_mode='HTML' au lieu de 'Markdown'
         await query.message.edit_text(
-            f"✏️ Sélectionnez le produit à modifier dans {category}:",
-            reply_markup=InlineKeyboardMarkup(keyboard)
+            text=order_text,
+            reply_markup=InlineKeyboardMarkup(keyboard),
+            parse_mode='HTML'
         )
-        return SELECTING_PRODUCT_TO_EDIT
+        return CHOOSING
+
+    except Exception as e:
+        print(f"Erreur lors de l'affichage du message: {e}")
+        await query.answer("Une erreur est survenue lors de l'affichage du message", show_alert=True)
+        return CHOOSING
+
 
-    elif query.data.startswith("editp_"):
+@callback_router.exact("edit_welcome")
+async def button_edit_welcome(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    current_message = CONFIG.get('welcome_message', "Message non configuré")
+
+    message = await query.message.edit_text(
+        "✏️ Configuration du message d'accueil\n\n"
+        f"Message actuel :\n{current_message}\n\n"
+        "Envoyez le nouveau message d'accueil.\n"
+        "Vous pouvez utiliser le formatage HTML :\n"
+        "• <b>texte</b> pour le gras\n"
+        "• <i>texte</i> pour l'italique\n"
+        "• <u>texte</u> pour le souligné",
+        reply_markup=InlineKeyboardMarkup([[
+            InlineKeyboardButton("🔙 Annuler", callback_data="cancel_edit_welcome")
+        ]]),
+        parse_mode='HTML'
+    )
+    context.user_data['edit_welcome_message_id'] = message.message_id
+    return WAITING_WELCOME_MESSAGE
+
+
+@callback_router.exact("show_stats")
+async def button_show_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    global paris_tz
+    query = update.callback_query
+    # Configuration du fuseau horaire Paris
+    paris_tz = pytz.timezone('Europe/Paris')
+    utc_now = datetime.utcnow()
+    paris_now = utc_now.replace(tzinfo=pytz.UTC).astimezone(paris_tz)
+
+    # Nettoyer les stats avant l'affichage
+    clean_stats()
+
+    stats = get_stats()
+    text = "📊 *Statistiques du catalogue*\n\n"
+    text += f"👥 Vues totales: {stats.get('total_views', 0)}\n"
+
+    # Conversion de l'heure en fuseau horaire Paris
+    last_updated = stats.get('last_updated', 'Jamais')
+    if last_updated != 'Jamais':
         try:
-            _, short_category, short_product = query.data.split("_", 2)
-            
-            # Trouver la vraie catégorie et le vrai produit
-            category = next((cat for cat in CATALOG.keys() if cat.startswith(short_category) or short_category.startswith(cat)), None)
-            if category:
-                product_name = next((p['name'] for p in CATALOG[category] if p['name'].startswith(short_product) or short_product.startswith(p['name'])), None)
-                if product_name:
-                    context.user_data['editing_category'] = category
-                    context.user_data['editing_product'] = product_name
-
-                    keyboard = [
-                        [InlineKeyboardButton("📝 Nom", callback_data="edit_name")],
-                        [InlineKeyboardButton("💰 Prix", callback_data="edit_price")],
-                        [InlineKeyboardButton("📝 Description", callback_data="edit_desc")],
-                        [InlineKeyboardButton("🔙 Annuler", callback_data="cancel_edit")]
-                    ]
+            if len(last_updated) > 8:  # Si format complet
+                dt = datetime.strptime(last_updated, "%Y-%m-%d %H:%M:%S")
+            else:  # Si format HH:MM:SS
+                today = paris_now.strftime("%Y-%m-%d")
+                dt = datetime.strptime(f"{today} {last_updated}", "%Y-%m-%d %H:%M:%S")
+
+            # Convertir en timezone Paris
+            dt = dt.replace(tzinfo=pytz.UTC).astimezone(paris_tz)
+            last_updated = dt.strftime("%H:%M:%S")
+        except Exception as e:
+            print(f"Erreur conversion heure: {e}")
 
-                    await query.message.edit_text(
-                        f"✏️ Que souhaitez-vous modifier pour *{product_name}* ?\n"
-                        "Sélectionnez un champ à modifier:",
-                        reply_markup=InlineKeyboardMarkup(keyboard),
-                        parse_mode='Markdown'
-                    )
-                    return EDITING_PRODUCT_FIELD
-            
-            return await show_admin_menu(update, context)
+    text += f"🕒 Dernière mise à jour: {last_updated}\n"
+
+    if 'last_reset' in stats:
+        text += f"🔄 Dernière réinitialisation: {stats.get('last_reset', 'Jamais')}\n"
+
+    text += f"🧹 Messages en attente de suppression: {cleanup_queue.backlog}\n"
+
+    # Vues récentes, lues sur les tranches d'historique (indépendantes de la réinitialisation)
+    windows = {name: stats_store.window(name) for name in ('24h', '7j', '30j')}
+    text += "⏱️ Vues récentes: " + " | ".join(
+        f"{name}: {window['total']}" for name, window in windows.items()
+    ) + "\n"
+    text += "\n"
+
+    text += "📈 *Vues par catégorie:*\n"
+    category_views = stats.get('category_views', {})
+    if category_views:
+        sorted_categories = sorted(category_views.items(), key=lambda x: x[1], reverse=True)
+        for category, views in sorted_categories:
+            if category in CATALOG:
+                recent = " · ".join(
+                    f"{name}: {window['categories'].get(category, 0)}" for name, window in windows.items()
+                )
+                text += f"- {category}: {views} vues ({recent})\n"
+    else:
+        text += "Aucune vue enregistrée.\n"
+
+    text += "\n━━━━━━━━━━━━━━━\n\n"
+
+    text += "🔥 *Produits les plus populaires:*\n"
+    product_views = stats.get('product_views', {})
+    if product_views:
+        all_products = []
+        for category, products in product_views.items():
+            if category in CATALOG:
+                existing_products = [p['name'] for p in CATALOG[category]]
+                for product_name, views in products.items():
+                    if product_name in existing_products:
+                        all_products.append((category, product_name, views))
+
+        sorted_products = sorted(all_products, key=lambda x: x[2], reverse=True)[:5]
+        for category, product_name, views in sorted_products:
+            text += f"- {product_name} ({category}): {views} vues\n"
+    else:
+        text += "Aucune vue enregistrée sur les produits.\n"
+
+    keyboard = [
+        [InlineKeyboardButton("🔄 Réinitialiser les statistiques", callback_data="confirm_reset_stats")],
+        [InlineKeyboardButton("🔙 Retour", callback_data="admin")]
+    ]
+
+    await query.message.edit_text(
+        text,
+        reply_markup=InlineKeyboardMarkup(keyboard),
+        parse_mode='Markdown'
+    )
+
+
+@callback_router.exact("edit_contact")
+async def button_edit_contact(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    # Gérer l'affichage de la configuration actuelle
+    if CONFIG.get('contact_username'):
+        current_config = f"@{CONFIG['contact_username']}"
+        config_type = "Pseudo Telegram"
+    elif CONFIG.get('contact_url'):  # Ajout d'une nouvelle option pour l'URL
+        current_config = CONFIG['contact_url']
+        config_type = "URL"
+    else:
+        current_config = 'Non configuré'
+        config_type = "Aucune"
+
+    message = await query.message.edit_text(
+        "📱 Configuration du contact\n\n"
+        f"Configuration actuelle ({config_type}):\n"
+        f"{current_config}\n\n"
+        "Vous pouvez :\n"
+        "• Envoyer un pseudo Telegram (avec ou sans @)\n"
+        "• Envoyer une URL (commençant par http:// ou https://) pour rediriger vers un site",
+        reply_markup=InlineKeyboardMarkup([[
+            InlineKeyboardButton("🔙 Annuler", callback_data="cancel_edit_contact")
+        ]]),
+        parse_mode='HTML'
+    )
+    context.user_data['edit_contact_message_id'] = query.message.message_id
+    return WAITING_CONTACT_USERNAME
+
+
+@callback_router.exact("cancel_add_category", "cancel_add_product", "cancel_delete_category",
+                       "cancel_delete_product", "cancel_edit_contact", "cancel_edit_order", "cancel_edit_welcome")
+async def button_cancel_admin_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    return await show_admin_menu(update, context)
+
+
+@callback_router.exact("back_to_categories")
+async def button_back_to_categories(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    if 'category_message_id' in context.user_data:
+        try:
+            await context.bot.edit_message_text(
+                chat_id=query.message.chat_id,
+                message_id=context.user_data['category_message_id'],
+                text=context.user_data['category_message_text'],
+                reply_markup=context.user_data['category_message_reply_markup'],
+                parse_mode='Markdown'
+            )
         except Exception as e:
-            print(f"Erreur dans editp_: {e}")
-            return await show_admin_menu(update, context)
+            print(f"Erreur lors de la mise à jour du message des catégories: {e}")
+    else:
+        # Si le message n'existe pas, recréez-le
+        await query.edit_message_text(
+            "📋 *Menu*\n\n"
+            "Choisissez une catégorie pour voir les produits :",
+            reply_markup=categories_keyboard("view"),
+            parse_mode='Markdown'
+        )
+
 
-    elif query.data in ["edit_name", "edit_price", "edit_desc"]:
-        field_mapping = {
-            "edit_name": "name",
-            "edit_price": "price",
-            "edit_desc": "description",
+@callback_router.exact("skip_media")
+async def button_skip_media(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    category = context.user_data.get('temp_product_category')
+    if category:
+        new_product = {
+            'id': catalog_index.new_product_id(),
+            'name': context.user_data.get('temp_product_name'),
+            'price': context.user_data.get('temp_product_price'),
+            'description': context.user_data.get('temp_product_description')
         }
-        field = field_mapping[query.data]
-        context.user_data['editing_field'] = field
-        
-        category = context.user_data.get('editing_category')
-        product_name = context.user_data.get('editing_product')
-        
-        product = next((p for p in CATALOG[category] if p['name'] == product_name), None)
-        
+
+        update_catalog({"op": "add_product", "category": category, "product": new_product})
+
+        context.user_data.clear()
+        return await show_admin_menu(update, context)
+
+
+@callback_router.prefix("product_")
+async def button_show_product(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    category, product = catalog_index.product(query.data.replace("product_", "", 1))
+    if category:
         if product:
-            current_value = product.get(field, "Non défini")
-            if field == 'media':
-                await query.message.edit_text(
-                    "📸 Envoyez une nouvelle photo ou vidéo pour ce produit:\n"
-                    "(ou cliquez sur Annuler pour revenir en arrière)",
-                    reply_markup=InlineKeyboardMarkup([[
-                        InlineKeyboardButton("🔙 Annuler", callback_data="cancel_edit")
-                    ]])
+            caption, media_list, reply_markup = product_card(category, product)
+
+            if media_list:
+                context.user_data['current_media_index'] = 0
+                current_media = media_list[0]
+
+                cleanup_queue.enqueue(query.message.chat_id, query.message.message_id)
+
+                message = await send_media(
+                    context.bot, query.message.chat_id, current_media, caption, reply_markup
                 )
-                return WAITING_PRODUCT_MEDIA
+                context.user_data['last_product_message_id'] = message.message_id
             else:
-                field_names = {
-                    'name': 'nom',
-                    'price': 'prix',
-                    'description': 'description'
-                }
                 await query.message.edit_text(
-                    f"✏️ Modification du {field_names.get(field, field)}\n"
-                    f"Valeur actuelle : {current_value}\n\n"
-                    "Envoyez la nouvelle valeur :",
-                    reply_markup=InlineKeyboardMarkup([[
-                        InlineKeyboardButton("🔙 Annuler", callback_data="cancel_edit")
-                    ]])
+                    text=caption,
+                    reply_markup=reply_markup,
+                    parse_mode='HTML'
+                )
+            if product:
+                # Incrémenter les stats du produit
+                stats_store.increment_product_views(
+                    category, product['name'], datetime.now(paris_tz).strftime("%H:%M:%S")
                 )
-                return WAITING_NEW_VALUE
 
-    elif query.data == "cancel_edit":
-        return await show_admin_menu(update, context)
 
-    elif query.data == "confirm_reset_stats":
-        # Réinitialiser les statistiques
-        now = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-        CATALOG['stats'] = {
-            "total_views": 0,
-            "category_views": {},
-            "product_views": {},
-            "last_updated": now.split(" ")[1],  # Juste l'heure
-            "last_reset": now.split(" ")[0]  # Juste la date
-        }
-        save_catalog(CATALOG)
-        
-        # Afficher un message de confirmation
-        keyboard = [[InlineKeyboardButton("🔙 Retour au menu", callback_data="admin")]]
-        await query.message.edit_text(
-            "✅ *Les statistiques ont été réinitialisées avec succès!*\n\n"
-            f"Date de réinitialisation : {CATALOG['stats']['last_reset']}\n\n"
-            "Toutes les statistiques sont maintenant à zéro.",
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode='Markdown'
+@callback_router.prefix("view_")
+async def button_view_category(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    category = catalog_index.category(query.data.replace("view_", ""))
+    if category in CATALOG:
+        # Mettre à jour les statistiques (catégorie et produits qu'elle contient)
+        stats_store.increment_category_views(
+            category, CATALOG[category], datetime.now(paris_tz).strftime("%H:%M:%S")
         )
-               
-    elif query.data == "show_categories":
-        keyboard = []
-        # Créer uniquement les boutons de catégories
-        for category in CATALOG.keys():
-            if category != 'stats':
-                keyboard.append([InlineKeyboardButton(category, callback_data=f"view_{category}")])
 
-        # Ajouter uniquement le bouton retour à l'accueil
-        keyboard.append([InlineKeyboardButton("🔙 Retour à l'accueil", callback_data="back_to_home")])
+        # Afficher la liste des produits
+        text = f"*{category}*\n\n"
+        keyboard = products_keyboard(category)
 
         try:
-            message = await query.edit_message_text(
-                "📋 *Menu*\n\n"
-                "Choisissez une catégorie pour voir les produits :",
-                reply_markup=InlineKeyboardMarkup(keyboard),
+            # Suppression du dernier message de produit (photo ou vidéo) si existe
+            if 'last_product_message_id' in context.user_data:
+                cleanup_queue.enqueue(query.message.chat_id, context.user_data.pop('last_product_message_id'))
+
+            # Éditer le message existant au lieu de le supprimer et recréer
+            await query.message.edit_text(
+                text=text,
+                reply_markup=keyboard,
                 parse_mode='Markdown'
             )
-            context.user_data['menu_message_id'] = message.message_id
+
+            context.user_data['category_message_id'] = query.message.message_id
+            context.user_data['category_message_text'] = text
+            context.user_data['category_message_reply_markup'] = keyboard
+
         except Exception as e:
-            print(f"Erreur lors de la mise à jour du message des catégories: {e}")
-            # Si la mise à jour échoue, recréez le message
+            print(f"Erreur lors de la mise à jour du message des produits: {e}")
+            # Si l'édition échoue, on crée un nouveau message
             message = await context.bot.send_message(
                 chat_id=query.message.chat_id,
-                text="📋 *Menu*\n\n"
-                     "Choisissez une catégorie pour voir les produits :",
-                reply_markup=InlineKeyboardMarkup(keyboard),
+                text=text,
+                reply_markup=keyboard,
                 parse_mode='Markdown'
             )
-            context.user_data['menu_message_id'] = message.message_id
+            context.user_data['category_message_id'] = message.message_id
 
-    elif query.data == "back_to_home":  # Ajout de cette condition ici
-            chat_id = update.effective_chat.id
 
-            # Définir le texte de bienvenue ici, avant les boutons
-            welcome_text = CONFIG.get('welcome_message', 
-                "🌿 <b>Bienvenue sur votre bot !</b> 🌿\n\n"
-                "<b>Pour changer ce message d accueil, rendez vous dans l onglet admin.</b>\n"
-                "📋 Cliquez sur MENU pour voir les catégories"
-            )
+@callback_router.prefix("cpage_")
+async def button_categories_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    menu, _, page = query.data.replace("cpage_", "", 1).rpartition("_")
+    if menu in CATEGORY_MENUS:
+        try:
+            await query.edit_message_reply_markup(reply_markup=categories_keyboard(menu, int(page)))
+        except Exception as e:
+            print(f"Erreur lors du changement de page des catégories: {e}")
 
-            # Nouveau clavier simplifié pour l'accueil
-            keyboard = [
-                [InlineKeyboardButton("📋 MENU", callback_data="show_categories")]
-            ]
-
-            # Ajouter le bouton admin si l'utilisateur est administrateur
-            if str(update.effective_user.id) in ADMIN_IDS:
-                keyboard.append([InlineKeyboardButton("🔧 Menu Admin", callback_data="admin")])
-
-            # Configurer le bouton de contact en fonction du type (URL ou username)
-            contact_button = None
-            if CONFIG.get('contact_url'):
-                contact_button = InlineKeyboardButton("📞 Contact", url=CONFIG['contact_url'])
-            elif CONFIG.get('contact_username'):
-                contact_button = InlineKeyboardButton("📞 Contact Telegram", url=f"https://t.me/{CONFIG['contact_username']}")
-
-            # Ajouter les boutons de contact et canaux
-            if contact_button:
-                keyboard.extend([
-                    [
-                        contact_button,
-                        InlineKeyboardButton("💭 Tchat telegram", url="https://t.me/+YsJIgYjY8_cyYzBk"),
-                    ],
-                    [InlineKeyboardButton("🥔 Canal potato", url="https://doudlj.org/joinchat/QwqUM5gH7Q8VqO3SnS4YwA")]
-                ])
-            else:
-                keyboard.extend([
-                    [InlineKeyboardButton("💭 Tchat telegram", url="https://t.me/+YsJIgYjY8_cyYzBk")],
-                    [InlineKeyboardButton("🥔 Canal potato", url="https://doudlj.org/joinchat/QwqUM5gH7Q8VqO3SnS4YwA")]
-                ])
 
+@callback_router.prefix("ppage_")
+async def button_products_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    parts = query.data.replace("ppage_", "", 1).split("_")
+    # Anciens claviers (ppage_<catégorie>_<page>) : menu de consultation
+    menu, cid, page = parts if len(parts) == 3 else ['view'] + parts
+    category = catalog_index.category(cid)
+    if menu in PRODUCT_MENUS and category in CATALOG:
+        keyboard = products_keyboard(category, int(page), menu)
+        try:
+            await query.edit_message_reply_markup(reply_markup=keyboard)
+            if menu == 'view':
+                # Le retour aux produits réaffiche la même page
+                context.user_data['category_message_reply_markup'] = keyboard
+        except Exception as e:
+            print(f"Erreur lors du changement de page des produits: {e}")
+
+
+@callback_router.exact(NOOP_CALLBACK)
+async def button_noop(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Indicateur de page : la requête a déjà reçu sa réponse
+    pass
+
+
+@callback_router.prefix("next_media_", "prev_media_")
+async def button_media_navigation(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    try:
+        direction, _, product_id = query.data.split("_", 2)
+        category, product = catalog_index.product(product_id)
+        if category:
+            caption, media_list, reply_markup = product_card(category, product)
+            if media_list:
+                total_media = len(media_list)
+                current_index = context.user_data.get('current_media_index', 0)
+
+                if direction == "next":
+                    current_index = current_index + 1
+                    if current_index >= total_media:
+                        current_index = 0
+                else:  # prev
+                    current_index = current_index - 1
+                    if current_index < 0:
+                        current_index = total_media - 1
+
+                context.user_data['current_media_index'] = current_index
+                current_media = media_list[current_index]
+
+                # Édition du média en place (repli : suppression + nouvel envoi)
+                message = await replace_media(
+                    query.message, context.bot, current_media, caption, reply_markup
+                )
+                context.user_data['last_product_message_id'] = message.message_id
+
+    except Exception as e:
+        print(f"Erreur lors de la navigation des médias: {e}")
+        await query.answer("Une erreur est survenue")
+
+
+@callback_router.exact("edit_product")
+async def button_edit_product(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.message.edit_text(
+        "✏️ Sélectionnez la catégorie du produit à modifier:",
+        reply_markup=categories_keyboard("edit")
+    )
+    return SELECTING_CATEGORY
+
+
+@callback_router.prefix("editcat_")
+async def button_editcat(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    category = catalog_index.category(query.data.replace("editcat_", ""))
+    if category not in CATALOG:
+        return await show_admin_menu(update, context)
+
+    await query.message.edit_text(
+        f"✏️ Sélectionnez le produit à modifier dans {category}:",
+        reply_markup=products_keyboard(category, menu="edit")
+    )
+    return SELECTING_PRODUCT_TO_EDIT
+
+
+@callback_router.prefix("editp_")
+async def button_editp(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    try:
+        category, product = catalog_index.product(query.data.replace("editp_", "", 1))
+        if category:
+            product_name = product['name']
+            if product_name:
+                context.user_data['editing_category'] = category
+                context.user_data['editing_product'] = product_name
+
+                keyboard = [
+                    [InlineKeyboardButton("📝 Nom", callback_data="edit_name")],
+                    [InlineKeyboardButton("💰 Prix", callback_data="edit_price")],
+                    [InlineKeyboardButton("📝 Description", callback_data="edit_desc")],
+                    [InlineKeyboardButton("🔙 Annuler", callback_data="cancel_edit")]
+                ]
+
+                await query.message.edit_text(
+                    f"✏️ Que souhaitez-vous modifier pour *{product_name}* ?\n"
+                    "Sélectionnez un champ à modifier:",
+                    reply_markup=InlineKeyboardMarkup(keyboard),
+                    parse_mode='Markdown'
+                )
+                return EDITING_PRODUCT_FIELD
+
+        return await show_admin_menu(update, context)
+    except Exception as e:
+        print(f"Erreur dans editp_: {e}")
+        return await show_admin_menu(update, context)
+
+
+@callback_router.exact("edit_name", "edit_price", "edit_desc")
+async def button_edit_field(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    field_mapping = {
+        "edit_name": "name",
+        "edit_price": "price",
+        "edit_desc": "description",
+    }
+    field = field_mapping[query.data]
+    context.user_data['editing_field'] = field
+
+    category = context.user_data.get('editing_category')
+    product_name = context.user_data.get('editing_product')
+
+    product = next((p for p in CATALOG[category] if p['name'] == product_name), None)
+
+    if product:
+        current_value = product.get(field, "Non défini")
+        if field == 'media':
             await query.message.edit_text(
-                text=welcome_text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode='HTML'  
+                "📸 Envoyez une nouvelle photo ou vidéo pour ce produit:\n"
+                "(ou cliquez sur Annuler pour revenir en arrière)",
+                reply_markup=InlineKeyboardMarkup([[
+                    InlineKeyboardButton("🔙 Annuler", callback_data="cancel_edit")
+                ]])
             )
-            return CHOOSING
+            return WAITING_PRODUCT_MEDIA
+        else:
+            field_names = {
+                'name': 'nom',
+                'price': 'prix',
+                'description': 'description'
+            }
+            await query.message.edit_text(
+                f"✏️ Modification du {field_names.get(field, field)}\n"
+                f"Valeur actuelle : {current_value}\n\n"
+                "Envoyez la nouvelle valeur :",
+                reply_markup=InlineKeyboardMarkup([[
+                    InlineKeyboardButton("🔙 Annuler", callback_data="cancel_edit")
+                ]])
+            )
+            return WAITING_NEW_VALUE
+
+
+@callback_router.exact("cancel_edit")
+async def button_cancel_edit(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    return await show_admin_menu(update, context)
+
+
+@callback_router.exact("confirm_reset_stats")
+async def button_confirm_reset_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    # Réinitialiser les statistiques
+    now = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+    stats_store.reset(
+        last_updated=now.split(" ")[1],  # Juste l'heure
+        last_reset=now.split(" ")[0]  # Juste la date
+    )
+
+    # Afficher un message de confirmation
+    keyboard = [[InlineKeyboardButton("🔙 Retour au menu", callback_data="admin")]]
+    await query.message.edit_text(
+        "✅ *Les statistiques ont été réinitialisées avec succès!*\n\n"
+        f"Date de réinitialisation : {get_stats()['last_reset']}\n\n"
+        "Les totaux sont maintenant à zéro (l'historique 24h / 7j / 30j est conservé).",
+        reply_markup=InlineKeyboardMarkup(keyboard),
+        parse_mode='Markdown'
+    )
+
+
+@callback_router.exact("show_categories")
+async def button_show_categories(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    # Boutons de catégories et retour à l'accueil
+    keyboard = categories_keyboard("view")
+
+    try:
+        message = await query.edit_message_text(
+            "📋 *Menu*\n\n"
+            "Choisissez une catégorie pour voir les produits :",
+            reply_markup=keyboard,
+            parse_mode='Markdown'
+        )
+        context.user_data['menu_message_id'] = message.message_id
+    except Exception as e:
+        print(f"Erreur lors de la mise à jour du message des catégories: {e}")
+        # Si la mise à jour échoue, recréez le message
+        message = await context.bot.send_message(
+            chat_id=query.message.chat_id,
+            text="📋 *Menu*\n\n"
+                 "Choisissez une catégorie pour voir les produits :",
+            reply_markup=keyboard,
+            parse_mode='Markdown'
+        )
+        context.user_data['menu_message_id'] = message.message_id
+
+
+@callback_router.exact("back_to_home")
+async def button_back_to_home(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    chat_id = update.effective_chat.id
+
+    # Texte et clavier d'accueil (mis en cache)
+    welcome_text, reply_markup = render_home_screen(str(update.effective_user.id) in ADMIN_IDS)
+
+    await query.message.edit_text(
+        text=welcome_text,
+        reply_markup=reply_markup,
+        parse_mode='HTML'  
+    )
+    return CHOOSING
+
+
+async def handle_normal_buttons(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Gestion des boutons normaux"""
+    query = update.callback_query
+    await query.answer()
+    await admin_features.register_user(update.effective_user)
+    cancel_deferred_transition(query.message.chat_id)
+    return await callback_router.dispatch(update, context)
+
 
 async def get_file_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler temporaire pour obtenir le file_id de l'image banner"""
@@ -1944,8 +1920,7 @@ async def get_file_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
         file_id = update.message.photo[-1].file_id
         CONFIG['banner_image'] = file_id
         # Sauvegarder dans config.json
-        with open('config.json', 'w', encoding='utf-8') as f:
-            json.dump(CONFIG, f, indent=4)
+        save_config()
         await update.message.reply_text(
             f"✅ Image banner enregistrée!\nFile ID: {file_id}"
         )
@@ -1957,49 +1932,15 @@ async def get_file_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
     else:
         chat_id = update.effective_chat.id
 
-    # Nouveau clavier simplifié pour l'accueil
-    keyboard = [
-        [InlineKeyboardButton("📋 MENU", callback_data="show_categories")]
-    ]
-
-    # Ajouter le bouton admin si l'utilisateur est administrateur
-    if str(update.effective_user.id) in ADMIN_IDS:
-        keyboard.append([InlineKeyboardButton("🔧 Menu Admin", callback_data="admin")])
-
-    # Configurer le bouton de contact en fonction du type (URL ou username)
-    contact_button = None
-    if CONFIG.get('contact_url'):
-        contact_button = InlineKeyboardButton("📞 Contact", url=CONFIG['contact_url'])
-    elif CONFIG.get('contact_username'):
-        contact_button = InlineKeyboardButton("📞 Contact Telegram", url=f"https://t.me/{CONFIG['contact_username']}")
-
-    # Ajouter les boutons de contact et canaux
-    if contact_button:
-        keyboard.extend([
-            [
-                contact_button,
-                InlineKeyboardButton("💭 Tchat telegram", url="https://t.me/+YsJIgYjY8_cyYzBk"),
-            ],
-            [InlineKeyboardButton("🥔 Canal potato", url="https://doudlj.org/joinchat/QwqUM5gH7Q8VqO3SnS4YwA")]
-        ])
-    else:
-        keyboard.extend([
-            [InlineKeyboardButton("💭 Tchat telegram", url="https://t.me/+YsJIgYjY8_cyYzBk")],
-            [InlineKeyboardButton("🥔 Canal potato", url="https://doudlj.org/joinchat/QwqUM5gH7Q8VqO3SnS4YwA")]
-        ])
-
-        welcome_text = CONFIG.get('welcome_message', 
-            "🌿 <b>Bienvenue votre bot !</b> 🌿\n\n"
-            "<b>Pour changer ce message d accueil, rendez vous dans l onglet admin.</b>\n"
-            "📋 Cliquez sur MENU pour voir les catégories"
-        )
+    # Texte et clavier d'accueil (mis en cache)
+    welcome_text, reply_markup = render_home_screen(str(update.effective_user.id) in ADMIN_IDS)
 
     try:
         if update.callback_query:
             # Si c'est un callback, on édite le message existant
             await update.callback_query.edit_message_text(
                 text=welcome_text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
+                reply_markup=reply_markup,
                 parse_mode='HTML'
             )
         else:
@@ -2007,7 +1948,7 @@ async def get_file_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
             menu_message = await context.bot.send_message(
                 chat_id=chat_id,
                 text=welcome_text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
+                reply_markup=reply_markup,
                 parse_mode='HTML'
             )
             context.user_data['menu_message_id'] = menu_message.message_id
@@ -2019,7 +1960,7 @@ async def get_file_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
             menu_message = await context.bot.send_message(
                 chat_id=chat_id,
                 text=welcome_text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
+                reply_markup=reply_markup,
                 parse_mode='HTML'
             )
             context.user_data['menu_message_id'] = menu_message.message_id
@@ -2033,12 +1974,37 @@ def main():
     try:
         # Créer l'application
         global admin_features
-        application = Application.builder().token(TOKEN).build()
-        admin_features = AdminFeatures()
+        application = (
+            Application.builder()
+            .token(TOKEN)
+            .post_init(post_init)
+            .post_stop(post_stop)
+            .post_shutdown(post_shutdown)
+            .build()
+        )
+        admin_features = AdminFeatures(
+            storage,
+            last_seen_resolution=CONFIG.get('last_seen_resolution', 60),
+            cleanup_queue=cleanup_queue,
+            broadcast_engine=BroadcastEngine(
+                rate=CONFIG.get('broadcast_rate', 25),
+                per_chat_interval=CONFIG.get('broadcast_per_chat_interval', 1.0),
+                concurrency=CONFIG.get('broadcast_concurrency', 20),
+                max_retries=CONFIG.get('broadcast_max_retries', 3)
+            ),
+            broadcast_history=BroadcastHistory(
+                CONFIG.get('broadcast_history_file', 'data/broadcast_history.json'),
+                keep=CONFIG.get('broadcast_history_keep', 50)
+            ),
+            broadcast_checkpoint_every=CONFIG.get('broadcast_checkpoint_every', 50),
+            broadcast_recheck_after=CONFIG.get('broadcast_recheck_days', 30) * 86400,
+            album_delay=CONFIG.get('broadcast_album_delay', 1.0),
+            broadcast_progress_interval=CONFIG.get('broadcast_progress_interval', 3.0)
+        )
 
         # Initialiser l'access manager
         global access_manager
-        access_manager = AccessManager()
+        access_manager = AccessManager(storage)
 
         # Gestionnaire de conversation principal
         conv_handler = ConversationHandler(
@@ -2050,6 +2016,8 @@ def main():
         states={
             CHOOSING: [
                 CallbackQueryHandler(handle_normal_buttons),
+                # Médias suivants d'un album en cours de diffusion
+                MessageHandler(filters.ATTACHMENT & ~filters.COMMAND, admin_features.collect_album_part),
             ],
             WAITING_CATEGORY_NAME: [
                 MessageHandler(filters.TEXT & ~filters.COMMAND, handle_category_name),
@@ -2117,7 +2085,7 @@ def main():
             ],
             WAITING_BROADCAST_MESSAGE: [
                 MessageHandler(
-                    (filters.TEXT | filters.PHOTO | filters.VIDEO) & ~filters.COMMAND,
+                    filters.UpdateType.MESSAGE & ~filters.COMMAND,
                     admin_features.send_broadcast_message
                 ),
                 CallbackQueryHandler(handle_normal_buttons)
@@ -2136,6 +2104,30 @@ def main():
         application.add_handler(CommandHandler("listcodes", admin_list_codes))
 
         application.add_handler(conv_handler)
+
+        # Compaction périodique du journal du catalogue
+        compact_interval = CONFIG.get('catalog_compact_interval', 60)
+        application.job_queue.run_repeating(compact_catalog, interval=compact_interval, first=compact_interval)
+
+        # Instantané périodique des compteurs de vues
+        stats_interval = CONFIG.get('stats_snapshot_interval', 60)
+        application.job_queue.run_repeating(save_stats, interval=stats_interval, first=stats_interval)
+
+        # Écriture groupée des utilisateurs vus récemment
+        users_interval = CONFIG.get('users_flush_interval', 30)
+        application.job_queue.run_repeating(flush_users, interval=users_interval, first=users_interval)
+
+        # Purge périodique des codes d'accès expirés
+        application.job_queue.run_repeating(
+            purge_access_codes,
+            interval=CONFIG.get('access_code_purge_interval', 3600),
+            first=10
+        )
+
+        # Sauvegardes incrémentales
+        backup_interval = CONFIG.get('backup_interval', 3600)
+        application.job_queue.run_repeating(run_backup, interval=backup_interval, first=backup_interval)
+
         # Démarrer le bot
         print("Bot démarré...")
         application.run_polling()
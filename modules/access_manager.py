@@ -1,83 +1,99 @@
-import json
+import heapq
 import random
 import string
 from datetime import datetime, timedelta
-import os
 
 class AccessManager:
-    def __init__(self):
-        self.access_file = "data/access_codes.json"
-        self._ensure_file_exists()
-        
-    def _ensure_file_exists(self):
-        """Crée le fichier d'accès s'il n'existe pas"""
-        if not os.path.exists("data"):
-            os.makedirs("data")
-        if not os.path.exists(self.access_file):
-            with open(self.access_file, 'w') as f:
-                json.dump({
-                    "codes": [],
-                    "authorized_users": []
-                }, f, indent=4)
+    def __init__(self, storage):
+        self.storage = storage
+        # Index en mémoire, rechargés seulement quand les données d'accès ont
+        # été modifiées en dehors du manager :
+        # - utilisateurs autorisés (ensemble)
+        # - codes par valeur, avec l'expiration déjà convertie en datetime
+        # - tas (expiration, code) pour purger les codes expirés dans l'ordre
+        self._authorized = None
+        self._codes = {}
+        self._expiry_heap = []
+        self._version = None
+
+    def _refresh(self) -> None:
+        """Recharge les index si le stockage a été modifié depuis le dernier chargement"""
+        version = self.storage.access_version()
+        if self._authorized is not None and version == self._version:
+            return
+
+        data = self.storage.load_access_data()
+        self._authorized = set(data["authorized_users"])
+        self._codes = {}
+        for c in data["codes"]:
+            self._codes[c["code"]] = dict(c, expires_at=datetime.fromisoformat(c["expiration"]))
+        self._expiry_heap = [(c["expires_at"], code) for code, c in self._codes.items()]
+        heapq.heapify(self._expiry_heap)
+        self._version = version
 
     def generate_code(self, admin_id: int) -> tuple[str, str]:
         """Génère un nouveau code d'accès"""
+        self._refresh()
+
         code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
-        expiration = (datetime.now() + timedelta(hours=24)).isoformat()
-        
-        with open(self.access_file, 'r') as f:
-            data = json.load(f)
-        
-        data["codes"].append({
+        expires_at = datetime.now() + timedelta(hours=24)
+        expiration = expires_at.isoformat()
+
+        record = {
             "code": code,
             "expiration": expiration,
             "created_by": admin_id,
             "used": False
-        })
-        
-        with open(self.access_file, 'w') as f:
-            json.dump(data, f, indent=4)
-            
+        }
+        self.storage.add_access_code(record)
+        self._codes[code] = dict(record, expires_at=expires_at)
+        heapq.heappush(self._expiry_heap, (expires_at, code))
+        self._version = self.storage.access_version()
+
         return code, expiration
 
     def verify_code(self, code: str, user_id: int) -> tuple[bool, str]:
         """Vérifie un code d'accès"""
-        with open(self.access_file, 'r') as f:
-            data = json.load(f)
-        
-        if user_id in data["authorized_users"]:
+        if self.is_authorized(user_id):
             return True, "already_authorized"
 
-        now = datetime.now()
-        
-        # Nettoyer les codes expirés
-        data["codes"] = [c for c in data["codes"] 
-                        if datetime.fromisoformat(c["expiration"]) > now]
-        
-        for c in data["codes"]:
-            if c["code"] == code and not c["used"]:
-                if datetime.fromisoformat(c["expiration"]) > now:
-                    c["used"] = True
-                    data["authorized_users"].append(user_id)
-                    with open(self.access_file, 'w') as f:
-                        json.dump(data, f, indent=4)
-                    return True, "success"
-                else:
-                    return False, "expired"
-        
-        return False, "invalid"
-    
+        c = self._codes.get(code)
+        if c is None or c["used"]:
+            return False, "invalid"
+        if c["expires_at"] <= datetime.now():
+            return False, "expired"
+
+        self.storage.use_access_code(code, user_id)
+        c["used"] = True
+        self._authorized.add(user_id)
+        self._version = self.storage.access_version()
+        return True, "success"
+
     def is_authorized(self, user_id: int) -> bool:
         """Vérifie si un utilisateur est autorisé"""
-        with open(self.access_file, 'r') as f:
-            data = json.load(f)
-        return user_id in data["authorized_users"]
-    
+        self._refresh()
+        return user_id in self._authorized
+
     def list_active_codes(self) -> list:
         """Liste tous les codes actifs"""
-        with open(self.access_file, 'r') as f:
-            data = json.load(f)
-        
+        self._refresh()
         now = datetime.now()
-        return [c for c in data["codes"] 
-                if not c["used"] and datetime.fromisoformat(c["expiration"]) > now]
\ No newline at end of file
+        active = [c for c in self._codes.values() if not c["used"] and c["expires_at"] > now]
+        return sorted(active, key=lambda c: c["expires_at"])
+
+    def purge_expired_codes(self) -> int:
+        """Supprime les codes expirés (appelé périodiquement, pas à la vérification)"""
+        self._refresh()
+        now = datetime.now()
+        purged = 0
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            expires_at, code = heapq.heappop(self._expiry_heap)
+            c = self._codes.get(code)
+            if c is not None and c["expires_at"] == expires_at:
+                del self._codes[code]
+                purged += 1
+
+        if purged:
+            self.storage.purge_expired_codes(now.isoformat())
+            self._version = self.storage.access_version()
+        return purged
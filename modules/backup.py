@@ -0,0 +1,189 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+from datetime import datetime
+
+
+class BackupManager:
+    """Sauvegardes incrémentales adressées par contenu.
+
+    Chaque fichier est haché (SHA-256) et stocké une seule fois, compressé,
+    dans objects/ ; une sauvegarde n'est qu'un manifeste (snapshots/<id>.json)
+    associant chaque chemin au hash de son contenu. Un fichier inchangé ne
+    coûte donc rien de plus qu'une ligne de manifeste.
+
+    Rétention : on garde la dernière sauvegarde de chacune des keep_hourly
+    dernières heures et de chacun des keep_daily derniers jours ; les objets
+    qui ne sont plus référencés sont supprimés.
+    """
+
+    def __init__(self, backup_dir: str = 'backups', keep_hourly: int = 24, keep_daily: int = 7):
+        self.backup_dir = backup_dir
+        self.objects_dir = os.path.join(backup_dir, 'objects')
+        self.snapshots_dir = os.path.join(backup_dir, 'snapshots')
+        self.keep_hourly = keep_hourly
+        self.keep_daily = keep_daily
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], f"{digest}.gz")
+
+    def _snapshot_path(self, snapshot_id: str) -> str:
+        return os.path.join(self.snapshots_dir, f"{snapshot_id}.json")
+
+    def _store_blob(self, data: bytes) -> tuple[str, bool]:
+        """Stocke un contenu s'il n'existe pas déjà ; renvoie (hash, nouveau)"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if os.path.exists(path):
+            return digest, False
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_file = f"{path}.tmp"
+        with gzip.open(tmp_file, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_file, path)
+        return digest, True
+
+    def create(self, sources: dict) -> str:
+        """Crée une sauvegarde de sources ({chemin d'origine: fichier à lire})"""
+        now = datetime.now()
+        snapshot_id = now.strftime("%Y%m%d_%H%M%S")
+        files = {}
+        new_blobs = 0
+
+        for path, source in sources.items():
+            try:
+                with open(source, 'rb') as f:
+                    data = f.read()
+            except FileNotFoundError:
+                # Absent au moment de la sauvegarde : supprimé à la restauration
+                files[path] = None
+                continue
+            files[path], is_new = self._store_blob(data)
+            new_blobs += is_new
+
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+        manifest = {'created_at': now.isoformat(), 'files': files, 'new_blobs': new_blobs}
+        tmp_file = f"{self._snapshot_path(snapshot_id)}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_file, self._snapshot_path(snapshot_id))
+        return snapshot_id
+
+    def list_snapshots(self) -> list:
+        """Identifiants des sauvegardes, de la plus ancienne à la plus récente"""
+        try:
+            names = os.listdir(self.snapshots_dir)
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-5] for name in names if name.endswith('.json'))
+
+    def load_manifest(self, snapshot_id: str) -> dict:
+        with open(self._snapshot_path(snapshot_id), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def prune(self) -> int:
+        """Applique la politique de rétention ; renvoie le nombre de sauvegardes supprimées"""
+        snapshots = self.list_snapshots()
+        if not snapshots:
+            return 0
+
+        # Parcours du plus récent au plus ancien : la première sauvegarde vue
+        # dans une heure (ou un jour) est la dernière de cette période
+        keep = {snapshots[-1]}
+        hours, days = [], []
+        for snapshot_id in reversed(snapshots):
+            hour, day = snapshot_id[:11], snapshot_id[:8]
+            if hour not in hours and len(hours) < self.keep_hourly:
+                hours.append(hour)
+                keep.add(snapshot_id)
+            if day not in days and len(days) < self.keep_daily:
+                days.append(day)
+                keep.add(snapshot_id)
+
+        removed = 0
+        for snapshot_id in snapshots:
+            if snapshot_id not in keep:
+                os.remove(self._snapshot_path(snapshot_id))
+                removed += 1
+
+        if removed:
+            self._collect_garbage()
+        return removed
+
+    def _collect_garbage(self) -> None:
+        """Supprime les objets qui ne sont plus référencés par aucune sauvegarde"""
+        referenced = set()
+        for snapshot_id in self.list_snapshots():
+            referenced.update(d for d in self.load_manifest(snapshot_id)['files'].values() if d)
+
+        for root, _, names in os.walk(self.objects_dir):
+            for name in names:
+                if name.endswith('.gz') and name[:-3] not in referenced:
+                    os.remove(os.path.join(root, name))
+
+    def restore(self, snapshot_id: str) -> list:
+        """Remet tous les fichiers dans l'état de la sauvegarde (bot arrêté)"""
+        manifest = self.load_manifest(snapshot_id)
+        restored = []
+
+        for path, digest in manifest['files'].items():
+            # Fichiers WAL d'une base SQLite : ils ne correspondent plus au fichier restauré
+            for suffix in ('-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+            if digest is None:
+                if os.path.exists(path):
+                    os.remove(path)
+                continue
+
+            with gzip.open(self._object_path(digest), 'rb') as f:
+                data = f.read()
+            if hashlib.sha256(data).hexdigest() != digest:
+                raise ValueError(f"Objet corrompu pour {path} : {digest}")
+
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_file = f"{path}.tmp"
+            with open(tmp_file, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_file, path)
+            restored.append(path)
+
+        return restored
+
+
+def main():
+    """Ligne de commande : python -m modules.backup list | restore <id>"""
+    parser = argparse.ArgumentParser(description="Sauvegardes du bot")
+    parser.add_argument('--dir', default='backups', help="dossier des sauvegardes")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help="liste les sauvegardes")
+    restore = commands.add_parser('restore', help="restaure une sauvegarde (arrêter le bot avant)")
+    restore.add_argument('snapshot', help="identifiant de la sauvegarde, ou 'latest'")
+    args = parser.parse_args()
+
+    manager = BackupManager(args.dir)
+    snapshots = manager.list_snapshots()
+
+    if args.command == 'list':
+        for snapshot_id in snapshots:
+            manifest = manager.load_manifest(snapshot_id)
+            print(f"{snapshot_id}  {len(manifest['files'])} fichiers, {manifest['new_blobs']} nouveaux")
+        return
+
+    snapshot_id = snapshots[-1] if args.snapshot == 'latest' and snapshots else args.snapshot
+    if snapshot_id not in snapshots:
+        print(f"Erreur: sauvegarde introuvable : {args.snapshot}")
+        return
+    for path in manager.restore(snapshot_id):
+        print(f"♻️ Restauré : {path}")
+    print(f"✅ État du {snapshot_id} restauré")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+import asyncio
+import time
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+
+
+# Catégories d'échec d'un envoi
+FAILURE_FORBIDDEN = 'forbidden'            # bot bloqué, compte supprimé
+FAILURE_CHAT_NOT_FOUND = 'chat_not_found'  # chat inexistant
+FAILURE_TRANSIENT = 'transient'            # erreur réseau persistante
+FAILURE_OTHER = 'other'                    # contenu refusé, erreur inattendue
+
+# Échecs qui rendent le destinataire injoignable
+PERMANENT_FAILURES = (FAILURE_FORBIDDEN, FAILURE_CHAT_NOT_FOUND)
+
+
+def classify_failure(error: Exception) -> str:
+    """Catégorie d'une erreur d'envoi"""
+    if isinstance(error, Forbidden):
+        return FAILURE_FORBIDDEN
+    if isinstance(error, BadRequest):
+        message = error.message.lower()
+        if 'chat not found' in message or 'user not found' in message:
+            return FAILURE_CHAT_NOT_FOUND
+        return FAILURE_OTHER
+    if isinstance(error, NetworkError):
+        return FAILURE_TRANSIENT
+    return FAILURE_OTHER
+
+
+def retry_delay(error: RetryAfter) -> float:
+    """Délai demandé par Telegram, en secondes (int ou timedelta selon la version)"""
+    delay = error.retry_after
+    if hasattr(delay, 'total_seconds'):
+        delay = delay.total_seconds()
+    return float(delay)
+
+
+class TokenBucket:
+    """Limiteur global : au plus `rate` envois par seconde, rafales de `capacity`.
+
+    Une capacité de 1 (par défaut) étale les envois régulièrement : aucune
+    fenêtre d'une seconde ne dépasse `rate` messages.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Attend qu'un envoi soit autorisé (les demandeurs passent dans l'ordre)"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Suspend tous les envois (RetryAfter : la limite de Telegram est globale au bot)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+
+class BroadcastResult:
+    """Compteurs d'une diffusion, mis à jour au fil des envois.
+
+    cursor est l'indice du premier destinataire non traité : tous ceux qui
+    le précèdent ont été servis (ou ont échoué). Les envois concurrents
+    pouvant se terminer dans le désordre, les indices déjà traités au-delà
+    du curseur sont gardés dans `ahead`. Une diffusion reprise après un
+    redémarrage repart de ces deux valeurs.
+    """
+
+    __slots__ = ('total', 'success', 'failed', 'retries', 'failures', 'failure_kinds', 'unreachable',
+                 'delivered', 'cursor', 'ahead', 'previous_elapsed', 'started_at', 'finished_at')
+
+    def __init__(self, total: int, success: int = 0, failed: int = 0, retries: int = 0,
+                 cursor: int = 0, ahead=(), previous_elapsed: float = 0.0, failure_kinds=None):
+        self.total = total
+        self.success = success
+        self.failed = failed
+        self.retries = retries
+        # Détail des échecs de cette exécution : chat -> message d'erreur
+        self.failures = {}
+        # Nombre d'échecs par catégorie (cumulé sur les reprises)
+        self.failure_kinds = dict(failure_kinds or {})
+        # Destinataires devenus injoignables, pas encore marqués dans le registre
+        self.unreachable = []
+        # Destinataires servis, pas encore réintégrés dans le registre
+        self.delivered = []
+        self.cursor = cursor
+        self.ahead = set(ahead)
+        self.previous_elapsed = previous_elapsed
+        self.started_at = time.monotonic()
+        self.finished_at = None
+
+    @property
+    def done(self) -> int:
+        return self.success + self.failed
+
+    @property
+    def elapsed(self) -> float:
+        """Durée totale, y compris les exécutions précédentes (avant un redémarrage)"""
+        return self.previous_elapsed + (self.finished_at or time.monotonic()) - self.started_at
+
+    def record_failure(self, chat_id: int, kind: str, error: Exception) -> None:
+        self.failed += 1
+        self.failures[chat_id] = str(error)
+        self.failure_kinds[kind] = self.failure_kinds.get(kind, 0) + 1
+        if kind in PERMANENT_FAILURES:
+            self.unreachable.append(chat_id)
+
+    def mark_done(self, index: int) -> None:
+        """Note que le destinataire d'indice index est traité et avance le curseur"""
+        self.ahead.add(index)
+        while self.cursor in self.ahead:
+            self.ahead.remove(self.cursor)
+            self.cursor += 1
+
+    @property
+    def rate(self) -> float:
+        """Débit moyen observé (envois par seconde)"""
+        elapsed = self.elapsed
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+
+class BroadcastControl:
+    """Pause / reprise d'une diffusion en cours.
+
+    En pause, les envois déjà partis se terminent et aucun nouveau ne
+    commence.
+    """
+
+    def __init__(self, paused: bool = False):
+        self._running = asyncio.Event()
+        if not paused:
+            self._running.set()
+
+    @property
+    def paused(self) -> bool:
+        return not self._running.is_set()
+
+    def pause(self) -> None:
+        self._running.clear()
+
+    def resume(self) -> None:
+        self._running.set()
+
+    async def wait(self) -> None:
+        """Attend que la diffusion ne soit plus en pause"""
+        await self._running.wait()
+
+
+class BroadcastEngine:
+    """Envoi d'un message à de nombreux chats en respectant les limites de Telegram.
+
+    - seau à jetons global (`rate` messages par seconde pour tout le bot) ;
+    - au plus un message par chat toutes les `per_chat_interval` secondes ;
+    - `concurrency` envois simultanés au maximum ;
+    - RetryAfter : pause globale du délai demandé puis nouvel essai (sans limite) ;
+      erreurs réseau : nouvel essai avec attente exponentielle ;
+      autres erreurs : échec, classé par classify_failure (result.unreachable
+      liste les destinataires à exclure des prochaines diffusions,
+      result.delivered ceux qui ont reçu le message).
+    """
+
+    def __init__(self, rate: float = 25, per_chat_interval: float = 1.0,
+                 concurrency: int = 20, max_retries: int = 3):
+        self.bucket = TokenBucket(rate)
+        self.per_chat_interval = per_chat_interval
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self._last_sent = {}
+
+    async def _wait_for_chat(self, chat_id: int) -> None:
+        last = self._last_sent.get(chat_id)
+        if last is not None:
+            delay = last + self.per_chat_interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+    async def _send(self, chat_id: int, send, result: BroadcastResult) -> None:
+        attempt = 0
+        while True:
+            await self._wait_for_chat(chat_id)
+            await self.bucket.acquire()
+            self._last_sent[chat_id] = time.monotonic()
+            try:
+                await send(chat_id)
+                result.success += 1
+                result.delivered.append(chat_id)
+                return
+            except RetryAfter as e:
+                # Pas compté comme un essai : Telegram indique quand réessayer
+                self.bucket.pause(retry_delay(e))
+                result.retries += 1
+                continue
+            except Exception as e:
+                kind = classify_failure(e)
+                if kind == FAILURE_TRANSIENT and attempt < self.max_retries:
+                    await asyncio.sleep(2 ** attempt)
+                    attempt += 1
+                    result.retries += 1
+                    continue
+                result.record_failure(chat_id, kind, e)
+                return
+
+    async def run(self, chat_ids, send, on_progress=None, progress_interval: float = 2.0,
+                  result: BroadcastResult = None, on_checkpoint=None,
+                  checkpoint_every: int = 50, control: BroadcastControl = None) -> BroadcastResult:
+        """Envoie à chaque chat de chat_ids via `await send(chat_id)`.
+
+        on_progress(result), si fourni, est appelé toutes les
+        `progress_interval` secondes pendant la diffusion. on_checkpoint(result)
+        est appelé tous les `checkpoint_every` destinataires traités, puis à
+        la fin. Passer le result d'une exécution précédente reprend la
+        diffusion à son curseur ; control permet de la mettre en pause.
+        """
+        chat_ids = list(chat_ids)
+        if result is None:
+            result = BroadcastResult(len(chat_ids))
+        pending = (
+            (index, chat_ids[index])
+            for index in range(result.cursor, len(chat_ids))
+            if index not in result.ahead
+        )
+        since_checkpoint = 0
+
+        async def worker():
+            nonlocal since_checkpoint
+            for index, chat_id in pending:
+                if control is not None:
+                    await control.wait()
+                await self._send(chat_id, send, result)
+                result.mark_done(index)
+                since_checkpoint += 1
+                if on_checkpoint is not None and since_checkpoint >= checkpoint_every:
+                    since_checkpoint = 0
+                    await on_checkpoint(result)
+
+        async def report():
+            while True:
+                await asyncio.sleep(progress_interval)
+                try:
+                    await on_progress(result)
+                except Exception as e:
+                    print(f"Erreur lors de la mise à jour de la progression: {e}")
+
+        reporter = asyncio.create_task(report()) if on_progress is not None else None
+        try:
+            await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(chat_ids)))))
+            if on_checkpoint is not None:
+                await on_checkpoint(result)
+        finally:
+            result.finished_at = time.monotonic()
+            if reporter is not None:
+                reporter.cancel()
+            # Oublier les chats dont l'intervalle minimal est écoulé
+            cutoff = result.finished_at - self.per_chat_interval
+            self._last_sent = {chat_id: sent for chat_id, sent in self._last_sent.items() if sent > cutoff}
+        return result
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import os
+import secrets
+from datetime import datetime
+
+from modules.broadcast import BroadcastResult
+
+HISTORY_FORMAT = 1
+
+
+class BroadcastHistory:
+    """Diffusions persistées dans data/broadcast_history.json.
+
+    Chaque diffusion est un job : le contenu à envoyer, la liste figée des
+    destinataires et un curseur enregistré régulièrement pendant l'envoi.
+    Un job encore « running » au démarrage a été interrompu (arrêt ou
+    plantage) et reprend à son curseur, sans renvoyer le message à ceux qui
+    l'ont déjà reçu. Une fois terminé, le job ne garde que ses compteurs
+    (envois, échecs par catégorie, durée) ; seuls les `keep` derniers sont
+    conservés.
+    """
+
+    def __init__(self, history_file: str = 'data/broadcast_history.json', keep: int = 50):
+        self.history_file = history_file
+        self.keep = keep
+        self.jobs = self._load()
+        self._save_lock = asyncio.Lock()
+
+    def _load(self) -> list:
+        try:
+            with open(self.history_file, 'r', encoding='utf-8') as f:
+                content = f.read()
+        except FileNotFoundError:
+            return []
+        if not content.strip():
+            return []
+        try:
+            data = json.loads(content)
+        except json.JSONDecodeError as e:
+            print(f"Historique des diffusions illisible, ignoré : {e}")
+            return []
+        return data.get("jobs", [])
+
+    def _write(self, content: str) -> None:
+        directory = os.path.dirname(self.history_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_file = f"{self.history_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_file, self.history_file)
+
+    async def save(self) -> None:
+        """Écrit l'historique (sérialisé dans la boucle, écrit dans un thread)"""
+        async with self._save_lock:
+            content = json.dumps({"format": HISTORY_FORMAT, "jobs": self.jobs},
+                                 ensure_ascii=False, separators=(',', ':'))
+            try:
+                await asyncio.to_thread(self._write, content)
+            except Exception as e:
+                print(f"Erreur lors de la sauvegarde de l'historique des diffusions : {e}")
+
+    async def create(self, admin_chat_id: int, progress_message_id: int, summary: str,
+                     content: dict, recipients: list, excluded: int = 0) -> dict:
+        """Enregistre une nouvelle diffusion avant le premier envoi.
+
+        excluded est le nombre d'utilisateurs écartés car injoignables.
+        """
+        job = {
+            "id": f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{secrets.token_hex(2)}",
+            "status": "running",
+            "created_at": datetime.now().isoformat(timespec='seconds'),
+            "finished_at": None,
+            "admin_chat_id": admin_chat_id,
+            "progress_message_id": progress_message_id,
+            "summary": summary,
+            "content": content,
+            "recipients": recipients,
+            "total": len(recipients),
+            "excluded": excluded,
+            "cursor": 0,
+            "ahead": [],
+            "success": 0,
+            "failed": 0,
+            "failure_kinds": {},
+            "retries": 0,
+            "duration": 0.0,
+        }
+        self.jobs.append(job)
+        await self.save()
+        return job
+
+    def unfinished(self) -> list:
+        """Diffusions interrompues, à reprendre"""
+        return [job for job in self.jobs if job["status"] == "running"]
+
+    @staticmethod
+    def result_for(job: dict) -> BroadcastResult:
+        """Compteurs et curseur du job, pour reprendre l'envoi"""
+        return BroadcastResult(
+            job["total"],
+            success=job["success"],
+            failed=job["failed"],
+            retries=job["retries"],
+            cursor=job["cursor"],
+            ahead=job["ahead"],
+            previous_elapsed=job["duration"],
+            failure_kinds=job.get("failure_kinds")
+        )
+
+    @staticmethod
+    def _record(job: dict, result: BroadcastResult) -> None:
+        job["cursor"] = result.cursor
+        job["ahead"] = sorted(result.ahead)
+        job["success"] = result.success
+        job["failed"] = result.failed
+        job["failure_kinds"] = dict(result.failure_kinds)
+        job["retries"] = result.retries
+        job["duration"] = round(result.elapsed, 1)
+
+    async def checkpoint(self, job: dict, result: BroadcastResult) -> None:
+        """Enregistre l'avancement du job"""
+        self._record(job, result)
+        await self.save()
+
+    async def finish(self, job: dict, result: BroadcastResult, status: str = "done") -> None:
+        """Clôt le job : garde les compteurs, oublie les destinataires"""
+        self._record(job, result)
+        job["status"] = status
+        job["finished_at"] = datetime.now().isoformat(timespec='seconds')
+        job.pop("recipients", None)
+        job.pop("ahead", None)
+        finished = [j for j in self.jobs if j["status"] != "running"]
+        for old in finished[:-self.keep]:
+            self.jobs.remove(old)
+        await self.save()
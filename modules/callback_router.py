@@ -0,0 +1,65 @@
+class CallbackRouter:
+    """Aiguillage des callback_data vers leurs handlers.
+
+    Les clés exactes sont cherchées dans un dictionnaire (O(1)) ; sinon, les
+    préfixes sont parcourus dans un trie caractère par caractère et le plus
+    long préfixe enregistré l'emporte (O(longueur du callback_data)).
+    """
+
+    _HANDLER = object()
+
+    def __init__(self):
+        self._exact = {}
+        self._prefixes = {}
+
+    def add_exact(self, key: str, handler) -> None:
+        if key in self._exact:
+            raise ValueError(f"Callback déjà enregistré : {key}")
+        self._exact[key] = handler
+
+    def add_prefix(self, prefix: str, handler) -> None:
+        node = self._prefixes
+        for char in prefix:
+            node = node.setdefault(char, {})
+        if self._HANDLER in node:
+            raise ValueError(f"Préfixe déjà enregistré : {prefix}")
+        node[self._HANDLER] = handler
+
+    def exact(self, *keys: str):
+        """Décorateur : enregistre le handler pour une ou plusieurs clés exactes"""
+        def decorator(handler):
+            for key in keys:
+                self.add_exact(key, handler)
+            return handler
+        return decorator
+
+    def prefix(self, *prefixes: str):
+        """Décorateur : enregistre le handler pour un ou plusieurs préfixes"""
+        def decorator(handler):
+            for prefix in prefixes:
+                self.add_prefix(prefix, handler)
+            return handler
+        return decorator
+
+    def resolve(self, data: str):
+        """Handler correspondant à data (clé exacte, sinon plus long préfixe), ou None"""
+        handler = self._exact.get(data)
+        if handler is not None:
+            return handler
+
+        marker = self._HANDLER
+        node = self._prefixes
+        for char in data:
+            node = node.get(char)
+            if node is None:
+                break
+            if marker in node:
+                handler = node[marker]
+        return handler
+
+    async def dispatch(self, update, context):
+        """Appelle le handler du callback_data reçu ; None si aucun ne correspond"""
+        handler = self.resolve(update.callback_query.data or "")
+        if handler is None:
+            return None
+        return await handler(update, context)
@@ -0,0 +1,77 @@
+import hashlib
+
+
+def category_id(name: str) -> str:
+    """Identifiant court d'une catégorie.
+
+    Une catégorie ne peut pas être renommée (seulement créée ou supprimée) :
+    un identifiant dérivé de son nom est donc stable, et n'a pas besoin
+    d'être stocké à part dans les deux backends.
+    """
+    return 'c' + hashlib.sha1(name.encode('utf-8')).hexdigest()[:8]
+
+
+def _to_base36(number: int) -> str:
+    digits = '0123456789abcdefghijklmnopqrstuvwxyz'
+    text = ''
+    while True:
+        number, rest = divmod(number, 36)
+        text = digits[rest] + text
+        if not number:
+            return text
+
+
+class CatalogIndex:
+    """Index en mémoire identifiant -> catégorie / produit.
+
+    Chaque produit porte un identifiant court et stable (champ 'id', en
+    base 36), conservé lorsqu'il est renommé. Les callback_data transportent
+    ces identifiants : les retrouver coûte une seule recherche dans un
+    dictionnaire, au lieu de parcourir le catalogue par préfixe de nom.
+    L'index est reconstruit après chaque mutation du catalogue, ce qui
+    incrémente sa version (utilisée pour invalider les claviers en cache).
+    """
+
+    def __init__(self):
+        self._categories = {}
+        self._products = {}
+        self._next_id = 1
+        self.version = 0
+
+    def rebuild(self, catalog: dict) -> int:
+        """Reconstruit l'index ; renvoie le nombre de produits à qui un id a été attribué"""
+        self.version += 1
+        self._categories = {}
+        self._products = {}
+        missing = []
+
+        for category, products in catalog.items():
+            if category == 'stats':
+                continue
+            self._categories[category_id(category)] = category
+            for product in products:
+                product_id = product.get('id')
+                if product_id is None or product_id in self._products:
+                    missing.append((category, product))
+                    continue
+                self._products[product_id] = (category, product)
+                self._next_id = max(self._next_id, int(product_id, 36) + 1)
+
+        for category, product in missing:
+            product['id'] = self.new_product_id()
+            self._products[product['id']] = (category, product)
+
+        return len(missing)
+
+    def new_product_id(self) -> str:
+        product_id = _to_base36(self._next_id)
+        self._next_id += 1
+        return product_id
+
+    def category(self, cat_id: str):
+        """Nom de la catégorie, ou None"""
+        return self._categories.get(cat_id)
+
+    def product(self, product_id: str) -> tuple:
+        """(catégorie, produit), ou (None, None)"""
+        return self._products.get(product_id, (None, None))
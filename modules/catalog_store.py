@@ -0,0 +1,148 @@
+import json
+import os
+
+SEQ_KEY = "_log_seq"
+LEGACY_STATS_OPS = ("view_category", "view_product", "reset_stats")
+
+
+def apply_catalog_op(catalog: dict, op: dict) -> None:
+    """Applique une mutation du journal au catalogue en mémoire"""
+    kind = op["op"]
+    category = op.get("category")
+
+    if kind == "add_category":
+        catalog.setdefault(category, [])
+
+    elif kind == "delete_category":
+        catalog.pop(category, None)
+
+    elif kind == "add_product":
+        catalog.setdefault(category, []).append(op["product"])
+
+    elif kind == "edit_product":
+        for product in catalog.get(category, []):
+            if product['name'] == op["name"]:
+                product[op["field"]] = op["value"]
+                break
+
+    elif kind == "delete_product":
+        if category in catalog:
+            catalog[category] = [p for p in catalog[category] if p['name'] != op["name"]]
+
+    elif kind in LEGACY_STATS_OPS:
+        # Les vues sont désormais comptées par StatsStore
+        pass
+
+    else:
+        print(f"Opération de catalogue inconnue ignorée : {kind}")
+
+
+class CatalogStore:
+    """Catalogue persisté sous forme d'instantané JSON + journal de mutations.
+
+    Chaque modification est ajoutée en fin de journal (une ligne JSON) au lieu
+    de réécrire tout le fichier. La compaction replie le journal dans un nouvel
+    instantané ; le numéro de séquence enregistré dans l'instantané permet de
+    ne pas rejouer deux fois des entrées si l'arrêt survient pendant la compaction.
+    """
+
+    def __init__(self, catalog_file: str, compact_threshold: int = 500):
+        self.catalog_file = catalog_file
+        self.log_file = f"{catalog_file}.log"
+        self.compact_threshold = compact_threshold
+        self.seq = 0
+        self.pending_records = 0
+        self._log = None
+
+    def load(self) -> dict:
+        """Charge l'instantané puis rejoue le journal"""
+        try:
+            with open(self.catalog_file, 'r', encoding='utf-8') as f:
+                catalog = json.load(f)
+        except FileNotFoundError:
+            catalog = {}
+
+        self.seq = catalog.pop(SEQ_KEY, 0)
+        self.pending_records = 0
+
+        if not os.path.exists(self.log_file):
+            return catalog
+
+        # Début d'une dernière ligne tronquée, et fin de ligne manquante
+        torn_at = None
+        missing_newline = False
+        offset = 0
+        with open(self.log_file, 'rb') as f:
+            for raw_line in f:
+                line_start = offset
+                offset += len(raw_line)
+                # Seule la dernière ligne peut ne pas finir par un saut de ligne
+                terminated = raw_line.endswith(b"\n")
+                line = raw_line.strip()
+                if not line:
+                    continue
+                try:
+                    op = json.loads(line.decode('utf-8'))
+                except (UnicodeDecodeError, json.JSONDecodeError):
+                    if not terminated:
+                        # Dernière ligne tronquée par un arrêt brutal
+                        torn_at = line_start
+                    else:
+                        # Ligne corrompue au milieu du journal : les suivantes restent valables
+                        print(f"Entrée de journal corrompue ignorée (octet {line_start}) : {line[:80]!r}")
+                    continue
+                missing_newline = not terminated
+                if op.get("seq", 0) > self.seq:
+                    apply_catalog_op(catalog, op)
+                    self.seq = op["seq"]
+                    self.pending_records += 1
+
+        # Retirer la ligne tronquée : sans cela, la prochaine entrée serait
+        # écrite à sa suite et deviendrait illisible à son tour
+        if torn_at is not None:
+            print(f"Fin de journal tronquée retirée (octet {torn_at})")
+            with open(self.log_file, 'r+b') as f:
+                f.truncate(torn_at)
+                f.flush()
+                os.fsync(f.fileno())
+        elif missing_newline:
+            with open(self.log_file, 'ab') as f:
+                f.write(b"\n")
+
+        return catalog
+
+    def append(self, op: dict) -> None:
+        """Ajoute une mutation en fin de journal"""
+        if self._log is None:
+            self._log = open(self.log_file, 'a', encoding='utf-8')
+        self.seq += 1
+        record = dict(op, seq=self.seq)
+        self._log.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._log.flush()
+        self.pending_records += 1
+
+    def sync(self) -> None:
+        """Force l'écriture sur disque des entrées ajoutées (une fois par lot)"""
+        if self._log is not None:
+            os.fsync(self._log.fileno())
+
+    def needs_compaction(self) -> bool:
+        return self.pending_records >= self.compact_threshold
+
+    def compact(self, catalog: dict) -> None:
+        """Écrit un nouvel instantané complet et vide le journal"""
+        snapshot = dict(catalog)
+        snapshot[SEQ_KEY] = self.seq
+
+        tmp_file = f"{self.catalog_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, indent=4, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.catalog_file)
+
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        open(self.log_file, 'w', encoding='utf-8').close()
+        self.pending_records = 0
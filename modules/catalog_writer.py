@@ -0,0 +1,110 @@
+import asyncio
+import copy
+import threading
+
+
+class CatalogWriter:
+    """Écriture différée (write-behind) des mutations du catalogue.
+
+    Les handlers appliquent la mutation au CATALOG en mémoire puis appellent
+    record() : rien n'est écrit dans la boucle asyncio. Une tâche de fond
+    regroupe les mutations et les écrit dans un thread, au plus tard
+    flush_interval secondes après la première, ou dès que max_pending
+    mutations sont en attente.
+    """
+
+    def __init__(self, storage, flush_interval: float = 0.5, max_pending: int = 100):
+        self.storage = storage
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = []
+        self._dirty = None
+        self._full = None
+        self._flush_lock = None
+        self._write_lock = threading.Lock()
+        self._task = None
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._pending)
+
+    def record(self, op: dict) -> None:
+        """Ajoute une mutation à la file d'écriture"""
+        self._pending.append(op)
+        if self._dirty is not None:
+            self._dirty.set()
+            if len(self._pending) >= self.max_pending:
+                self._full.set()
+
+    async def start(self) -> None:
+        """Démarre la tâche d'écriture (à appeler depuis la boucle de l'application)"""
+        self._dirty = asyncio.Event()
+        self._full = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        if self._pending:
+            self._dirty.set()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Arrête la tâche et écrit les dernières mutations"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await self._dirty.wait()
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Écrit toutes les mutations en attente hors de la boucle"""
+        if self._flush_lock is None:
+            self._write(self._take_pending())
+            return
+        async with self._flush_lock:
+            ops = self._take_pending()
+            if ops:
+                await asyncio.to_thread(self._write, ops)
+
+    async def compact(self, catalog: dict) -> None:
+        """Écrit un instantané complet cohérent avec les mutations déjà journalisées"""
+        async with self._flush_lock:
+            # Aucun await entre la prise des mutations et la copie : l'instantané
+            # contient exactement les mutations écrites juste avant lui.
+            ops = self._take_pending()
+            snapshot = copy.deepcopy(catalog)
+            await asyncio.to_thread(self._compact, ops, snapshot)
+
+    def _take_pending(self) -> list:
+        ops, self._pending = self._pending, []
+        if self._dirty is not None:
+            self._dirty.clear()
+            self._full.clear()
+        return ops
+
+    def _write(self, ops: list) -> None:
+        with self._write_lock:
+            for op in ops:
+                try:
+                    self.storage.apply_catalog_op(op)
+                except Exception as e:
+                    print(f"Erreur lors de l'écriture d'une mutation du catalogue ({op.get('op')}): {e}")
+            if ops:
+                try:
+                    self.storage.sync_catalog()
+                except Exception as e:
+                    print(f"Erreur lors de la synchronisation du journal du catalogue: {e}")
+
+    def _compact(self, ops: list, snapshot: dict) -> None:
+        self._write(ops)
+        with self._write_lock:
+            self.storage.save_catalog(snapshot)
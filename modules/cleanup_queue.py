@@ -0,0 +1,83 @@
+import asyncio
+
+from modules.message_cleanup import delete_messages
+
+
+class CleanupQueue:
+    """File de suppression des anciens messages, vidée en tâche de fond.
+
+    Les handlers appellent enqueue() puis affichent le nouvel écran sans
+    attendre : la suppression ne se trouve plus sur le chemin critique.
+    Les identifiants sont regroupés par chat ; après un court délai de
+    regroupement, chaque chat est vidé en un appel deleteMessages, au plus
+    `concurrency` chats à la fois.
+    """
+
+    def __init__(self, concurrency: int = 5, coalesce_delay: float = 0.2):
+        self.concurrency = concurrency
+        self.coalesce_delay = coalesce_delay
+        self._pending = {}
+        self._in_flight = 0
+        self._bot = None
+        self._wakeup = None
+        self._task = None
+
+    @property
+    def backlog(self) -> int:
+        """Nombre de messages en attente de suppression (métrique)"""
+        return sum(len(ids) for ids in self._pending.values()) + self._in_flight
+
+    def enqueue(self, chat_id: int, *message_ids) -> None:
+        """Ajoute des messages à supprimer (les None sont ignorés)"""
+        ids = {message_id for message_id in message_ids if message_id is not None}
+        if not ids:
+            return
+        self._pending.setdefault(chat_id, set()).update(ids)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self, bot) -> None:
+        """Démarre la tâche de fond (à appeler depuis la boucle de l'application)"""
+        self._bot = bot
+        self._wakeup = asyncio.Event()
+        if self._pending:
+            self._wakeup.set()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Arrête la tâche et supprime ce qui reste en attente"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.drain()
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            # Laisser les suppressions d'un même écran se regrouper
+            await asyncio.sleep(self.coalesce_delay)
+            self._wakeup.clear()
+            await self.drain()
+
+    async def drain(self) -> None:
+        """Supprime tous les messages en attente"""
+        if self._bot is None or not self._pending:
+            return
+        batches, self._pending = self._pending, {}
+        self._in_flight += sum(len(ids) for ids in batches.values())
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def drain_chat(chat_id: int, ids: set) -> None:
+            async with semaphore:
+                try:
+                    await delete_messages(self._bot, chat_id, ids, concurrency=self.concurrency)
+                except Exception as e:
+                    print(f"Erreur lors du nettoyage des messages du chat {chat_id}: {e}")
+                finally:
+                    self._in_flight -= len(ids)
+
+        await asyncio.gather(*(drain_chat(chat_id, ids) for chat_id, ids in batches.items()))
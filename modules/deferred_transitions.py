@@ -0,0 +1,51 @@
+class DeferredTransitions:
+    """Changements d'écran différés, planifiés sur la JobQueue de l'application.
+
+    Au lieu d'attendre quelques secondes dans le handler (asyncio.sleep), on
+    planifie la transition et le handler rend la main tout de suite. Une
+    seule transition est en attente par chat : en planifier une nouvelle,
+    ou appeler cancel() quand l'utilisateur navigue ailleurs, annule la
+    précédente.
+    """
+
+    def __init__(self, delay: float = 3.0):
+        self.delay = delay
+        self._jobs = {}
+
+    def schedule(self, job_queue, chat_id: int, callback, message_id: int, user_id: int = None):
+        """Planifie callback(context) dans `delay` secondes.
+
+        message_id est le message concerné par la transition ; il est
+        disponible dans context.job.data.
+        """
+        self.cancel(chat_id)
+        job = job_queue.run_once(
+            self._run(callback),
+            self.delay,
+            data=message_id,
+            chat_id=chat_id,
+            user_id=user_id,
+            name=f"transition_{chat_id}"
+        )
+        self._jobs[chat_id] = job
+        return job
+
+    def cancel(self, chat_id: int):
+        """Annule la transition en attente du chat.
+
+        Retourne l'identifiant du message concerné, ou None s'il n'y avait
+        rien à annuler.
+        """
+        job = self._jobs.pop(chat_id, None)
+        if job is None:
+            return None
+        job.schedule_removal()
+        return job.data
+
+    def _run(self, callback):
+        async def run(context):
+            job = context.job
+            if self._jobs.get(job.chat_id) is job:
+                del self._jobs[job.chat_id]
+            await callback(context)
+        return run
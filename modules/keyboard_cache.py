@@ -0,0 +1,25 @@
+class KeyboardCache:
+    """Claviers inline construits une fois par version du catalogue.
+
+    Les InlineKeyboardMarkup étant immuables, le même objet est partagé par
+    tous les utilisateurs. Dès que la version du catalogue change, tout le
+    cache est vidé et chaque clavier est reconstruit à sa prochaine demande.
+    """
+
+    def __init__(self):
+        self._version = None
+        self._markups = {}
+
+    def get(self, key, version: int, build):
+        """Clavier associé à key pour cette version ; build() le construit si besoin"""
+        if version != self._version:
+            self._markups = {}
+            self._version = version
+        markup = self._markups.get(key)
+        if markup is None:
+            markup = self._markups[key] = build()
+        return markup
+
+    def invalidate(self, key) -> None:
+        """Oublie le clavier associé à key (reconstruit à la prochaine demande)"""
+        self._markups.pop(key, None)
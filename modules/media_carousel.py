@@ -0,0 +1,46 @@
+from telegram import InputMediaPhoto, InputMediaVideo
+from telegram.error import BadRequest
+
+
+def input_media(media: dict, caption: str):
+    """InputMedia (photo ou vidéo) d'un média du catalogue, légende HTML"""
+    media_class = InputMediaPhoto if media['media_type'] == 'photo' else InputMediaVideo
+    return media_class(media=media['media_id'], caption=caption, parse_mode='HTML')
+
+
+async def send_media(bot, chat_id: int, media: dict, caption: str, reply_markup):
+    """Envoie un média du catalogue dans un nouveau message"""
+    if media['media_type'] == 'photo':
+        return await bot.send_photo(
+            chat_id=chat_id,
+            photo=media['media_id'],
+            caption=caption,
+            reply_markup=reply_markup,
+            parse_mode='HTML'
+        )
+    return await bot.send_video(
+        chat_id=chat_id,
+        video=media['media_id'],
+        caption=caption,
+        reply_markup=reply_markup,
+        parse_mode='HTML'
+    )
+
+
+async def replace_media(message, bot, media: dict, caption: str, reply_markup):
+    """Affiche media à la place du média de message.
+
+    Un seul appel (editMessageMedia) dans le cas normal ; si Telegram refuse
+    l'édition (message texte, trop ancien, supprimé...), on revient à
+    l'ancienne méthode : suppression puis nouvel envoi.
+    """
+    try:
+        return await message.edit_media(input_media(media, caption), reply_markup=reply_markup)
+    except BadRequest as e:
+        print(f"Édition du média refusée, renvoi du message : {e}")
+
+    try:
+        await message.delete()
+    except Exception as e:
+        print(f"Erreur lors de la suppression du message: {e}")
+    return await send_media(bot, message.chat_id, media, caption, reply_markup)
@@ -0,0 +1,35 @@
+import asyncio
+
+# Nombre maximal d'identifiants acceptés par deleteMessages
+DELETE_BATCH_SIZE = 100
+
+
+async def delete_messages(bot, chat_id: int, message_ids, concurrency: int = 5) -> None:
+    """Supprime des messages d'un chat, en ignorant ceux qui n'existent plus.
+
+    Utilise l'API groupée deleteMessages (jusqu'à 100 messages par appel)
+    quand le Bot la propose ; sinon, ou si elle échoue, supprime les messages
+    un par un avec au plus `concurrency` appels simultanés.
+    """
+    message_ids = sorted(set(message_ids))
+    if not message_ids:
+        return
+
+    if hasattr(bot, 'delete_messages'):
+        try:
+            for i in range(0, len(message_ids), DELETE_BATCH_SIZE):
+                await bot.delete_messages(chat_id=chat_id, message_ids=message_ids[i:i + DELETE_BATCH_SIZE])
+            return
+        except Exception as e:
+            print(f"Suppression groupée impossible, suppression message par message : {e}")
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def delete_one(message_id: int) -> None:
+        async with semaphore:
+            try:
+                await bot.delete_message(chat_id=chat_id, message_id=message_id)
+            except Exception:
+                pass  # Message déjà supprimé ou trop ancien
+
+    await asyncio.gather(*(delete_one(message_id) for message_id in message_ids))
@@ -0,0 +1,30 @@
+from telegram import InlineKeyboardButton
+
+# callback_data du bouton indicateur de page (ne fait rien)
+NOOP_CALLBACK = "noop"
+
+
+def paginate(items, page: int, page_size: int):
+    """Éléments de la page demandée.
+
+    Retourne (éléments, page, nombre de pages) ; la page est ramenée dans
+    les bornes, par exemple quand le catalogue a rétréci depuis l'affichage
+    du clavier.
+    """
+    page_count = max(1, -(-len(items) // page_size))
+    page = min(max(page, 0), page_count - 1)
+    start = page * page_size
+    return items[start:start + page_size], page, page_count
+
+
+def navigation_row(page: int, page_count: int, callback_prefix: str) -> list:
+    """Ligne ◀️ / n/N / ▶️ ; vide s'il n'y a qu'une page"""
+    if page_count <= 1:
+        return []
+    row = []
+    if page > 0:
+        row.append(InlineKeyboardButton("◀️", callback_data=f"{callback_prefix}{page - 1}"))
+    row.append(InlineKeyboardButton(f"{page + 1}/{page_count}", callback_data=NOOP_CALLBACK))
+    if page < page_count - 1:
+        row.append(InlineKeyboardButton("▶️", callback_data=f"{callback_prefix}{page + 1}"))
+    return row
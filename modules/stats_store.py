@@ -0,0 +1,249 @@
+import asyncio
+import copy
+import time
+from datetime import datetime
+
+# Taille des tranches d'historique (secondes) et nombre de tranches conservées,
+# de la plus fine à la plus grossière : une tranche expirée est fondue dans la
+# suivante, seules les semaines au-delà de leur rétention sont supprimées
+BUCKET_SECONDS = {'hour': 3600, 'day': 86400, 'week': 7 * 86400}
+BUCKET_RETENTION = {'hour': 48, 'day': 35, 'week': 104}
+
+# Version du format de l'historique : 2 = chaque vue n'est comptée que dans
+# une seule tranche (avant, elle l'était dans toutes les granularités)
+HISTORY_FORMAT = 2
+
+# Fenêtres affichées dans les statistiques : (granularité, nombre de tranches)
+WINDOWS = {'24h': ('hour', 24), '7j': ('day', 7), '30j': ('day', 30)}
+
+
+def empty_stats() -> dict:
+    return {
+        'total_views': 0,
+        'category_views': {},
+        'product_views': {},
+        'last_updated': datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
+        'last_reset': datetime.utcnow().strftime("%Y-%m-%d")
+    }
+
+
+def _empty_bucket() -> dict:
+    return {'total': 0, 'categories': {}, 'products': {}}
+
+
+def _merge_bucket(target: dict, bucket: dict, sign: int = 1) -> None:
+    """Ajoute (ou retranche, sign=-1) les vues de bucket à target"""
+    target['total'] += sign * bucket['total']
+    for category, views in bucket['categories'].items():
+        target['categories'][category] = target['categories'].get(category, 0) + sign * views
+    for category, products in bucket['products'].items():
+        views = target['products'].setdefault(category, {})
+        for product, count in products.items():
+            views[product] = views.get(product, 0) + sign * count
+
+
+def _split_history(history: dict) -> dict:
+    """Convertit un historique au format 1, où chaque vue figurait dans toutes
+    les granularités : une tranche ne garde que les vues absentes des tranches
+    plus fines encore présentes"""
+    granularities = list(BUCKET_SECONDS)
+    original = {granularity: copy.deepcopy(history.get(granularity, {})) for granularity in granularities}
+    for index in range(1, len(granularities)):
+        coarser, finer = granularities[index], granularities[index - 1]
+        ratio = BUCKET_SECONDS[coarser] // BUCKET_SECONDS[finer]
+        for key, bucket in original[finer].items():
+            target = history.get(coarser, {}).get(str(int(key) // ratio))
+            if target is not None:
+                _merge_bucket(target, bucket, sign=-1)
+    return history
+
+
+class StatsStore:
+    """Compteurs de vues gardés en mémoire, séparés du catalogue.
+
+    Les incréments ne touchent que le dictionnaire en mémoire ; un
+    instantané compact est écrit périodiquement par save().
+
+    En plus des totaux depuis la dernière réinitialisation, chaque vue est
+    ajoutée à sa tranche horaire. Les tranches horaires expirées sont fondues
+    dans leur tranche journalière, les journalières dans leur semaine : une
+    vue n'est comptée que dans une seule tranche et l'historique ancien est
+    compacté plutôt que supprimé. Les fenêtres « 24h / 7j / 30j » se lisent
+    sur au plus 30 tranches plus les heures pas encore fondues, sans jamais
+    rejouer d'événements.
+
+    Seules les tranches en cours reçoivent des vues : save() ne recopie que
+    celles modifiées depuis l'instantané précédent et réutilise les copies
+    des autres.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.stats = storage.load_stats() or empty_stats()
+        history = self.stats.pop('history', None) or {}
+        if history and history.pop('format', 1) < HISTORY_FORMAT:
+            history = _split_history(history)
+        self.history = {granularity: history.get(granularity, {}) for granularity in BUCKET_SECONDS}
+        # Copies des tranches déjà passées par save(), et tranches modifiées depuis
+        self._saved_history = copy.deepcopy(self.history)
+        self._touched = set()
+        self._dirty = False
+
+    def import_legacy(self, stats) -> None:
+        """Reprend les statistiques stockées autrefois dans le catalogue"""
+        if not isinstance(stats, dict) or self.stats['total_views']:
+            return
+        self.stats.update(stats)
+        self.stats.setdefault('category_views', {})
+        self.stats.setdefault('product_views', {})
+        self._dirty = True
+
+    def increment_category_views(self, category: str, products: list, at: str) -> None:
+        """Compte une vue de catégorie (et, comme avant, une vue pour chacun de ses produits)"""
+        category_views = self.stats['category_views']
+        category_views[category] = category_views.get(category, 0) + 1
+        self.stats['total_views'] += 1
+        product_names = [product['name'] for product in products]
+        if product_names:
+            views = self.stats['product_views'].setdefault(category, {})
+            for name in product_names:
+                views[name] = views.get(name, 0) + 1
+        self.stats['last_updated'] = at
+        self._record_history(category, product_names, category_view=True)
+        self._dirty = True
+
+    def increment_product_views(self, category: str, product_name: str, at: str) -> None:
+        views = self.stats['product_views'].setdefault(category, {})
+        views[product_name] = views.get(product_name, 0) + 1
+        self.stats['total_views'] += 1
+        self.stats['last_updated'] = at
+        self._record_history(category, [product_name])
+        self._dirty = True
+
+    def _record_history(self, category: str, product_names: list, category_view: bool = False) -> None:
+        key = str(int(time.time() // BUCKET_SECONDS['hour']))
+        bucket = self.history['hour'].get(key)
+        if bucket is None:
+            bucket = self.history['hour'][key] = _empty_bucket()
+        bucket['total'] += 1
+        self._touched.add(('hour', key))
+        if category_view:
+            bucket['categories'][category] = bucket['categories'].get(category, 0) + 1
+        if product_names:
+            views = bucket['products'].setdefault(category, {})
+            for name in product_names:
+                views[name] = views.get(name, 0) + 1
+
+    def window(self, name: str) -> dict:
+        """Vues cumulées sur une fenêtre glissante de WINDOWS ('24h', '7j', '30j')"""
+        granularity, count = WINDOWS[name]
+        buckets = self.history[granularity]
+        current = int(time.time() // BUCKET_SECONDS[granularity])
+        start = (current - count + 1) * BUCKET_SECONDS[granularity]
+
+        result = _empty_bucket()
+        for key in range(current - count + 1, current + 1):
+            bucket = buckets.get(str(key))
+            if bucket is not None:
+                _merge_bucket(result, bucket)
+        # Tranches plus fines de la fenêtre, pas encore fondues dans celle-ci
+        for finer in list(BUCKET_SECONDS)[:list(BUCKET_SECONDS).index(granularity)]:
+            seconds = BUCKET_SECONDS[finer]
+            for key, bucket in self.history[finer].items():
+                if int(key) * seconds >= start:
+                    _merge_bucket(result, bucket)
+        return result
+
+    def prune_history(self) -> None:
+        """Applique la politique de rétention : fond chaque tranche expirée dans
+        la tranche plus grossière qui la contient (heure -> jour -> semaine) et
+        supprime les semaines trop anciennes"""
+        now = time.time()
+        granularities = list(BUCKET_SECONDS)
+        for index, granularity in enumerate(granularities):
+            seconds = BUCKET_SECONDS[granularity]
+            oldest = int(now // seconds) - BUCKET_RETENTION[granularity] + 1
+            coarser = granularities[index + 1] if index + 1 < len(granularities) else None
+            buckets = self.history[granularity]
+            for key in [k for k in buckets if int(k) < oldest]:
+                bucket = buckets.pop(key)
+                if coarser is None:
+                    continue
+                coarser_key = str(int(key) * seconds // BUCKET_SECONDS[coarser])
+                target = self.history[coarser].get(coarser_key)
+                if target is None:
+                    target = self.history[coarser][coarser_key] = _empty_bucket()
+                _merge_bucket(target, bucket)
+                self._touched.add((coarser, coarser_key))
+
+    def _history_snapshot(self) -> dict:
+        """Historique à sérialiser : seules les tranches modifiées sont recopiées.
+
+        Une copie n'est jamais modifiée après coup (elle est remplacée), le
+        thread d'écriture peut donc la lire pendant que la boucle continue à
+        compter les vues.
+        """
+        for granularity, key in self._touched:
+            bucket = self.history[granularity].get(key)
+            if bucket is not None:
+                self._saved_history[granularity][key] = copy.deepcopy(bucket)
+        self._touched.clear()
+        snapshot = {}
+        for granularity, buckets in self.history.items():
+            saved = self._saved_history[granularity]
+            for key in [k for k in saved if k not in buckets]:
+                del saved[key]
+            for key in [k for k in buckets if k not in saved]:
+                saved[key] = copy.deepcopy(buckets[key])
+            snapshot[granularity] = dict(saved)
+        snapshot['format'] = HISTORY_FORMAT
+        return snapshot
+
+    def reset(self, last_updated: str, last_reset: str) -> None:
+        """Remet les totaux à zéro (l'historique par tranches est conservé)"""
+        self.stats = {
+            'total_views': 0,
+            'category_views': {},
+            'product_views': {},
+            'last_updated': last_updated,
+            'last_reset': last_reset
+        }
+        self._dirty = True
+
+    def clean(self, catalog: dict) -> None:
+        """Supprime les statistiques des produits et catégories qui n'existent plus"""
+        category_views = self.stats['category_views']
+        for category in [c for c in category_views if c not in catalog]:
+            del category_views[category]
+            print(f"🧹 Suppression des stats de la catégorie: {category}")
+
+        product_views = self.stats['product_views']
+        for category in list(product_views):
+            if category not in catalog:
+                del product_views[category]
+                continue
+
+            existing_products = {p['name'] for p in catalog[category]}
+            for product in [p for p in product_views[category] if p not in existing_products]:
+                del product_views[category][product]
+                print(f"🧹 Suppression des stats du produit: {product} dans {category}")
+
+            if not product_views[category]:
+                del product_views[category]
+
+        self.stats['last_updated'] = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+        self._dirty = True
+
+    async def save(self) -> None:
+        """Écrit un instantané des compteurs hors de la boucle, s'ils ont changé"""
+        if not self._dirty:
+            return
+        self._dirty = False
+        self.prune_history()
+        snapshot = copy.deepcopy(self.stats)
+        snapshot['history'] = self._history_snapshot()
+        try:
+            await asyncio.to_thread(self.storage.save_stats, snapshot)
+        except Exception as e:
+            self._dirty = True
+            print(f"Erreur lors de la sauvegarde des statistiques : {e}")
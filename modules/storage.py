@@ -0,0 +1,473 @@
+import json
+import os
+import sqlite3
+import threading
+from functools import wraps
+
+from modules.catalog_store import CatalogStore, LEGACY_STATS_OPS
+from modules.user_registry import UserRegistry
+
+USERS_FORMAT = 2
+
+
+class JsonStorage:
+    """Stockage historique : un fichier JSON par type de données.
+
+    Le catalogue passe par le journal de mutations de CatalogStore ; les
+    utilisateurs et les codes d'accès sont réécrits en entier à chaque
+    modification.
+    """
+
+    def __init__(self, catalog_file: str, users_file: str = 'data/users.json',
+                 access_file: str = 'data/access_codes.json', stats_file: str = 'data/stats.json',
+                 compact_threshold: int = 500):
+        self.catalog_store = CatalogStore(catalog_file, compact_threshold=compact_threshold)
+        self.users_file = users_file
+        self.stats_file = stats_file
+        self.access_file = access_file
+        self._ensure_access_file()
+
+    # Catalogue
+
+    def load_catalog(self) -> dict:
+        return self.catalog_store.load()
+
+    def apply_catalog_op(self, op: dict) -> None:
+        self.catalog_store.append(op)
+
+    def sync_catalog(self) -> None:
+        self.catalog_store.sync()
+
+    def save_catalog(self, catalog: dict) -> None:
+        self.catalog_store.compact(catalog)
+
+    def needs_compaction(self) -> bool:
+        return self.catalog_store.needs_compaction()
+
+    # Statistiques
+
+    def load_stats(self):
+        try:
+            with open(self.stats_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save_stats(self, stats: dict) -> None:
+        tmp_file = f"{self.stats_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, ensure_ascii=False)
+        os.replace(tmp_file, self.stats_file)
+
+    # Utilisateurs
+
+    def load_users(self) -> UserRegistry:
+        """Charge le registre (format compact, ou ancien format converti)"""
+        try:
+            with open(self.users_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return UserRegistry()
+        if data.get("format") == USERS_FORMAT:
+            return UserRegistry.from_rows(data["users"])
+        return UserRegistry.from_legacy(data)
+
+    def save_users(self, registry: UserRegistry, user_ids) -> None:
+        """Écrit le registre (le fichier JSON est réécrit en entier, une seule fois par lot)"""
+        tmp_file = f"{self.users_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({"format": USERS_FORMAT, "users": registry.rows()}, f,
+                      ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_file, self.users_file)
+
+    # Codes d'accès
+
+    def _ensure_access_file(self):
+        """Crée le fichier d'accès s'il n'existe pas"""
+        directory = os.path.dirname(self.access_file)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        if not os.path.exists(self.access_file):
+            self._write_access({"codes": [], "authorized_users": []})
+
+    def _read_access(self) -> dict:
+        with open(self.access_file, 'r') as f:
+            return json.load(f)
+
+    def _write_access(self, data: dict) -> None:
+        with open(self.access_file, 'w') as f:
+            json.dump(data, f, indent=4)
+
+    def load_access_data(self) -> dict:
+        return self._read_access()
+
+    def add_access_code(self, record: dict) -> None:
+        data = self._read_access()
+        data["codes"].append(record)
+        self._write_access(data)
+
+    def use_access_code(self, code: str, user_id: int) -> None:
+        """Marque le code comme utilisé et autorise l'utilisateur"""
+        data = self._read_access()
+        for c in data["codes"]:
+            if c["code"] == code:
+                c["used"] = True
+        if user_id not in data["authorized_users"]:
+            data["authorized_users"].append(user_id)
+        self._write_access(data)
+
+    def purge_expired_codes(self, now: str) -> None:
+        data = self._read_access()
+        data["codes"] = [c for c in data["codes"] if c["expiration"] > now]
+        self._write_access(data)
+
+    def access_version(self):
+        """Version des données d'accès : date de modification du fichier"""
+        try:
+            return os.stat(self.access_file).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    # Sauvegarde
+
+    def backup_sources(self, tmp_dir: str) -> dict:
+        """Fichiers à sauvegarder : {chemin d'origine: fichier à lire}.
+
+        Le journal du catalogue est listé avant l'instantané : si une
+        compaction survient entre les deux lectures, on obtient l'ancien
+        journal et le nouvel instantané, dont le numéro de séquence évite
+        de rejouer deux fois les entrées (l'inverse perdrait des mutations).
+        """
+        paths = [
+            self.catalog_store.log_file,
+            self.catalog_store.catalog_file,
+            self.users_file,
+            self.access_file,
+            self.stats_file
+        ]
+        return {path: path for path in paths}
+
+
+def _locked(method):
+    """Sérialise l'accès à la connexion SQLite (partagée avec le thread d'écriture)"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class SqliteStorage:
+    """Stockage SQLite (mode WAL) : chaque mise à jour ponctuelle coûte une ligne.
+
+    À la création de la base, les fichiers JSON existants sont importés.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS categories (
+            name TEXT PRIMARY KEY
+        );
+        CREATE TABLE IF NOT EXISTS products (
+            category TEXT NOT NULL,
+            name TEXT NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (category, name)
+        );
+        CREATE INDEX IF NOT EXISTS idx_products_category ON products (category);
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT,
+            first_name TEXT,
+            last_name TEXT,
+            last_seen TEXT,
+            unreachable_since INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS access_codes (
+            code TEXT PRIMARY KEY,
+            expiration TEXT NOT NULL,
+            created_by INTEGER,
+            used INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_access_codes_expiration ON access_codes (expiration);
+        CREATE TABLE IF NOT EXISTS authorized_users (
+            user_id INTEGER PRIMARY KEY
+        );
+        CREATE TABLE IF NOT EXISTS counters (
+            scope TEXT NOT NULL,
+            category TEXT NOT NULL DEFAULT '',
+            product TEXT NOT NULL DEFAULT '',
+            views INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (scope, category, product)
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    def __init__(self, db_file: str, import_from: JsonStorage = None):
+        is_new = not os.path.exists(db_file)
+        directory = os.path.dirname(db_file)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.db_file = db_file
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        self._migrate()
+
+        if is_new and import_from is not None:
+            self._import_json(import_from)
+
+    def _migrate(self) -> None:
+        """Ajoute les colonnes apparues après la création de la base"""
+        columns = {name for _, name, *_ in self.conn.execute("PRAGMA table_info(users)")}
+        if 'unreachable_since' not in columns:
+            with self.conn:
+                self.conn.execute("ALTER TABLE users ADD COLUMN unreachable_since INTEGER NOT NULL DEFAULT 0")
+
+    def _import_json(self, source: JsonStorage) -> None:
+        """Importe les données des fichiers JSON existants"""
+        try:
+            catalog = source.load_catalog()
+            self.save_catalog(catalog)
+            stats = source.load_stats() or catalog.get('stats')
+            if isinstance(stats, dict):
+                self.save_stats(stats)
+            with self.conn:
+                self._upsert_users(source.load_users().rows())
+                data = source.load_access_data()
+                for c in data["codes"]:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO access_codes (code, expiration, created_by, used) VALUES (?, ?, ?, ?)",
+                        (c["code"], c["expiration"], c.get("created_by"), int(c["used"]))
+                    )
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO authorized_users (user_id) VALUES (?)",
+                    [(user_id,) for user_id in data["authorized_users"]]
+                )
+            print("📦 Données JSON importées dans la base SQLite")
+        except Exception as e:
+            print(f"Erreur lors de l'import des données JSON : {e}")
+
+    # Catalogue
+
+    @_locked
+    def load_catalog(self) -> dict:
+        catalog = {}
+        for (name,) in self.conn.execute("SELECT name FROM categories ORDER BY rowid"):
+            catalog[name] = []
+        for category, data in self.conn.execute("SELECT category, data FROM products ORDER BY rowid"):
+            catalog.setdefault(category, []).append(json.loads(data))
+
+        return catalog
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    @_locked
+    def apply_catalog_op(self, op: dict) -> None:
+        kind = op["op"]
+        category = op.get("category")
+
+        with self.conn:
+            if kind == "add_category":
+                self.conn.execute("INSERT OR IGNORE INTO categories (name) VALUES (?)", (category,))
+
+            elif kind == "delete_category":
+                self.conn.execute("DELETE FROM products WHERE category = ?", (category,))
+                self.conn.execute("DELETE FROM categories WHERE name = ?", (category,))
+
+            elif kind == "add_product":
+                product = op["product"]
+                self.conn.execute("INSERT OR IGNORE INTO categories (name) VALUES (?)", (category,))
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO products (category, name, data) VALUES (?, ?, ?)",
+                    (category, product['name'], json.dumps(product, ensure_ascii=False))
+                )
+
+            elif kind == "edit_product":
+                row = self.conn.execute(
+                    "SELECT data FROM products WHERE category = ? AND name = ?",
+                    (category, op["name"])
+                ).fetchone()
+                if row:
+                    product = json.loads(row[0])
+                    product[op["field"]] = op["value"]
+                    self.conn.execute(
+                        "UPDATE products SET name = ?, data = ? WHERE category = ? AND name = ?",
+                        (product['name'], json.dumps(product, ensure_ascii=False), category, op["name"])
+                    )
+
+            elif kind == "delete_product":
+                self.conn.execute(
+                    "DELETE FROM products WHERE category = ? AND name = ?", (category, op["name"])
+                )
+
+            elif kind in LEGACY_STATS_OPS:
+                pass
+
+            else:
+                print(f"Opération de catalogue inconnue ignorée : {kind}")
+
+    def sync_catalog(self) -> None:
+        # Chaque opération est déjà validée dans sa propre transaction
+        pass
+
+    @_locked
+    def save_catalog(self, catalog: dict) -> None:
+        """Réécrit entièrement le catalogue (import ou restauration)"""
+        with self.conn:
+            self.conn.execute("DELETE FROM products")
+            self.conn.execute("DELETE FROM categories")
+            for category, products in catalog.items():
+                if category == 'stats':
+                    continue
+                self.conn.execute("INSERT INTO categories (name) VALUES (?)", (category,))
+                for product in products:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO products (category, name, data) VALUES (?, ?, ?)",
+                        (category, product['name'], json.dumps(product, ensure_ascii=False))
+                    )
+
+    def needs_compaction(self) -> bool:
+        return False
+
+    # Statistiques
+
+    @_locked
+    def load_stats(self):
+        stats = {"total_views": 0, "category_views": {}, "product_views": {}}
+        has_stats = False
+        for scope, category, product, views in self.conn.execute(
+                "SELECT scope, category, product, views FROM counters"):
+            has_stats = True
+            if scope == 'total':
+                stats['total_views'] = views
+            elif scope == 'category':
+                stats['category_views'][category] = views
+            else:
+                stats['product_views'].setdefault(category, {})[product] = views
+        for key, value in self.conn.execute(
+                "SELECT key, value FROM meta WHERE key IN ('last_updated', 'last_reset', 'history')"):
+            has_stats = True
+            stats[key] = json.loads(value) if key == 'history' else value
+        return stats if has_stats else None
+
+    @_locked
+    def save_stats(self, stats: dict) -> None:
+        rows = [('total', '', '', stats.get('total_views', 0))]
+        rows += [('category', c, '', v) for c, v in stats.get('category_views', {}).items()]
+        rows += [('product', c, p, v)
+                 for c, products in stats.get('product_views', {}).items()
+                 for p, v in products.items()]
+        with self.conn:
+            self.conn.execute("DELETE FROM counters")
+            self.conn.executemany(
+                "INSERT INTO counters (scope, category, product, views) VALUES (?, ?, ?, ?)", rows
+            )
+            for key in ('last_updated', 'last_reset'):
+                if key in stats:
+                    self._set_meta(key, stats[key])
+            if 'history' in stats:
+                self._set_meta('history', json.dumps(stats['history'], ensure_ascii=False))
+
+    # Utilisateurs
+
+    @_locked
+    def load_users(self) -> UserRegistry:
+        return UserRegistry.from_rows(self.conn.execute(
+            "SELECT user_id, username, first_name, last_name, last_seen, unreachable_since "
+            "FROM users ORDER BY rowid"))
+
+    def _upsert_users(self, rows) -> None:
+        self.conn.executemany(
+            "INSERT INTO users (user_id, username, first_name, last_name, last_seen, unreachable_since) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (user_id) DO UPDATE SET username = excluded.username, "
+            "first_name = excluded.first_name, last_name = excluded.last_name, last_seen = excluded.last_seen, "
+            "unreachable_since = excluded.unreachable_since",
+            rows
+        )
+
+    @_locked
+    def save_users(self, registry: UserRegistry, user_ids) -> None:
+        """Écrit uniquement les utilisateurs de user_ids"""
+        with self.conn:
+            self._upsert_users(registry.rows(user_ids))
+
+    # Codes d'accès
+
+    @staticmethod
+    def _code_from_row(row) -> dict:
+        code, expiration, created_by, used = row
+        return {"code": code, "expiration": expiration, "created_by": created_by, "used": bool(used)}
+
+    @_locked
+    def load_access_data(self) -> dict:
+        codes = [self._code_from_row(row) for row in self.conn.execute(
+            "SELECT code, expiration, created_by, used FROM access_codes ORDER BY rowid")]
+        users = [user_id for (user_id,) in self.conn.execute(
+            "SELECT user_id FROM authorized_users ORDER BY rowid")]
+        return {"codes": codes, "authorized_users": users}
+
+    @_locked
+    def add_access_code(self, record: dict) -> None:
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO access_codes (code, expiration, created_by, used) VALUES (?, ?, ?, ?)",
+                (record["code"], record["expiration"], record.get("created_by"), int(record["used"]))
+            )
+
+    @_locked
+    def use_access_code(self, code: str, user_id: int) -> None:
+        """Marque le code comme utilisé et autorise l'utilisateur"""
+        with self.conn:
+            self.conn.execute("UPDATE access_codes SET used = 1 WHERE code = ?", (code,))
+            self.conn.execute("INSERT OR IGNORE INTO authorized_users (user_id) VALUES (?)", (user_id,))
+
+    @_locked
+    def purge_expired_codes(self, now: str) -> None:
+        with self.conn:
+            self.conn.execute("DELETE FROM access_codes WHERE expiration <= ?", (now,))
+
+    @_locked
+    def access_version(self):
+        """Version des données d'accès : change quand un autre processus modifie la base"""
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    # Sauvegarde
+
+    def backup_sources(self, tmp_dir: str) -> dict:
+        """Copie cohérente de la base (API de sauvegarde SQLite) dans tmp_dir.
+
+        La copie passe par une connexion de lecture dédiée, sans prendre
+        _lock : en mode WAL elle lit un instantané figé pendant que la
+        boucle et le thread d'écriture continuent d'utiliser self.conn.
+        """
+        copy_file = os.path.join(tmp_dir, os.path.basename(self.db_file))
+        source = sqlite3.connect(self.db_file)
+        target = sqlite3.connect(copy_file)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+        return {self.db_file: copy_file}
+
+
+def create_storage(config: dict):
+    """Crée le backend de stockage choisi dans la configuration ('json' ou 'sqlite')"""
+    json_storage = JsonStorage(
+        config['catalog_file'],
+        users_file=config.get('users_file', 'data/users.json'),
+        access_file=config.get('access_file', 'data/access_codes.json'),
+        stats_file=config.get('stats_file', 'data/stats.json'),
+        compact_threshold=config.get('catalog_compact_threshold', 500)
+    )
+    if config.get('storage_backend', 'json') == 'sqlite':
+        return SqliteStorage(config.get('sqlite_file', 'data/bot.db'), import_from=json_storage)
+    return json_storage
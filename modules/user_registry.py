@@ -0,0 +1,157 @@
+import heapq
+from datetime import datetime
+
+import pytz
+
+PARIS_TZ = pytz.timezone('Europe/Paris')
+LAST_SEEN_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def parse_last_seen(value) -> int:
+    """Convertit un last_seen stocké (epoch ou ancienne date de Paris) en epoch"""
+    if isinstance(value, int):
+        return value
+    if not value:
+        return 0
+    if value.isdigit():
+        return int(value)
+    try:
+        dt = datetime.strptime(value, LAST_SEEN_FORMAT)
+    except ValueError:
+        return 0
+    return int(PARIS_TZ.localize(dt).timestamp())
+
+
+def format_last_seen(epoch: int) -> str:
+    """Formate un last_seen (epoch) à l'heure de Paris, pour l'affichage"""
+    if not epoch:
+        return 'Jamais'
+    return datetime.fromtimestamp(epoch, PARIS_TZ).strftime(LAST_SEEN_FORMAT)
+
+
+class UserRecord:
+    __slots__ = ('username', 'first_name', 'last_name', 'last_seen', 'unreachable_since')
+
+    def __init__(self, username, first_name, last_name, last_seen: int = 0, unreachable_since: int = 0):
+        self.username = username
+        self.first_name = first_name
+        self.last_name = last_name
+        self.last_seen = last_seen
+        # Epoch du dernier échec définitif d'envoi (bot bloqué, compte supprimé) ; 0 = joignable
+        self.unreachable_since = unreachable_since
+
+    @property
+    def profile(self) -> tuple:
+        return self.username, self.first_name, self.last_name
+
+
+class UserRegistry:
+    """Registre compact des utilisateurs : identifiants entiers, enregistrements
+    à __slots__ et last_seen en secondes epoch (formaté seulement à l'affichage).
+
+    La liste des destinataires joignables (audience des diffusions) est tenue
+    à jour au fil des modifications au lieu d'être recalculée à chaque envoi.
+    """
+
+    def __init__(self):
+        self._records = {}
+        # Ensembles ordonnés : joignables, et injoignables -> date du constat
+        self._deliverable = {}
+        self._unreachable = {}
+
+    @classmethod
+    def from_rows(cls, rows) -> 'UserRegistry':
+        """Construit le registre à partir de lignes
+        (id, username, first_name, last_name, last_seen[, unreachable_since])
+        """
+        registry = cls()
+        for user_id, username, first_name, last_name, last_seen, *rest in rows:
+            registry._store(int(user_id), UserRecord(
+                username, first_name, last_name, parse_last_seen(last_seen), int(rest[0] or 0) if rest else 0
+            ))
+        return registry
+
+    @classmethod
+    def from_legacy(cls, users: dict) -> 'UserRegistry':
+        """Convertit l'ancien format de users.json ({"id": {username, ..., last_seen}})"""
+        return cls.from_rows(
+            (user_id, data.get('username'), data.get('first_name'),
+             data.get('last_name'), data.get('last_seen'))
+            for user_id, data in users.items()
+        )
+
+    def rows(self, user_ids=None) -> list:
+        """Lignes à écrire : tous les utilisateurs, ou seulement ceux de user_ids"""
+        if user_ids is None:
+            items = list(self._records.items())
+        else:
+            items = [(user_id, self._records[user_id]) for user_id in user_ids if user_id in self._records]
+        return [
+            [user_id, r.username, r.first_name, r.last_name, r.last_seen, r.unreachable_since]
+            for user_id, r in items
+        ]
+
+    def _store(self, user_id: int, record: UserRecord) -> None:
+        self._records[user_id] = record
+        if record.unreachable_since:
+            self._deliverable.pop(user_id, None)
+            self._unreachable[user_id] = record.unreachable_since
+        else:
+            self._unreachable.pop(user_id, None)
+            self._deliverable[user_id] = None
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._records
+
+    def get(self, user_id: int):
+        return self._records.get(user_id)
+
+    def ids(self) -> list:
+        return list(self._records)
+
+    def upsert(self, user_id: int, username, first_name, last_name, last_seen: int) -> UserRecord:
+        """Crée ou remplace un utilisateur (un utilisateur qui se manifeste est joignable)"""
+        record = UserRecord(username, first_name, last_name, last_seen)
+        self._store(user_id, record)
+        return record
+
+    def mark_unreachable(self, user_id: int, now: int) -> bool:
+        """Exclut l'utilisateur des diffusions ; retourne False s'il est inconnu"""
+        record = self._records.get(user_id)
+        if record is None:
+            return False
+        record.unreachable_since = now
+        self._store(user_id, record)
+        return True
+
+    def mark_reachable(self, user_id: int) -> bool:
+        """Réintègre l'utilisateur ; retourne True s'il était marqué injoignable"""
+        record = self._records.get(user_id)
+        if record is None or not record.unreachable_since:
+            return False
+        record.unreachable_since = 0
+        self._store(user_id, record)
+        return True
+
+    @property
+    def unreachable_count(self) -> int:
+        return len(self._unreachable)
+
+    def deliverable(self, now: int = 0, recheck_after: int = None) -> list:
+        """Destinataires d'une diffusion, dans l'ordre d'inscription.
+
+        Les utilisateurs injoignables depuis plus de recheck_after secondes
+        sont inclus de nouveau, pour vérifier s'ils ont débloqué le bot.
+        """
+        recipients = list(self._deliverable)
+        if recheck_after is not None:
+            cutoff = now - recheck_after
+            recipients.extend(user_id for user_id, since in self._unreachable.items() if since <= cutoff)
+        return recipients
+
+    def recent(self, count: int) -> list:
+        """Les count utilisateurs vus le plus récemment : [(id, record), ...]"""
+        return heapq.nlargest(count, self._records.items(), key=lambda item: item[1].last_seen)